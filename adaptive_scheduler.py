@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Адаптивный непрерывный обход ЕИС для downloader.py (--adaptive вместе с --restart-hours).
+
+Вместо «обойти все регионы и уснуть на N часов» каждая пара (регион, тип документа)
+живёт в очереди с приоритетом по времени следующего опроса. После каждого опроса
+обновляется оценка интенсивности появления новых закупок (EWMA, закупок/час),
+и следующий интервал пересчитывается так, чтобы:
+
+  * общий бюджет запросов совпадал с фиксированным режимом
+    (число пар / restart-hours — столько же запросов в час, сколько раньше),
+  * частота опроса пары была пропорциональна sqrt(интенсивности) — это минимизирует
+    среднее «устаревание» при фиксированном бюджете; «мёртвые» пары опрашиваются редко,
+    Москва (77) и Подмосковье (50) — часто.
+
+Статистика сохраняется в JSON (--scheduler-state), чтобы после перезапуска не учиться заново.
+"""
+
+import datetime as dt
+import heapq
+import json
+import math
+import os
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+EWMA_ALPHA = 0.3
+# «сглаживание» для пар без находок: совсем не опрашивать их нельзя
+YIELD_FLOOR = 0.05
+
+
+@dataclass
+class PairStats:
+    rate: float | None = None           # оценка: новых закупок в час
+    last_poll: float | None = None      # time.time() последнего опроса
+    last_date: str | None = None        # последняя опрошенная дата (YYYY-MM-DD)
+    polls: int = 0
+    rows: int = 0
+
+
+@dataclass(frozen=True)
+class Pair:
+    region: int
+    subsystem: str
+    doc_type: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.region:02d}/{self.subsystem}/{self.doc_type}"
+
+
+@dataclass
+class AdaptiveScheduler:
+    pairs: list[Pair]
+    base_interval: float                      # секунд: restart-hours фиксированного режима
+    min_interval: float = 300.0
+    max_interval: float | None = None
+    stats: dict[str, PairStats] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.max_interval is None:
+            self.max_interval = self.base_interval * 4
+        for p in self.pairs:
+            self.stats.setdefault(p.key, PairStats())
+
+    @property
+    def budget(self) -> float:
+        """Запросов в секунду на все пары — как у фиксированного режима."""
+        return len(self.pairs) / self.base_interval
+
+    def _weight(self, key: str) -> float:
+        rate = self.stats[key].rate
+        if rate is None:
+            # ещё не опрашивали — считаем «средней» парой
+            known = [s.rate for s in self.stats.values() if s.rate is not None]
+            rate = sum(known) / len(known) if known else 1.0
+        return math.sqrt(max(rate, YIELD_FLOOR))
+
+    def interval(self, key: str) -> float:
+        total = sum(self._weight(p.key) for p in self.pairs)
+        share = self._weight(key) / total
+        seconds = 1.0 / (self.budget * share)
+        return min(max(seconds, self.min_interval), self.max_interval)
+
+    def record(self, key: str, rows: int, now: float) -> None:
+        st = self.stats[key]
+        if st.last_poll is None:
+            # первый опрос покрывает сутки с полуночи
+            midnight = dt.datetime.combine(dt.date.today(), dt.time()).timestamp()
+            hours = max((now - midnight) / 3600, 1.0)
+        else:
+            hours = max((now - st.last_poll) / 3600, 1 / 60)
+        observed = rows / hours
+        st.rate = observed if st.rate is None else EWMA_ALPHA * observed + (1 - EWMA_ALPHA) * st.rate
+        st.last_poll = now
+        st.polls += 1
+        st.rows += rows
+
+    def save(self, path: Path) -> None:
+        data = {k: vars(v) for k, v in self.stats.items()}
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def load(self, path: Path) -> None:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        for key, values in data.items():
+            if key in self.stats and isinstance(values, dict):
+                self.stats[key] = PairStats(**{k: v for k, v in values.items() if k in PairStats.__annotations__})
+
+    def summary(self, top: int = 10) -> str:
+        ranked = sorted(self.stats.items(), key=lambda kv: -(kv[1].rate or 0))[:top]
+        return ", ".join(f"{k}: {st.rate or 0:.2f}/ч каждые {self.interval(k) / 60:.0f} мин" for k, st in ranked)
+
+
+def run_adaptive(harvester, pairs: list[Pair], base_interval: float, state_path: Path | None = None,
+                 min_interval: float = 300.0, on_new_files=None, flush=None, flush_every: float = 900.0) -> None:
+    """
+    Бесконечный цикл опроса. on_new_files(pair, files) — новые файлы пары (для выгрузки),
+    flush() вызывается не чаще раза в flush_every секунд (например, пакетная отправка на сервер).
+    """
+    sched = AdaptiveScheduler(pairs, base_interval, min_interval=min_interval)
+    if state_path:
+        sched.load(state_path)
+
+    now = time.time()
+    queue: list[tuple[float, int, Pair]] = []
+    for i, p in enumerate(pairs):
+        st = sched.stats[p.key]
+        due = now if st.last_poll is None else min(st.last_poll + sched.interval(p.key), now + sched.interval(p.key))
+        heapq.heappush(queue, (due, i, p))
+
+    print(f"[ADAPTIVE] пар: {len(pairs)}, бюджет {sched.budget * 3600:.0f} запросов/ч")
+    last_flush = time.time()
+    last_report = time.time()
+
+    try:
+        while queue:
+            due, i, pair = heapq.heappop(queue)
+            wait = due - time.time()
+            if wait > 0:
+                time.sleep(wait)
+
+            st = sched.stats[pair.key]
+            today = dt.date.today().isoformat()
+            # после полуночи дочитываем и вчерашний день, чтобы не потерять поздние публикации
+            dates = [today] if st.last_date in (None, today) else [st.last_date, today]
+
+            files: set[Path] = set()
+            counts = Counter()
+            status = "ok"
+            for d in dates:
+                res = harvester.scan_doc_type(pair.region, d, pair.subsystem, pair.doc_type, files, counts)
+                if res == "stop":
+                    print("[ADAPTIVE] Остановка (токен / лимит)")
+                    if flush:
+                        flush()
+                    return
+                if res == "error":
+                    status = "error"
+
+            rows = counts["notices"]
+            now = time.time()
+            if status == "ok":
+                sched.record(pair.key, rows, now)
+                st.last_date = today
+            if files and on_new_files:
+                on_new_files(pair, files)
+
+            next_in = sched.interval(pair.key) if status == "ok" else sched.min_interval
+            heapq.heappush(queue, (now + next_in, i, pair))
+
+            if flush and now - last_flush >= flush_every:
+                flush()
+                last_flush = now
+            if now - last_report >= 600:
+                print(f"[ADAPTIVE] самые «урожайные» пары: {sched.summary()}")
+                if state_path:
+                    sched.save(state_path)
+                last_report = now
+    finally:
+        if state_path:
+            sched.save(state_path)
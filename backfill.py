@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Планировщик исторической догрузки для downloader.py (--backfill FROM:TO).
+
+Диапазон дат режется на единицы работы (регион, месяц, подсистема, тип документа).
+Единицы выполняются параллельно (--workers) с общим ограничением частоты запросов
+к ЕИС (--rate, запросов/сек). Прогресс пишется в журнал (JSON lines, только дозапись):
+
+    {"unit": "77/2025-01/PRIZ/epNotificationEF2020", "day": "2025-01-05", "rows": 12}
+    {"unit": "77/2025-01/PRIZ/epNotificationEF2020", "done": true}
+
+При повторном запуске с тем же журналом уже пройденные дни и единицы пропускаются,
+так что упавший или остановленный backfill продолжается с места остановки.
+"""
+
+import concurrent.futures
+import datetime as dt
+import json
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class WorkUnit:
+    region: int
+    month: str          # YYYY-MM
+    subsystem: str
+    doc_type: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.region:02d}/{self.month}/{self.subsystem}/{self.doc_type}"
+
+    def days(self, date_from: dt.date, date_to: dt.date) -> list[str]:
+        """Дни месяца единицы, попадающие в [date_from, date_to]."""
+        year, month = (int(x) for x in self.month.split("-"))
+        day = max(dt.date(year, month, 1), date_from)
+        result = []
+        while day.month == month and day <= date_to:
+            result.append(day.isoformat())
+            day += dt.timedelta(days=1)
+        return result
+
+
+def parse_range(value: str) -> tuple[dt.date, dt.date]:
+    """'2025-01-01:2025-12-31' -> (date_from, date_to)."""
+    left, sep, right = value.partition(":")
+    if not sep:
+        raise ValueError("ожидается диапазон вида YYYY-MM-DD:YYYY-MM-DD")
+    date_from = dt.date.fromisoformat(left.strip())
+    date_to = dt.date.fromisoformat(right.strip())
+    if date_from > date_to:
+        raise ValueError("начало диапазона позже конца")
+    return date_from, date_to
+
+
+def plan_units(date_from: dt.date, date_to: dt.date, regions: list[int],
+               doc_types: dict[str, list[str]]) -> list[WorkUnit]:
+    """
+    Все единицы работы диапазона: месяц за месяцем (от старых к новым),
+    внутри месяца — регион, подсистема, тип документа.
+    """
+    months = []
+    cur = date_from.replace(day=1)
+    while cur <= date_to:
+        months.append(cur.strftime("%Y-%m"))
+        cur = (cur + dt.timedelta(days=32)).replace(day=1)
+
+    return [
+        WorkUnit(region, month, subsystem, doc_type)
+        for month in months
+        for region in regions
+        for subsystem, types in doc_types.items()
+        for doc_type in types
+    ]
+
+
+class BackfillState:
+    """Журнал прогресса (дозапись JSON lines), потокобезопасный."""
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._days: dict[str, set[str]] = {}
+        self._done: set[str] = set()
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # недописанная строка после аварийной остановки
+                    unit = rec.get("unit")
+                    if not unit:
+                        continue
+                    if rec.get("done"):
+                        self._done.add(unit)
+                    elif rec.get("day"):
+                        self._days.setdefault(unit, set()).add(rec["day"])
+
+    def _append(self, rec: dict) -> None:
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+
+    def is_done(self, unit: WorkUnit) -> bool:
+        return unit.key in self._done
+
+    def done_days(self, unit: WorkUnit) -> set[str]:
+        with self._lock:
+            return set(self._days.get(unit.key, ()))
+
+    def mark_day(self, unit: WorkUnit, day: str, rows: int) -> None:
+        self._append({"unit": unit.key, "day": day, "rows": rows})
+        with self._lock:
+            self._days.setdefault(unit.key, set()).add(day)
+
+    def mark_done(self, unit: WorkUnit) -> None:
+        self._append({"unit": unit.key, "done": True})
+        with self._lock:
+            self._done.add(unit.key)
+
+
+class RateLimiter:
+    """
+    Общий для всех потоков «ведро токенов»: не больше rate запросов в секунду
+    (с запасом burst на короткие всплески). Вызов блокирует до появления токена.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __call__(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class Progress:
+    """Счётчики и периодический отчёт: скорость и оценка времени до конца."""
+
+    def __init__(self, units_total: int, steps_total: int, every: float = 30.0):
+        self.units_total = units_total
+        self.steps_total = steps_total
+        self.units_done = 0
+        self.steps_done = 0
+        self.rows = 0
+        self.errors = 0
+        self.every = every
+        self._start = time.monotonic()
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def step(self, rows: int = 0, error: bool = False) -> None:
+        with self._lock:
+            if error:
+                self.errors += 1
+            else:
+                self.steps_done += 1
+                self.rows += rows
+            due = time.monotonic() - self._last >= self.every
+        if due:
+            self.report()
+
+    def unit(self) -> None:
+        with self._lock:
+            self.units_done += 1
+
+    def report(self) -> None:
+        with self._lock:
+            self._last = time.monotonic()
+            elapsed = max(self._last - self._start, 1e-6)
+            rate = self.steps_done / elapsed
+            left = max(self.steps_total - self.steps_done, 0)
+            eta = dt.timedelta(seconds=int(left / rate)) if rate > 0 else "—"
+            print(
+                f"[BACKFILL] единиц {self.units_done}/{self.units_total}, "
+                f"запросов {self.steps_done}/{self.steps_total} ({rate * 60:.1f}/мин), "
+                f"закупок {self.rows} ({self.rows / elapsed * 60:.1f}/мин), "
+                f"ошибок {self.errors}, ETA {eta}"
+            )
+
+
+def run_backfill(harvester, units: list[WorkUnit], state: BackfillState,
+                 date_from: dt.date, date_to: dt.date, workers: int = 4,
+                 retries: int = 3, on_day_done=None, flush=None) -> Progress:
+    """
+    Выполняет единицы через harvester.scan_doc_type. День считается пройденным
+    только при успешном ответе ЕИС; сбойные дни повторяются (retries раз с паузой),
+    а если так и не прошли — единица остаётся незавершённой до следующего запуска.
+    flush() — доставка накопленного приёмником (notice_sinks), затем on_day_done(unit, day, files)
+    с файлами этого дня — например, отправка на сервер; день записывается в журнал только
+    после них, так что при продолжении после остановки каждый отмеченный день уже доставлен
+    и отправлен, а неотмеченный будет пройден и отправлен заново.
+    Исключение из flush/on_day_done оставляет день незавершённым.
+    """
+    pending = [u for u in units if not state.is_done(u)]
+    todo = {u: [d for d in u.days(date_from, date_to) if d not in state.done_days(u)] for u in pending}
+    progress = Progress(len(pending), sum(len(days) for days in todo.values()))
+    stop = threading.Event()
+
+    print(f"[BACKFILL] {date_from}..{date_to}: единиц всего {len(units)}, "
+          f"к выполнению {len(pending)}, запросов {progress.steps_total}")
+
+    def work(unit: WorkUnit) -> None:
+        complete = True
+        for day in todo[unit]:
+            if stop.is_set():
+                return
+            counts = Counter()             # закупок за день, включая частично прошедшие попытки
+            files: set[Path] = set()
+            for attempt in range(retries + 1):
+                res = harvester.scan_doc_type(unit.region, day, unit.subsystem, unit.doc_type, files, counts)
+                if res != "error":
+                    break
+                progress.step(error=True)
+                time.sleep(min(60.0, 2.0 ** attempt))
+            if res == "stop":
+                stop.set()
+                return
+            if res == "error":
+                complete = False
+                continue
+            rows = counts["notices"]
+            if flush:
+                flush()
+            if on_day_done:
+                on_day_done(unit, day, files)
+            state.mark_day(unit, day, rows)
+            progress.step(rows)
+        if complete:
+            state.mark_done(unit)
+            progress.unit()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(work, u) for u in pending]
+        try:
+            for fut in concurrent.futures.as_completed(futures):
+                exc = fut.exception()
+                if exc is not None:
+                    print(f"[BACKFILL] ошибка в задаче: {exc}")
+        except KeyboardInterrupt:
+            print("[BACKFILL] Остановка: дожидаемся текущих запросов, прогресс сохранён")
+            stop.set()
+            for fut in futures:
+                fut.cancel()
+            raise
+
+    progress.report()
+    return progress
@@ -30,6 +30,8 @@ from urllib.parse import urlparse, unquote, parse_qs
 import requests
 from lxml import etree
 
+from harvest_profiler import profiler
+
 URL = "https://int44.zakupki.gov.ru/eis-integration/services/getDocsIP"
 NS_SOAP = "http://schemas.xmlsoap.org/soap/envelope/"
 NS_WS   = "http://zakupki.gov.ru/fz44/get-docs-ip/ws"
@@ -251,8 +253,18 @@ def main():
     ap.add_argument("--sleep", type=float, default=0.4, help="пауза между запросами, сек")
     ap.add_argument("--limit", type=int, default=0, help="0 = без лимита по числу найденных закупок")
     ap.add_argument("--fetch-by-purchase", action="store_true", help="дотягивать «пакет по номеру закупки» (XML)")
+    ap.add_argument("--profile", metavar="DIR",
+                    help="профилировать прогон: cProfile, tracemalloc по регионам и время этапов в отчёт в DIR")
     args = ap.parse_args()
 
+    if args.profile:
+        profiler.start(args.profile, "eis_fetch_all")
+    try:
+        run(args)
+    finally:
+        profiler.stop()
+
+def run(args: argparse.Namespace):
     regs = REGIONS_ALL if not args.regions else [int(x) for x in args.regions.split(",") if x.strip()]
     now = dt.datetime.now()
     start = now - dt.timedelta(days=args.days)
@@ -298,7 +310,8 @@ def main():
         for dt_code in doc_types:
             xml = build_getDocsByOrgRegion(args.token, region, subsystem, dt_code, date_str)
             try:
-                resp = soap_post(sess, xml)
+                with profiler.stage("soap"):
+                    resp = soap_post(sess, xml)
             except Exception as e:
                 print(f"[{region:02d}] {date_str} {subsystem}:{dt_code} HTTP/SOAP: {e}")
                 continue
@@ -312,9 +325,10 @@ def main():
                 continue
 
             try:
-                z = sess.get(url, headers={"individualPerson_token": args.token}, timeout=300)
-                z.raise_for_status()
-                zbytes = z.content
+                with profiler.stage("download"):
+                    z = sess.get(url, headers={"individualPerson_token": args.token}, timeout=300)
+                    z.raise_for_status()
+                    zbytes = z.content
             except Exception as e:
                 print(f"[{region:02d}] {date_str} download-zip(XMLs): {e}")
                 continue
@@ -323,11 +337,14 @@ def main():
                 for name in zf.namelist():
                     if not name.lower().endswith(".xml"):
                         continue
-                    xb = zf.read(name)
-                    if not any_kw(xml_text(xb)):
-                        continue
-
-                    det = extract_details_and_links(xb)
+                    with profiler.stage("unzip"):
+                        xb = zf.read(name)
+                    with profiler.stage("filter"):
+                        if not any_kw(xml_text(xb)):
+                            continue
+
+                    with profiler.stage("parse"):
+                        det = extract_details_and_links(xb)
                     num = (det["purchaseNumber"] or "").strip()
                     if not num or num in seen_numbers:
                         continue
@@ -339,7 +356,8 @@ def main():
                     (folder / "files").mkdir(parents=True, exist_ok=True)
 
                     notice_fname = f"notice_{dt_code}_{date_str}_{sanitize_name(os.path.basename(name))}"
-                    (folder / notice_fname).write_bytes(xb)
+                    with profiler.stage("disk"):
+                        (folder / notice_fname).write_bytes(xb)
 
                     file_rows = []
                     # вместо скачивания: фиксируем плановые имена
@@ -355,11 +373,13 @@ def main():
                     if args.fetch_by_purchase:
                         xml2 = build_getDocsByReestrNumber(args.token, num)
                         try:
-                            resp2 = soap_post(sess, xml2)
+                            with profiler.stage("soap"):
+                                resp2 = soap_post(sess, xml2)
                             ok2, url2, _ = parse_archive_url(resp2)
                             if ok2 and url2:
-                                zp = sess.get(url2, headers={"individualPerson_token": args.token}, timeout=300)
-                                zp.raise_for_status()
+                                with profiler.stage("download"):
+                                    zp = sess.get(url2, headers={"individualPerson_token": args.token}, timeout=300)
+                                    zp.raise_for_status()
                                 with zipfile.ZipFile(io.BytesIO(zp.content)) as z2:
                                     k = 0
                                     for nm in z2.namelist():
@@ -367,8 +387,10 @@ def main():
                                             continue
                                         xb2 = z2.read(nm)
                                         k += 1
-                                        (folder / f"package_{date_str}_{k:03d}.xml").write_bytes(xb2)
-                                        det2 = extract_details_and_links(xb2)
+                                        with profiler.stage("disk"):
+                                            (folder / f"package_{date_str}_{k:03d}.xml").write_bytes(xb2)
+                                        with profiler.stage("parse"):
+                                            det2 = extract_details_and_links(xb2)
                                         for j, lnk in enumerate(det2.get("links", []), start=1):
                                             url_j = lnk["url"]
                                             base_name = lnk["name"] or guess_filename_from_url(url_j)
@@ -380,7 +402,8 @@ def main():
                         except Exception:
                             pass
 
-                    save_manifest_row(folder, det, file_rows)
+                    with profiler.stage("disk"):
+                        save_manifest_row(folder, det, file_rows)
 
                     if args.limit > 0 and total_rows >= args.limit:
                         return "stop"
@@ -388,17 +411,19 @@ def main():
 
     for r in regs:
         print(f"\n=== Регион {str(r).zfill(2)} ===")
-        day = start
-        while day.date() <= now.date():
-            d = fmt_date(day)
-            res = scan_day(r, d, "PRIZ", DOC_TYPES_44)
-            if res == "stop": break
-            if args.include223:
-                res = scan_day(r, d, "RI223", DOC_TYPES_223)
+        with profiler.region(f"{r:02d}"):
+            day = start
+            while day.date() <= now.date():
+                d = fmt_date(day)
+                res = scan_day(r, d, "PRIZ", DOC_TYPES_44)
                 if res == "stop": break
-            if args.limit > 0 and total_rows >= args.limit: break
-            day += dt.timedelta(days=1)
-            time.sleep(args.sleep)
+                if args.include223:
+                    res = scan_day(r, d, "RI223", DOC_TYPES_223)
+                    if res == "stop": break
+                if args.limit > 0 and total_rows >= args.limit: break
+                day += dt.timedelta(days=1)
+                with profiler.stage("sleep"):
+                    time.sleep(args.sleep)
         if args.limit > 0 and total_rows >= args.limit: break
 
     if total_rows == 0:
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Запись и воспроизведение ответов ЕИС (--record DIR / --replay DIR в downloader.py).
+
+RecordingSession — обычная requests.Session, которая дополнительно складывает
+каждый ответ ЕИС (SOAP getDocsIP и ZIP по archiveUrl) в каталог.
+ReplaySession — отдаёт те же ответы с диска, в ЕИС не ходит вообще.
+
+Ключ записи — метод + URL + тело запроса без «шумных» полей SOAP
+(<id>, <createDateTime>, токен), поэтому повторный прогон с теми же
+параметрами (регион, дата, тип документа, номер) попадает в ту же запись.
+Запросы не к *.zakupki.gov.ru (проверка существующих закупок и т.п.) не пишутся
+и в режиме воспроизведения идут в сеть как обычно.
+
+Структура каталога:
+<DIR>/
+    run.json                 # параметры записанного прогона (дата «сейчас» и т.п.)
+    <hh>/<sha256>.json       # метаданные ответа: ключ, HTTP-статус, Content-Type
+    <hh>/<sha256>.bin        # тело ответа как есть
+"""
+
+import datetime as dt
+import hashlib
+import json
+import os
+import re
+import uuid
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+
+EIS_HOST_SUFFIX = "zakupki.gov.ru"
+
+_NOISE_RE = [
+    re.compile(rb"<id>[^<]*</id>"),
+    re.compile(rb"<createDateTime>[^<]*</createDateTime>"),
+    re.compile(rb"<individualPerson_token>[^<]*</individualPerson_token>"),
+]
+
+
+def is_eis_url(url: str) -> bool:
+    host = urlparse(url).hostname or ""
+    return host == EIS_HOST_SUFFIX or host.endswith("." + EIS_HOST_SUFFIX)
+
+
+def request_key(method: str, url: str, data) -> str:
+    body = data or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    for rx in _NOISE_RE:
+        body = rx.sub(b"", body)
+    h = hashlib.sha256()
+    h.update(method.upper().encode("ascii"))
+    h.update(b" ")
+    h.update(url.encode("utf-8"))
+    h.update(b"\n")
+    h.update(body)
+    return h.hexdigest()
+
+
+class ResponseStore:
+    def __init__(self, root: Path | str):
+        self.root = Path(root)
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        folder = self.root / key[:2]
+        return folder / f"{key}.json", folder / f"{key}.bin"
+
+    def save(self, key: str, method: str, url: str, resp: requests.Response) -> None:
+        meta_path, body_path = self._paths(key)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = body_path.with_name(f".{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(resp.content)
+        os.replace(tmp, body_path)
+        meta_path.write_text(json.dumps({
+            "method": method.upper(),
+            "url": url,
+            "status": resp.status_code,
+            "contentType": resp.headers.get("Content-Type", ""),
+            "bytes": len(resp.content),
+        }, ensure_ascii=False), encoding="utf-8")
+
+    def load(self, key: str) -> requests.Response | None:
+        meta_path, body_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        resp = requests.Response()
+        resp.status_code = int(meta.get("status", 200))
+        resp._content = body
+        resp.url = meta.get("url", "")
+        if meta.get("contentType"):
+            resp.headers["Content-Type"] = meta["contentType"]
+        return resp
+
+    def save_run(self, info: dict) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / "run.json").write_text(json.dumps(info, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    def load_run(self) -> dict:
+        try:
+            return json.loads((self.root / "run.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+
+class RecordingSession(requests.Session):
+    def __init__(self, store: ResponseStore):
+        super().__init__()
+        self.store = store
+
+    def request(self, method, url, *args, **kwargs):
+        resp = super().request(method, url, *args, **kwargs)
+        if is_eis_url(url) and resp.status_code < 500:
+            self.store.save(request_key(method, url, kwargs.get("data")), method, url, resp)
+        return resp
+
+
+class ReplayMiss(requests.ConnectionError):
+    """В записи нет ответа на этот запрос (в режиме воспроизведения сети нет)."""
+
+
+class ReplaySession(requests.Session):
+    def __init__(self, store: ResponseStore):
+        super().__init__()
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    def request(self, method, url, *args, **kwargs):
+        if not is_eis_url(url):
+            return super().request(method, url, *args, **kwargs)
+        resp = self.store.load(request_key(method, url, kwargs.get("data")))
+        if resp is None:
+            self.misses += 1
+            raise ReplayMiss(f"нет записанного ответа для {method.upper()} {url}")
+        self.hits += 1
+        return resp
+
+
+def run_now(store: ResponseStore, default: dt.datetime) -> dt.datetime:
+    """
+    «Текущий момент» записанного прогона — чтобы при воспроизведении
+    перебрать те же суточные окна, что и при записи.
+    """
+    value = store.load_run().get("now")
+    if not value:
+        return default
+    try:
+        return dt.datetime.fromisoformat(value)
+    except ValueError:
+        return default
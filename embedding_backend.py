@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Выбор движка инференса модели эмбеддингов (index.py, search.py, pyfavorite_search.py,
+pyquery_vector.py, encode_pool.py).
+
+EMBEDDING_BACKEND:
+    torch      — обычный SentenceTransformer (fp32, как раньше; по умолчанию)
+    torch-opt  — torch.inference_mode + SDPA-внимание (attn_implementation="sdpa")
+    int8       — динамическая int8-квантизация nn.Linear (torch.ao.quantization), только CPU
+    onnx       — ONNX Runtime по экспортированному графу (fp32)
+    onnx-int8  — ONNX Runtime, динамически квантованный int8-граф
+
+ONNX-графы готовятся заранее командой export и лежат в EMBEDDING_ONNX_DIR
+(по умолчанию onnx_models/<имя модели>):
+
+    python embedding_backend.py export --model sentence-transformers/paraphrase-multilingual-mpnet-base-v2
+    python embedding_backend.py drift --backend onnx-int8 --sentences 500
+
+drift кодирует одни и те же тексты эталоном (torch fp32) и выбранным движком и печатает
+косинусную близость векторов, совпадение top-10 соседей, время на текст и прирост
+памяти процесса после загрузки модели.
+
+Для onnx/onnx-int8 нужны sentence-transformers>=3.2 и optimum[onnxruntime].
+
+EMBEDDING_MAX_SEQ_LENGTH — предел длины в токенах (длинные PurchaseObjectInfo
+обрезаются; 0 — как задано в модели). Внутри одного encode() SentenceTransformer
+сам сортирует тексты по длине; length_order() нужен там, где пачку режут на куски
+до модели (encode_pool.py), — чтобы в кусок попадали тексты близкой длины
+и короткие не добивались паддингом до длинных.
+"""
+
+import argparse
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, List, Optional
+
+import numpy as np
+
+BACKENDS = ("torch", "torch-opt", "int8", "onnx", "onnx-int8")
+DEFAULT_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+ONNX_ROOT = Path(os.environ.get("EMBEDDING_ONNX_DIR", "onnx_models"))
+ONNX_FP32_FILE = "onnx/model.onnx"
+DEFAULT_QUANTIZATION = os.environ.get("EMBEDDING_ONNX_QUANTIZATION", "avx2")
+MAX_SEQ_LENGTH = int(os.environ.get("EMBEDDING_MAX_SEQ_LENGTH", "0"))
+
+
+def onnx_dir_for(model_name: str, root: Path = ONNX_ROOT) -> Path:
+    return Path(root) / re.sub(r"[^\w.-]+", "__", model_name)
+
+
+def onnx_int8_file(quantization: str = DEFAULT_QUANTIZATION) -> str:
+    return f"onnx/model_qint8_{quantization}.onnx"
+
+
+def encoder_key(model_name: str, backend: Optional[str] = None, max_seq_length: Optional[int] = None) -> str:
+    """
+    Имя модели вместе с движком, квантизацией и пределом длины — ключ кэша эмбеддингов
+    (embedding_cache.py): векторы int8/ONNX и обрезанных текстов отличаются от fp32.
+    """
+    backend = backend or DEFAULT_BACKEND
+    max_seq_length = MAX_SEQ_LENGTH if max_seq_length is None else max_seq_length
+    if backend == "onnx-int8":
+        backend = f"{backend}-{DEFAULT_QUANTIZATION}"
+    return f"{model_name}|{backend}|{max_seq_length or 'default'}"
+
+
+class InferenceModeEncoder:
+    """SentenceTransformer, у которого encode() выполняется под torch.inference_mode()."""
+
+    def __init__(self, model: Any):
+        self.model = model
+
+    def encode(self, *args, **kwargs):
+        import torch
+
+        with torch.inference_mode():
+            return self.model.encode(*args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self.model, name)
+
+
+def length_order(texts: List[str]) -> np.ndarray:
+    """Индексы texts от длинных к коротким (стабильно) — как сортирует сам SentenceTransformer."""
+    return np.argsort([-len(t) for t in texts], kind="stable")
+
+
+def load_encoder(
+    model_name: str,
+    backend: Optional[str] = None,
+    device: Optional[str] = None,
+    max_seq_length: Optional[int] = None,
+) -> Any:
+    """Модель с интерфейсом SentenceTransformer.encode() на выбранном движке."""
+    from sentence_transformers import SentenceTransformer
+
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный EMBEDDING_BACKEND={backend!r}, ожидается один из {', '.join(BACKENDS)}")
+    max_seq_length = MAX_SEQ_LENGTH if max_seq_length is None else max_seq_length
+    print(f"[MODEL] {model_name}: движок {backend}, устройство {device or 'auto'}"
+          + (f", max_seq_length {max_seq_length}" if max_seq_length else ""))
+
+    if backend == "torch":
+        model = SentenceTransformer(model_name, device=device)
+    elif backend == "torch-opt":
+        model = SentenceTransformer(model_name, device=device, model_kwargs={"attn_implementation": "sdpa"})
+    elif backend == "int8":
+        import torch
+
+        model = SentenceTransformer(model_name, device="cpu")
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    else:
+        path = onnx_dir_for(model_name)
+        file_name = ONNX_FP32_FILE if backend == "onnx" else onnx_int8_file()
+        if not (path / file_name).exists():
+            raise FileNotFoundError(
+                f"нет {path / file_name}; сначала: python embedding_backend.py export --model {model_name}"
+            )
+        model = SentenceTransformer(str(path), device="cpu", backend="onnx", model_kwargs={"file_name": file_name})
+
+    if max_seq_length:
+        model.max_seq_length = max_seq_length
+    return InferenceModeEncoder(model) if backend in ("torch-opt", "int8") else model
+
+
+def export_onnx(model_name: str, quantization: str = DEFAULT_QUANTIZATION, root: Path = ONNX_ROOT) -> Path:
+    """Экспорт в ONNX (fp32) и динамически квантованный int8-граф рядом с ним."""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    out = onnx_dir_for(model_name, root)
+    model = SentenceTransformer(model_name, device="cpu", backend="onnx")   # экспорт при загрузке
+    model.save_pretrained(str(out))
+    export_dynamic_quantized_onnx_model(model, quantization, str(out))
+    for name in (ONNX_FP32_FILE, onnx_int8_file(quantization)):
+        f = out / name
+        print(f"[EXPORT] {f} ({f.stat().st_size / 2**20:.0f} MiB)" if f.exists() else f"[EXPORT] нет {f}")
+    return out
+
+
+# ======= ОТЧЁТ О РАСХОЖДЕНИИ =======
+
+def _rss_mib() -> float:
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(model_name: str, backend: str, texts: List[str], batch_size: int) -> tuple:
+    before = _rss_mib()
+    model = load_encoder(model_name, backend, device="cpu")
+    loaded = _rss_mib() - before
+    model.encode(texts[:batch_size], batch_size=batch_size, show_progress_bar=False)   # прогрев
+    started = time.perf_counter()
+    vectors = model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
+    elapsed = time.perf_counter() - started
+    return np.asarray(vectors, dtype=np.float32), elapsed, loaded
+
+
+def _unit(m: np.ndarray) -> np.ndarray:
+    return m / (np.linalg.norm(m, axis=1, keepdims=True) + 1e-12)
+
+
+def drift_report(model_name: str, backend: str, texts: List[str], batch_size: int = 32, k: int = 10) -> dict:
+    base, base_time, base_mem = _measure(model_name, "torch", texts, batch_size)
+    cand, cand_time, cand_mem = _measure(model_name, backend, texts, batch_size)
+
+    b, c = _unit(base), _unit(cand)
+    cos = np.sum(b * c, axis=1)
+    k = min(k, len(texts) - 1)
+    overlap = 0.0
+    if k > 0:
+        def neighbours(m: np.ndarray) -> np.ndarray:
+            sims = m @ m.T
+            np.fill_diagonal(sims, -np.inf)
+            return np.argsort(-sims, axis=1)[:, :k]
+
+        nb, nc = neighbours(b), neighbours(c)
+        overlap = float(np.mean([len(set(x) & set(y)) / k for x, y in zip(nb, nc)]))
+
+    report = {
+        "texts": len(texts),
+        "cos_mean": float(cos.mean()),
+        "cos_min": float(cos.min()),
+        "max_abs_diff": float(np.abs(base - cand).max()),
+        f"top{k}_overlap": overlap,
+        "ms_per_text_fp32": base_time * 1000 / len(texts),
+        "ms_per_text": cand_time * 1000 / len(texts),
+        "speedup": base_time / max(cand_time, 1e-9),
+        "rss_mib_fp32": base_mem,
+        "rss_mib": cand_mem,
+    }
+    print(f"[DRIFT] {model_name}: {backend} против torch fp32 на {len(texts)} текстах")
+    print(f"[DRIFT] косинус: средний {report['cos_mean']:.5f}, минимальный {report['cos_min']:.5f}; "
+          f"max |Δ| {report['max_abs_diff']:.4f}; совпадение top-{k} соседей {overlap:.1%}")
+    print(f"[DRIFT] время на текст: {report['ms_per_text_fp32']:.2f} мс -> {report['ms_per_text']:.2f} мс "
+          f"(x{report['speedup']:.2f}); память модели: {base_mem:.0f} MiB -> {cand_mem:.0f} MiB")
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from encode_pool import sample_texts
+
+    ap = argparse.ArgumentParser(description="Движки инференса модели эмбеддингов")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="экспорт модели в ONNX (fp32 + int8)")
+    ex.add_argument("--model", default="sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
+    ex.add_argument("--quantization", default=DEFAULT_QUANTIZATION,
+                    choices=("arm64", "avx2", "avx512", "avx512_vnni"), help="набор инструкций для int8")
+    ex.add_argument("--out", default=str(ONNX_ROOT), help="корневой каталог ONNX-моделей")
+    dr = sub.add_parser("drift", help="расхождение векторов и скорость против torch fp32")
+    dr.add_argument("--model", default="sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
+    dr.add_argument("--backend", choices=BACKENDS[1:], default="onnx-int8")
+    dr.add_argument("--texts", help="файл с текстами, по одному в строке (иначе — синтетические)")
+    dr.add_argument("--sentences", type=int, default=500)
+    dr.add_argument("--batch-size", type=int, default=32)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "export":
+        export_onnx(args.model, args.quantization, Path(args.out))
+        return
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()][:args.sentences]
+    else:
+        texts = sample_texts(args.sentences)
+    drift_report(args.model, args.backend, texts, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
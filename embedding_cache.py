@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Кэш эмбеддингов по (модель, sha256 содержимого закупки) — SQLite-файл рядом с индексатором.
+"Модель" — embedding_backend.encoder_key(): имя вместе с движком и max_seq_length.
+
+Одно и то же содержимое закупки встречается много раз (многолотовые копии, повторные
+публикации, одинаковые описания ОКПД2), а модель на CPU — самое дорогое место
+индексации. encode_cached() отдаёт векторы из кэша, дубликаты внутри пачки
+считает один раз и кладёт в кэш только новые.
+
+Ключ — хеш текста без номера закупки (index.content_hash): номер уникален, и с ним копии
+никогда не совпали бы. Вектор копии поэтому берётся у первой закупки с тем же
+содержимым, посчитанный по её полному тексту, — номер в нём лишь несколько токенов
+из сотен. TextHash в NoticeEmbeddings (обнаружение изменений) по-прежнему считается
+по полному тексту.
+
+Кэш ограничен: prune() удаляет записи, к которым не обращались дольше
+EMBEDDING_CACHE_MAX_AGE_DAYS, а затем самые давние сверх EMBEDDING_CACHE_MAX_ROWS
+(по умолчанию 30 дней и 200 000 векторов, ~600 МБ для 768 float32); вызывается при
+открытии и после каждых PRUNE_EVERY новых записей.
+
+Векторы хранятся как float32 (np.ndarray.tobytes()), чтение — np.frombuffer без копирования.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, List
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite")
+MAX_ROWS = int(os.environ.get("EMBEDDING_CACHE_MAX_ROWS", "200000"))
+MAX_AGE_DAYS = float(os.environ.get("EMBEDDING_CACHE_MAX_AGE_DAYS", "30"))
+PRUNE_EVERY = 5000
+
+# прежняя таблица embeddings была по хешу полного текста (с номером) — не нужна
+_SCHEMA = """
+DROP TABLE IF EXISTS embeddings;
+CREATE TABLE IF NOT EXISTS vectors (
+    model TEXT NOT NULL,
+    content_hash BLOB NOT NULL,
+    dims INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    used_at INTEGER NOT NULL,
+    PRIMARY KEY (model, content_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS IX_vectors_used_at ON vectors (used_at);
+"""
+
+
+class EmbeddingCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, model_name: str = "",
+                 max_rows: int = MAX_ROWS, max_age_days: float = MAX_AGE_DAYS):
+        self.path = path
+        self.model_name = model_name
+        self.max_rows = max_rows
+        self.max_age_days = max_age_days
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._since_prune = 0
+        self.hits = 0
+        self.misses = 0
+        self.prune()
+
+    def get_many(self, hashes: List[bytes]) -> dict:
+        """content_hash -> np.ndarray(float32) для найденных; отметка used_at у найденных."""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for i in range(0, len(unique), 500):
+                chunk = unique[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT content_hash, dims, vector FROM vectors "
+                    f"WHERE model = ? AND content_hash IN ({','.join('?' * len(chunk))})",
+                    [self.model_name, *chunk],
+                ).fetchall()
+                for h, dims, blob in rows:
+                    found[bytes(h)] = np.frombuffer(blob, dtype=np.float32, count=dims)
+            if found:
+                now = int(time.time())
+                self._conn.executemany("UPDATE vectors SET used_at = ? WHERE model = ? AND content_hash = ?",
+                                       [(now, self.model_name, h) for h in found])
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: List[tuple]) -> None:
+        """[(content_hash, vector)]"""
+        now = int(time.time())
+        rows = []
+        for h, vec in items:
+            arr = np.ascontiguousarray(vec, dtype=np.float32)
+            rows.append((self.model_name, h, arr.shape[0], arr.tobytes(), now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (model, content_hash, dims, vector, used_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self._since_prune += len(rows)
+            due = self._since_prune >= PRUNE_EVERY
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """Удалить давно не использованные и самые давние сверх max_rows; возвращает число удалённых."""
+        with self._lock:
+            self._since_prune = 0
+            cutoff = int(time.time() - self.max_age_days * 86400)
+            removed = self._conn.execute("DELETE FROM vectors WHERE used_at < ?", (cutoff,)).rowcount
+            extra = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0] - self.max_rows
+            if extra > 0:
+                removed += self._conn.execute(
+                    "DELETE FROM vectors WHERE (model, content_hash) IN "
+                    "(SELECT model, content_hash FROM vectors ORDER BY used_at LIMIT ?)",
+                    (extra,),
+                ).rowcount
+            self._conn.commit()
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def encode_cached(
+    texts: List[str],
+    hashes: List[bytes],
+    encode: Callable[[List[str]], np.ndarray],
+    cache: "EmbeddingCache | None" = None,
+) -> np.ndarray:
+    """
+    Эмбеддинги для texts (в том же порядке); hashes — ключи кэша (content_hash).
+    encode(list_of_texts) вызывается только для первого текста каждого ключа,
+    которого нет в кэше.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    cached = cache.get_many(hashes) if cache is not None else {}
+
+    # уникальные тексты без вектора в кэше — в порядке первого появления
+    todo: dict = {}
+    for text, h in zip(texts, hashes):
+        if h not in cached and h not in todo:
+            todo[h] = text
+
+    fresh = {}
+    if todo:
+        vectors = np.asarray(encode(list(todo.values())), dtype=np.float32)
+        fresh = dict(zip(todo.keys(), vectors))
+        if cache is not None:
+            cache.put_many(list(fresh.items()))
+
+    if cache is not None:
+        cache.hits += sum(1 for h in hashes if h in cached)
+        cache.misses += len(fresh)
+
+    return np.stack([cached[h] if h in cached else fresh[h] for h in hashes])
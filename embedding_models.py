@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Несколько моделей эмбеддингов в NoticeEmbeddings и переключение поиска между ними
+(index.py, search.py, pyfavorite_search.py).
+
+Реестр — таблица EmbeddingModels:
+    Name        — значение NoticeEmbeddings.Source и имя отметки в IndexerState,
+    ModelName   — модель SentenceTransformer,
+    Dimensions  — размерность вектора,
+    State       — building (строится фоном) / active (по ней ищут) / retired.
+Активная модель ровно одна (фильтрованный уникальный индекс). При первом запуске
+в реестр записывается прежний индексатор (INDEXER_NAME, mpnet) как active.
+
+Эмбеддинги разных моделей лежат рядом — по строке на (NoticeId, Source); запись одной
+модели не удаляет строки других зарегистрированных. Разная размерность в одной
+колонке возможна только при varbinary-колонке Vector (vector_codec.py), VECTOR(n)
+принимает одну размерность — register это проверяет.
+
+Миграция на новую модель без остановки поиска:
+
+    python embedding_models.py register --name rosberta --model ai-forever/ru-en-RoSBERTa --dims 1024
+    python index.py --source rosberta --daemon --rate 20 --cutover
+    python embedding_models.py status
+    python embedding_models.py purge --name python-indexer      # когда старая не нужна
+
+index.py --source строит эмбеддинги новой модели фоном по своей отметке (все Notice
+по RowVer, не быстрее --rate закупок/с — чтобы не нагружать БД), правки во время
+миграции подхватываются той же отметкой. Когда отметка догнала изменения и у каждой
+Notice есть вектор новой модели, --cutover одним UPDATE делает её active, а прежнюю —
+retired: search.py и pyfavorite_search.py на следующем запросе берут новую модель и её
+строки, старые строки остаются до purge. Демон старой модели, увидев retired, завершается;
+дальше новые закупки индексирует демон новой модели, уже без ограничения скорости.
+Откат — register прежнего имени (снова building) и cutover на него.
+"""
+
+import argparse
+import os
+import time
+from collections import namedtuple
+from typing import Any, List, Optional, Tuple
+
+BUILDING = "building"
+ACTIVE = "active"
+RETIRED = "retired"
+
+DEFAULT_SOURCE = os.environ.get("INDEXER_NAME", "python-indexer")
+
+ModelInfo = namedtuple("ModelInfo", "name model dims state")
+
+
+def ensure_model_schema(cursor: Any, default: ModelInfo) -> None:
+    """Таблица реестра; в пустую записывается default как активная модель."""
+    cursor.execute("""
+    IF OBJECT_ID('dbo.EmbeddingModels') IS NULL
+        CREATE TABLE [EmbeddingModels] (
+            Name nvarchar(100) NOT NULL PRIMARY KEY,
+            ModelName nvarchar(200) NOT NULL,
+            Dimensions int NOT NULL,
+            State nvarchar(20) NOT NULL,
+            CreatedAt datetime2 NOT NULL,
+            ActivatedAt datetime2 NULL
+        );
+    """)
+    cursor.execute("""
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_EmbeddingModels_Active'
+                   AND object_id = OBJECT_ID('dbo.EmbeddingModels'))
+        CREATE UNIQUE INDEX UX_EmbeddingModels_Active ON [EmbeddingModels] (State) WHERE State = 'active';
+    """)
+    cursor.execute(
+        """
+        IF NOT EXISTS (SELECT 1 FROM [EmbeddingModels])
+            INSERT INTO [EmbeddingModels] (Name, ModelName, Dimensions, State, CreatedAt, ActivatedAt)
+            VALUES (?, ?, ?, 'active', SYSUTCDATETIME(), SYSUTCDATETIME());
+        """,
+        (default.name, default.model, default.dims),
+    )
+
+
+def list_models(cursor: Any) -> List[ModelInfo]:
+    cursor.execute("SELECT Name, ModelName, Dimensions, State FROM [EmbeddingModels] ORDER BY CreatedAt")
+    return [ModelInfo(r[0], r[1], int(r[2]), r[3]) for r in cursor.fetchall()]
+
+
+def get_model(cursor: Any, name: str) -> Optional[ModelInfo]:
+    cursor.execute("SELECT Name, ModelName, Dimensions, State FROM [EmbeddingModels] WHERE Name = ?", (name,))
+    r = cursor.fetchone()
+    return ModelInfo(r[0], r[1], int(r[2]), r[3]) if r else None
+
+
+def active_model(cursor: Any, default: ModelInfo) -> ModelInfo:
+    """Модель, по которой сейчас ищут; без реестра (индексатор ещё не запускался) — default."""
+    cursor.execute("""
+    IF OBJECT_ID('dbo.EmbeddingModels') IS NOT NULL
+        SELECT Name, ModelName, Dimensions, State FROM [EmbeddingModels] WHERE State = 'active';
+    ELSE
+        SELECT NULL, NULL, NULL, NULL WHERE 1 = 0;
+    """)
+    r = cursor.fetchone()
+    return ModelInfo(r[0], r[1], int(r[2]), r[3]) if r else default
+
+
+def vector_column_dims(cursor: Any) -> Optional[int]:
+    """Размерность колонки NoticeEmbeddings.Vector типа VECTOR(n); None — varbinary (любая)."""
+    cursor.execute(
+        "SELECT TYPE_NAME(system_type_id), max_length FROM sys.columns "
+        "WHERE object_id = OBJECT_ID('dbo.NoticeEmbeddings') AND name = 'Vector'"
+    )
+    r = cursor.fetchone()
+    if not r or str(r[0]).lower() != "vector":
+        return None
+    return (int(r[1]) - 8) // 4          # 8 байт заголовка + float32 на элемент
+
+
+def register_model(cursor: Any, name: str, model: str, dims: int) -> ModelInfo:
+    """Новая модель (или повторно — выведенная) в состоянии building."""
+    column_dims = vector_column_dims(cursor)
+    if column_dims is not None and column_dims != dims:
+        raise ValueError(
+            f"Колонка NoticeEmbeddings.Vector — VECTOR({column_dims}), модель {model} даёт {dims}; "
+            f"модели разной размерности живут рядом только в varbinary-колонке (vector_codec.py)"
+        )
+    current = get_model(cursor, name)
+    if current is None:
+        cursor.execute(
+            "INSERT INTO [EmbeddingModels] (Name, ModelName, Dimensions, State, CreatedAt) "
+            "VALUES (?, ?, ?, 'building', SYSUTCDATETIME())",
+            (name, model, dims),
+        )
+    elif current.state == ACTIVE:
+        raise ValueError(f"{name} — активная модель")
+    elif (current.model, current.dims) != (model, dims):
+        raise ValueError(f"{name} уже зарегистрирована как {current.model} ({current.dims}); выберите другое имя")
+    else:
+        cursor.execute("UPDATE [EmbeddingModels] SET State = 'building' WHERE Name = ?", (name,))
+    return ModelInfo(name, model, dims, BUILDING)
+
+
+def coverage(cursor: Any, name: str) -> Tuple[int, int]:
+    """(Notice без эмбеддинга модели name, всего Notice)."""
+    cursor.execute(
+        """
+        SELECT
+            (SELECT COUNT_BIG(*) FROM [Notices] AS n
+             WHERE NOT EXISTS (SELECT 1 FROM [NoticeEmbeddings] AS e
+                               WHERE e.NoticeId = n.Id AND e.Source = ?)),
+            (SELECT COUNT_BIG(*) FROM [Notices])
+        """,
+        (name,),
+    )
+    r = cursor.fetchone()
+    return int(r[0]), int(r[1])
+
+
+def cutover(cursor: Any, name: str, force: bool = False) -> None:
+    """
+    Сделать name активной, прежнюю активную — retired, одним UPDATE (в транзакции
+    вызывающего). Без force — только при полном покрытии.
+    """
+    info = get_model(cursor, name)
+    if info is None:
+        raise ValueError(f"Модель {name} не зарегистрирована")
+    if info.state == ACTIVE:
+        return
+    missing, total = coverage(cursor, name)
+    if missing and not force:
+        raise ValueError(f"У {name} нет эмбеддингов для {missing} из {total} Notice")
+    cursor.execute(
+        """
+        UPDATE [EmbeddingModels]
+        SET State = CASE WHEN Name = ? THEN 'active' ELSE 'retired' END,
+            ActivatedAt = CASE WHEN Name = ? THEN SYSUTCDATETIME() ELSE ActivatedAt END
+        WHERE Name = ? OR State = 'active'
+        """,
+        (name, name, name),
+    )
+    print(f"[MODELS] поиск переключён на {name} ({info.model}), без эмбеддинга: {missing} из {total}")
+
+
+def purge_model(conn: Any, name: str, chunk: int = 5000, pause: float = 1.0) -> int:
+    """
+    Удалить эмбеддинги выведенной модели порциями по chunk строк, каждая — своей
+    транзакцией, с паузой между ними (журнал и блокировки не растут, поиск не ждёт).
+    """
+    cursor = conn.cursor()
+    info = get_model(cursor, name)
+    if info is None or info.state != RETIRED:
+        raise ValueError(f"Удалять можно только эмбеддинги выведенной (retired) модели, {name}: "
+                         f"{info.state if info else 'не зарегистрирована'}")
+    deleted = 0
+    while True:
+        cursor.execute(f"DELETE TOP ({chunk}) FROM [NoticeEmbeddings] WHERE Source = ?", (name,))
+        count = cursor.rowcount
+        conn.commit()
+        if count <= 0:
+            break
+        deleted += count
+        print(f"[MODELS] {name}: удалено {deleted}")
+        time.sleep(pause)
+    return deleted
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from index import APPSETTINGS_PATH, get_db_connection, load_connection_string, load_watermark
+
+    ap = argparse.ArgumentParser(description="Модели эмбеддингов в NoticeEmbeddings")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status", help="модели, состояние, покрытие и отметки")
+    reg = sub.add_parser("register", help="добавить модель для фоновой индексации (building)")
+    reg.add_argument("--name", required=True, help="значение NoticeEmbeddings.Source")
+    reg.add_argument("--model", required=True)
+    reg.add_argument("--dims", type=int, required=True)
+    cut = sub.add_parser("cutover", help="переключить поиск на модель")
+    cut.add_argument("--name", required=True)
+    cut.add_argument("--force", action="store_true", help="даже при неполном покрытии")
+    pur = sub.add_parser("purge", help="удалить эмбеддинги выведенной модели порциями")
+    pur.add_argument("--name", required=True)
+    pur.add_argument("--chunk", type=int, default=5000)
+    pur.add_argument("--pause", type=float, default=1.0, help="секунд между порциями")
+    args = ap.parse_args(argv)
+
+    conn = get_db_connection(load_connection_string(APPSETTINGS_PATH))
+    try:
+        cursor = conn.cursor()
+        if args.cmd == "status":
+            for info in list_models(cursor):
+                missing, total = coverage(cursor, info.name)
+                done = (total - missing) / total if total else 1.0
+                print(f"{info.name:20s} {info.state:9s} {info.model} ({info.dims}): "
+                      f"покрытие {done:.2%}, без эмбеддинга {missing} из {total}, "
+                      f"отметка 0x{load_watermark(cursor, info.name).hex()}")
+        elif args.cmd == "register":
+            info = register_model(cursor, args.name, args.model, args.dims)
+            conn.commit()
+            print(f"[MODELS] {info.name}: {info.model} ({info.dims}) — building; дальше: "
+                  f"python index.py --source {info.name} --daemon --rate 20 --cutover")
+        elif args.cmd == "cutover":
+            cutover(cursor, args.name, args.force)
+            conn.commit()
+        else:
+            purge_model(conn, args.name, args.chunk, args.pause)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
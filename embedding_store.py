@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Запись эмбеддингов в NoticeEmbeddings (index.py).
+
+upsert_embeddings_bulk() пишет пачку набором, а не построчно:
+    1) загрузка всей пачки во временную таблицу #EmbeddingStage: у pyodbc —
+       executemany с fast_executemany (массивная привязка параметров, пачка уходит
+       одним-несколькими пакетами TDS); у драйверов без этого флага (mssql_python)
+       executemany может идти по строке на round-trip, поэтому там — многострочные
+       INSERT ... VALUES (...), (...) по STAGE_ROWS_PER_INSERT строк;
+    2) один MERGE по (NoticeId, Source): есть строка — UPDATE вектора и хеша, нет — INSERT;
+    3) один DELETE эмбеддингов тех же NoticeId с другим Source, кроме keep_sources —
+       других моделей из реестра EmbeddingModels (embedding_models.py); без них, как и
+       построчный путь, на закупку остаётся одна запись.
+Вместо 2×N statement'ов на пачку — четыре (с mssql_python — три плюс N / STAGE_ROWS_PER_INSERT).
+
+Формат значения (vector_codec.py) зависит от типа колонки Vector (vector_column_format):
+VECTOR(...) принимает только JSON-текст ("json", конвертация на сервере одним MERGE),
+varbinary — компактный бинарный "float32"/"float16" без форматирования чисел.
+
+upsert_embeddings_rowwise() — прежний путь (DELETE + INSERT на каждую закупку),
+оставлен для сравнения.
+
+Замер на локальной SQLite вместо SQL Server (тот же код, диалект "sqlite"):
+
+    python embedding_store.py bench --rows 500 --batches 4 --latency-ms 0.5 --format float32
+
+--latency-ms добавляет задержку на каждый вызов execute/executemany — грубая
+модель сетевого round-trip до сервера, которого у локальной базы нет.
+"""
+
+import argparse
+import sqlite3
+import time
+import uuid
+from collections import namedtuple
+from typing import Any, List, Sequence
+
+import numpy as np
+
+from vector_codec import FLOAT32, FORMATS, JSON, encode_matrix
+
+DEFAULT_DIMENSIONS = 768
+
+# SQL Server: не больше 2100 параметров на запрос и 1000 строк в VALUES; у строки стейджа их 3
+STAGE_ROWS_PER_INSERT = 2000 // 3
+
+_MSSQL_BULK = {
+    "create": """
+    IF OBJECT_ID('tempdb..#EmbeddingStage') IS NULL
+        CREATE TABLE #EmbeddingStage (
+            NoticeId uniqueidentifier NOT NULL PRIMARY KEY,
+            Vector {stage_type} NOT NULL,
+            TextHash varbinary(32) NULL
+        );
+    """,
+    "clear": "TRUNCATE TABLE #EmbeddingStage",
+    "load": "INSERT INTO #EmbeddingStage (NoticeId, Vector, TextHash) VALUES (?, ?, ?)",
+    "merge": """
+    MERGE [NoticeEmbeddings] AS t
+    USING #EmbeddingStage AS s ON t.NoticeId = s.NoticeId AND t.Source = ?
+    WHEN MATCHED THEN
+        UPDATE SET Vector = {value}, TextHash = s.TextHash
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT (Id, NoticeId, Vector, Source, TextHash)
+        VALUES (NEWID(), s.NoticeId, {value}, ?, s.TextHash);
+    """,
+    "delete_other": """
+    DELETE e FROM [NoticeEmbeddings] AS e
+    JOIN #EmbeddingStage AS s ON s.NoticeId = e.NoticeId
+    WHERE e.Source <> ?{keep}
+    """,
+}
+
+# локальная замена SQL Server для замеров: те же шаги, синтаксис SQLite (UPSERT вместо MERGE)
+_SQLITE_BULK = {
+    "create": """
+    CREATE TEMP TABLE IF NOT EXISTS EmbeddingStage (
+        NoticeId TEXT NOT NULL PRIMARY KEY,
+        Vector {stage_type} NOT NULL,
+        TextHash BLOB
+    )
+    """,
+    "clear": "DELETE FROM EmbeddingStage",
+    "load": "INSERT INTO EmbeddingStage (NoticeId, Vector, TextHash) VALUES (?, ?, ?)",
+    "merge": """
+    INSERT INTO NoticeEmbeddings (Id, NoticeId, Vector, Source, TextHash)
+    SELECT lower(hex(randomblob(16))), s.NoticeId, {value}, ?, s.TextHash FROM EmbeddingStage AS s WHERE true
+    ON CONFLICT (NoticeId, Source) DO UPDATE SET Vector = excluded.Vector, TextHash = excluded.TextHash
+    """,
+    "delete_other": """
+    DELETE FROM NoticeEmbeddings
+    WHERE Source <> ?{keep} AND NoticeId IN (SELECT NoticeId FROM EmbeddingStage)
+    """,
+}
+
+_BULK_SQL = {"mssql": _MSSQL_BULK, "sqlite": _SQLITE_BULK}
+
+
+_STAGE_SQL = {
+    # (тип колонки Vector во временной таблице, выражение для записи в NoticeEmbeddings)
+    "mssql": {JSON: ("nvarchar(max)", "CAST(s.Vector AS VECTOR({dims}))"), "binary": ("varbinary(max)", "s.Vector")},
+    "sqlite": {JSON: ("TEXT", "s.Vector"), "binary": ("BLOB", "s.Vector")},
+}
+
+
+def vector_column_format(cursor: Any, binary_format: str = FLOAT32) -> str:
+    """
+    Формат значений для NoticeEmbeddings.Vector по типу колонки (SQL Server):
+    VECTOR — "json", varbinary — binary_format.
+    """
+    cursor.execute(
+        "SELECT TYPE_NAME(system_type_id) FROM sys.columns "
+        "WHERE object_id = OBJECT_ID('dbo.NoticeEmbeddings') AND name = 'Vector'"
+    )
+    row = cursor.fetchone()
+    type_name = str(row[0]).lower() if row and row[0] is not None else ""
+    return binary_format if type_name in ("varbinary", "binary", "image") else JSON
+
+
+def _check_dims(embeddings: np.ndarray, dims: int) -> None:
+    if embeddings.shape[1] != dims:
+        raise ValueError(
+            f"Размерность эмбеддинга {embeddings.shape[1]} не совпадает с ожидаемым значением {dims}"
+        )
+
+
+def enable_fast_executemany(cursor: Any) -> bool:
+    """
+    pyodbc: fast_executemany=True — параметры пачки привязываются массивами (SQLBindParameter
+    с массивами), без round-trip на строку. False — у курсора нет такого флага
+    (mssql_python, sqlite3), вызывающий сам решает, как грузить пачку.
+    """
+    if getattr(cursor, "fast_executemany", None) is None:
+        return False
+    try:
+        cursor.fast_executemany = True
+    except AttributeError:
+        return False
+    return True
+
+
+def _load_stage_multirow(cursor: Any, load_sql: str, params: List[tuple]) -> None:
+    """Загрузка стейджа многострочными INSERT ... VALUES — для драйверов без fast_executemany."""
+    head, values = load_sql.split(" VALUES ")
+    for i in range(0, len(params), STAGE_ROWS_PER_INSERT):
+        chunk = params[i:i + STAGE_ROWS_PER_INSERT]
+        cursor.execute(f"{head} VALUES {', '.join([values] * len(chunk))}",
+                       [value for row in chunk for value in row])
+
+
+def upsert_embeddings_rowwise(
+    cursor: Any,
+    rows: List[Any],
+    embeddings: np.ndarray,
+    hashes: List[bytes],
+    source: str,
+    dims: int = DEFAULT_DIMENSIONS,
+    vector_format: str = JSON,
+):
+    """
+    Прежний путь, для сравнения. Для каждого Notice:
+      - удаляем старую запись по NoticeId,
+      - вставляем новую с вектором.
+    """
+    _check_dims(embeddings, dims)
+    values = encode_matrix(embeddings, vector_format)
+
+    insert_sql = """
+    INSERT INTO [NoticeEmbeddings] (
+        Id,
+        NoticeId,
+        Vector,
+        Source,
+        TextHash
+    ) VALUES (?, ?, ?, ?, ?)
+    """
+
+    delete_sql = """
+    DELETE FROM [NoticeEmbeddings]
+    WHERE NoticeId = ?
+    """
+
+    for row, vector_for_sql, h in zip(rows, values, hashes):
+        notice_id = row.Id
+        embedding_id = uuid.uuid4()
+
+        cursor.execute(delete_sql, (str(notice_id),))
+
+        cursor.execute(
+            insert_sql,
+            (
+                str(embedding_id),
+                str(notice_id),
+                vector_for_sql,
+                source,
+                h,
+            ),
+        )
+
+
+def upsert_embeddings_bulk(
+    cursor: Any,
+    rows: List[Any],
+    embeddings: np.ndarray,
+    hashes: List[bytes],
+    source: str,
+    dims: int = DEFAULT_DIMENSIONS,
+    vector_format: str = JSON,
+    dialect: str = "mssql",
+    keep_sources: Sequence[str] = (),
+):
+    """
+    Пачка эмбеддингов за четыре statement'а: загрузка во временную таблицу + MERGE + DELETE.
+    Работает в текущей транзакции вызывающего (commit делает index.py вместе с отметкой).
+    Строки тех же NoticeId с Source из keep_sources (другие модели) не удаляются.
+    """
+    if not rows:
+        return
+    _check_dims(embeddings, dims)
+    sql = _BULK_SQL[dialect]
+    stage_type, value = _STAGE_SQL[dialect][JSON if vector_format == JSON else "binary"]
+    value = value.format(dims=dims)
+
+    # NoticeId — первичный ключ временной таблицы; при повторе в пачке побеждает последний
+    staged = {}
+    for row, vec, h in zip(rows, encode_matrix(embeddings, vector_format), hashes):
+        staged[str(row.Id)] = (str(row.Id), vec, h)
+
+    # временная таблица живёт до конца соединения: тип колонки не меняется между пачками
+    cursor.execute(sql["create"].format(stage_type=stage_type))
+    cursor.execute(sql["clear"])
+    if enable_fast_executemany(cursor) or dialect != "mssql":
+        cursor.executemany(sql["load"], list(staged.values()))     # sqlite3 — в процессе, без сети
+    else:
+        _load_stage_multirow(cursor, sql["load"], list(staged.values()))
+    cursor.execute(sql["merge"].format(value=value), (source, source) if dialect == "mssql" else (source,))
+    keep = [s for s in keep_sources if s != source]
+    keep_sql = ""
+    if keep:
+        column = "e.Source" if dialect == "mssql" else "Source"
+        keep_sql = f" AND {column} NOT IN ({', '.join('?' * len(keep))})"
+    cursor.execute(sql["delete_other"].format(keep=keep_sql), (source, *keep))
+
+
+# ======= ЗАМЕР =======
+
+_BenchRow = namedtuple("_BenchRow", "Id")
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS NoticeEmbeddings (
+    Id TEXT NOT NULL PRIMARY KEY,
+    NoticeId TEXT NOT NULL,
+    Vector NOT NULL,
+    Source TEXT NOT NULL,
+    TextHash BLOB
+);
+CREATE UNIQUE INDEX IF NOT EXISTS IX_NoticeEmbeddings_NoticeId_Source ON NoticeEmbeddings (NoticeId, Source);
+"""
+
+
+class _RoundTripCursor:
+    """Обёртка курсора: считает вызовы и добавляет задержку «сети» на каждый."""
+
+    def __init__(self, cursor: Any, latency: float):
+        self._cursor = cursor
+        self.latency = latency
+        self.calls = 0
+
+    def _trip(self) -> None:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def execute(self, sql, params=()):
+        self._trip()
+        return self._cursor.execute(sql, params)
+
+    def executemany(self, sql, seq):
+        self._trip()
+        return self._cursor.executemany(sql, seq)
+
+
+def _bench_once(path: str, mode: str, fmt: str, batches: List[tuple], source: str, latency: float,
+                dims: int) -> tuple:
+    conn = sqlite3.connect(path)
+    conn.executescript("DROP TABLE IF EXISTS NoticeEmbeddings;" + _SQLITE_SCHEMA)
+    cursor = _RoundTripCursor(conn.cursor(), latency)
+    elapsed = []
+    try:
+        # проход 1 — первичная индексация, проход 2 — переиндексация тех же закупок
+        for _ in range(2):
+            started = time.perf_counter()
+            for rows, embeddings, hashes in batches:
+                if mode == "bulk":
+                    upsert_embeddings_bulk(cursor, rows, embeddings, hashes, source, dims, fmt, dialect="sqlite")
+                else:
+                    upsert_embeddings_rowwise(cursor, rows, embeddings, hashes, source, dims, fmt)
+                conn.commit()
+            elapsed.append(time.perf_counter() - started)
+        count = conn.execute("SELECT COUNT(*) FROM NoticeEmbeddings").fetchone()[0]
+    finally:
+        conn.close()
+    return elapsed, cursor.calls, count
+
+
+def bench(rows: int, batches: int, latency_ms: float, path: str, fmt: str = FLOAT32,
+          dims: int = DEFAULT_DIMENSIONS) -> None:
+    rng = np.random.default_rng(0)
+    data = []
+    for _ in range(batches):
+        ids = [_BenchRow(uuid.uuid4()) for _ in range(rows)]
+        data.append((ids, rng.standard_normal((rows, dims), dtype=np.float32), [rng.bytes(32) for _ in ids]))
+    total = rows * batches
+    print(f"[BENCH] {batches} пачек по {rows} векторов ({dims}), задержка round-trip {latency_ms} мс, база {path}")
+    for mode, mode_fmt in dict.fromkeys([("rowwise", JSON), ("bulk", JSON), ("bulk", fmt)]):
+        (first, second), calls, count = _bench_once(path, mode, mode_fmt, data, "bench", latency_ms / 1000.0, dims)
+        print(f"[BENCH] {mode:8s} {mode_fmt:8s}: вставка {total / first:8.0f} строк/с, обновление {total / second:8.0f} строк/с, "
+              f"вызовов {calls}, строк в таблице {count}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Запись эмбеддингов в NoticeEmbeddings: замер путей записи")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("bench", help="построчный путь против пачки на локальной SQLite")
+    b.add_argument("--rows", type=int, default=500, help="векторов в пачке (как DB_BATCH_SIZE)")
+    b.add_argument("--batches", type=int, default=4)
+    b.add_argument("--latency-ms", type=float, default=0.0, help="задержка на каждый вызов к базе")
+    b.add_argument("--db", default=":memory:", help="файл SQLite (по умолчанию в памяти)")
+    b.add_argument("--format", choices=FORMATS, default=FLOAT32, help="формат вектора для пачки")
+    args = ap.parse_args()
+    bench(args.rows, args.batches, args.latency_ms, args.db, args.format)
+
+
+if __name__ == "__main__":
+    main()
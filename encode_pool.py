@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Многопроцессное кодирование текстов на CPU (index.py, pyfavorite_search.py).
+
+Один процесс SentenceTransformer на многоядерной машине без GPU загружает ядра
+плохо: mpnet-подобная модель упирается в GIL, токенизатор и внутренние синхронизации
+intra-op пула. EncodePool запускает N процессов (spawn), в каждом — своя копия модели
+и torch.set_num_threads(threads) (плюс OMP/MKL_NUM_THREADS до импорта torch), чтобы
+процессы не делили ядра. Пачка текстов режется на куски, куски кодируются
+параллельно, результат собирается в исходном порядке. Движок модели в процессах —
+EMBEDDING_BACKEND (embedding_backend.py).
+
+    with EncodePool(MODEL_NAME, processes=4, threads=2) as pool:
+        vectors = pool.encode(texts)           # np.ndarray (N, D) float32
+
+Число процессов — ENCODE_PROCESSES (auto = ядра // ENCODE_THREADS), потоков на
+процесс — ENCODE_THREADS. Пул включается явно: без ENCODE_PROCESSES index.py и
+pyfavorite_search.py кодируют в одном процессе. Каждый процесс загружает свою копию
+модели (mpnet — около 1 ГБ RSS), так что память растёт линейно с числом процессов;
+auto на многоядерной машине рядом с SQL Server легко съедает десятки гигабайт.
+
+Замер (предложений в секунду при разном числе процессов):
+
+    python encode_pool.py bench --processes 1,2,4,8 --threads 1 --sentences 2000
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from embedding_backend import length_order
+
+DEFAULT_THREADS = int(os.environ.get("ENCODE_THREADS", "1"))
+
+_worker_model = None
+_worker_batch_size = 32
+
+
+def processes_from_env(default: str = "auto", threads: int = DEFAULT_THREADS) -> int:
+    """ENCODE_PROCESSES: число, 0 — без пула, auto — ядра // threads."""
+    value = os.environ.get("ENCODE_PROCESSES", default).strip().lower()
+    if value == "auto":
+        return max(1, (os.cpu_count() or 1) // max(1, threads))
+    return max(0, int(value))
+
+
+def _init_worker(model_name: str, threads: int, batch_size: int, backend: Optional[str]) -> None:
+    global _worker_model, _worker_batch_size
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    import torch
+
+    from embedding_backend import load_encoder
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # уже задано в этом процессе
+    _worker_model = load_encoder(model_name, backend, device="cpu")
+    _worker_batch_size = batch_size
+
+
+def _encode_chunk(texts: List[str]) -> np.ndarray:
+    vectors = _worker_model.encode(
+        texts,
+        batch_size=_worker_batch_size,
+        show_progress_bar=False,
+        convert_to_numpy=True,
+        normalize_embeddings=False,
+    )
+    return np.asarray(vectors, dtype=np.float32)
+
+
+class EncodePool:
+    def __init__(
+        self,
+        model_name: str,
+        processes: int,
+        threads: int = DEFAULT_THREADS,
+        batch_size: int = 32,
+        chunk_size: int = 128,
+        backend: Optional[str] = None,
+    ):
+        self.model_name = model_name
+        self.processes = max(1, processes)
+        self.threads = max(1, threads)
+        self.chunk_size = chunk_size
+        ctx = multiprocessing.get_context("spawn")
+        print(f"[ENCODE] пул {self.processes} процессов × {self.threads} потоков, модель {model_name}")
+        self._pool = ctx.Pool(
+            self.processes,
+            initializer=_init_worker,
+            initargs=(model_name, self.threads, batch_size, backend),
+        )
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # куски режем по отсортированным по длине текстам: в куске тексты близкой длины,
+        # паддинг не раздувает короткие; порядок восстанавливается после сборки
+        order = length_order(texts)
+        ordered = [texts[i] for i in order]
+        # кусков не меньше, чем процессов, но и не крупнее chunk_size — иначе хвост простаивает
+        size = max(1, min(self.chunk_size, math.ceil(len(texts) / self.processes)))
+        chunks = [ordered[i:i + size] for i in range(0, len(ordered), size)]
+        vectors = np.concatenate(self._pool.map(_encode_chunk, chunks, chunksize=1))
+        out = np.empty_like(vectors)
+        out[order] = vectors
+        return out
+
+    def warmup(self) -> None:
+        """Дождаться загрузки модели во всех процессах."""
+        self._pool.map(_encode_chunk, [["warmup"]] * self.processes, chunksize=1)
+
+    def close(self) -> None:
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self) -> "EncodePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ======= ЗАМЕР =======
+
+_WORDS = ("поставка", "оказание", "услуг", "выполнение", "работ", "по", "ремонту", "здания", "школы",
+          "медицинских", "изделий", "продуктов", "питания", "для", "нужд", "учреждения", "капитальному",
+          "строительству", "автомобильной", "дороги", "канцелярских", "товаров", "лекарственных", "препаратов")
+
+
+def sample_texts(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 120))) for _ in range(count)]
+
+
+def bench(model_name: str, process_counts: List[int], threads: int, sentences: int, batch_size: int) -> None:
+    texts = sample_texts(sentences)
+    cores = os.cpu_count() or 1
+    print(f"[BENCH] {sentences} текстов, {threads} потоков на процесс, ядер {cores}")
+    for processes in process_counts:
+        with EncodePool(model_name, processes, threads, batch_size) as pool:
+            pool.warmup()
+            started = time.perf_counter()
+            vectors = pool.encode(texts)
+            elapsed = time.perf_counter() - started
+        used = processes * threads
+        print(f"[BENCH] процессов {processes:2d} (ядер {used:2d}): {sentences / elapsed:8.1f} предл/с, "
+              f"{sentences / elapsed / used:6.1f} предл/с на ядро, форма {vectors.shape}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Многопроцессное кодирование на CPU")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("bench", help="предложений в секунду при разном числе процессов")
+    b.add_argument("--model", default="sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
+    b.add_argument("--processes", default="1,2,4", help="список через запятую")
+    b.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="потоков torch на процесс")
+    b.add_argument("--sentences", type=int, default=2000)
+    b.add_argument("--batch-size", type=int, default=32)
+    args = ap.parse_args(argv)
+    bench(args.model, [int(p) for p in args.processes.split(",") if p.strip()], args.threads,
+          args.sentences, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
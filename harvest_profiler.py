@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Профилирование прогонов харвестеров (--profile DIR в downloader.py, eis_fetch_all.py, single.py).
+
+В каталог отчёта (<DIR>/<yyyy-mm-dd_HHMMSS>/) пишется:
+    profile.pstats        # дамп cProfile (python -m pstats profile.pstats / snakeviz)
+    profile.txt           # топ функций по cumulative time
+    stages.txt            # wall-clock по этапам: soap, download, unzip, parse, disk, upload, ...
+    memory_<метка>.txt    # tracemalloc: топ выделений памяти за регион (разница снимков)
+
+Пока профилирование не включено, profiler.stage(...) / profiler.region(...) — пустые
+контексты, так что замеры можно оставлять в коде без накладных расходов.
+
+cProfile снимает только основной поток; время этапов (stages.txt) собирается со всех потоков.
+"""
+
+import contextlib
+import cProfile
+import datetime as dt
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+_NULL = contextlib.nullcontext()
+
+
+class _Stage:
+    __slots__ = ("_owner", "_name", "_t0")
+
+    def __init__(self, owner: "HarvestProfiler", name: str):
+        self._owner = owner
+        self._name = name
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._owner.add(self._name, time.perf_counter() - self._t0)
+        return False
+
+
+class HarvestProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.report_dir: Path | None = None
+        self._lock = threading.Lock()
+        self._stages: dict[str, list[float]] = {}       # имя -> [число вызовов, секунд]
+        self._region_stages: dict[str, dict[str, float]] = {}
+        self._profile: cProfile.Profile | None = None
+        self._t0 = 0.0
+
+    def start(self, report_root: Path | str, tag: str = "") -> None:
+        stamp = dt.datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        self.report_dir = Path(report_root) / (f"{stamp}_{tag}" if tag else stamp)
+        self.report_dir.mkdir(parents=True, exist_ok=True)
+        self.enabled = True
+        self._t0 = time.perf_counter()
+        tracemalloc.start(5)
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        print(f"[PROFILE] Отчёт будет записан в {self.report_dir.resolve()}")
+
+    def stage(self, name: str):
+        """with profiler.stage("soap"): ... — накапливает wall-clock этапа."""
+        if not self.enabled:
+            return _NULL
+        return _Stage(self, name)
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            item = self._stages.setdefault(name, [0, 0.0])
+            item[0] += 1
+            item[1] += seconds
+
+    @contextlib.contextmanager
+    def region(self, label: str, top: int = 25):
+        """
+        Замер одного региона: топ выделений памяти (разница снимков tracemalloc)
+        и вклад этапов за время региона.
+        """
+        if not self.enabled:
+            yield
+            return
+        before = tracemalloc.take_snapshot()
+        with self._lock:
+            stages_before = {k: v[1] for k, v in self._stages.items()}
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - t0
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            stats = after.compare_to(before, "lineno")
+            with self._lock:
+                self._region_stages[label] = {
+                    k: v[1] - stages_before.get(k, 0.0) for k, v in self._stages.items()
+                }
+                self._region_stages[label]["__wall__"] = wall
+            lines = [f"# регион {label}: {wall:.1f} с, память сейчас {current / 2**20:.1f} MiB, пик {peak / 2**20:.1f} MiB",
+                     f"# топ-{top} изменений выделенной памяти (по строкам кода)"]
+            lines += [str(s) for s in stats[:top]]
+            (self.report_dir / f"memory_{label}.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    def _stages_report(self) -> str:
+        total = time.perf_counter() - self._t0
+        out = [f"Всего wall-clock: {total:.1f} с", "",
+               f"{'этап':<16}{'вызовов':>10}{'секунд':>12}{'% wall':>9}{'мс/вызов':>12}"]
+        for name, (count, seconds) in sorted(self._stages.items(), key=lambda kv: -kv[1][1]):
+            out.append(f"{name:<16}{count:>10}{seconds:>12.2f}{seconds / total * 100:>8.1f}%"
+                       f"{seconds / count * 1000 if count else 0:>12.1f}")
+        if self._region_stages:
+            names = sorted(self._stages)
+            out += ["", "По регионам (секунд):", f"{'регион':<10}{'wall':>9}" + "".join(f"{n:>12}" for n in names)]
+            for label, st in self._region_stages.items():
+                out.append(f"{label:<10}{st['__wall__']:>9.1f}" + "".join(f"{st.get(n, 0.0):>12.2f}" for n in names))
+        return "\n".join(out) + "\n"
+
+    def stop(self) -> None:
+        if not self.enabled:
+            return
+        self._profile.disable()
+        self.enabled = False
+        self._profile.dump_stats(str(self.report_dir / "profile.pstats"))
+        buf = io.StringIO()
+        pstats.Stats(self._profile, stream=buf).sort_stats("cumulative").print_stats(60)
+        (self.report_dir / "profile.txt").write_text(buf.getvalue(), encoding="utf-8")
+
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        top = "\n".join(str(s) for s in snapshot.statistics("lineno")[:40])
+        (self.report_dir / "memory_total.txt").write_text(top + "\n", encoding="utf-8")
+
+        report = self._stages_report()
+        (self.report_dir / "stages.txt").write_text(report, encoding="utf-8")
+        print("\n[PROFILE] Этапы:\n" + report)
+        print(f"[PROFILE] Отчёт: {self.report_dir.resolve()}")
+
+
+profiler = HarvestProfiler()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Распределённый обход ЕИС через очередь работ (downloader.py --coordinate / --worker).
+
+Координатор режет обход на единицы (регион, дата, подсистема, тип документа) и
+публикует их в очередь. Воркеры (сколько угодно процессов/машин, каждый со своим
+токеном) берут единицы «в аренду» (lease), выполняют Harvester.scan_doc_type и
+подтверждают (ack). Пока аренда не подтверждена, единица никому больше не выдаётся;
+если воркер упал или завис дольше visibility timeout — единица снова становится
+доступной другим воркерам, так что прогресс не теряется.
+
+Реализации очереди:
+    MemoryWorkQueue  — в памяти процесса (тесты, отладка, несколько потоков);
+    RabbitWorkQueue  — RabbitMQ (тот же брокер, что у векторных воркеров), durable-очередь.
+        Аренда = неподтверждённое сообщение: при обрыве соединения воркера брокер
+        возвращает его в очередь.
+
+Срок аренды в RabbitMQ — consumer timeout брокера, и задаётся он политикой, а не
+аргументом очереди: queue_declare с x-consumer-timeout из параметров процесса
+давал PRECONDITION_FAILED у воркеров с другим значением. Пример (30 минут):
+
+    rabbitmqctl set_policy eis-harvest '^eis[.]harvest[.]' '{"consumer-timeout": 1800000}' --apply-to queues
+
+Без политики действует глобальный consumer_timeout брокера (по умолчанию 30 минут).
+Когда таймаут срабатывает, брокер закрывает канал воркера и возвращает сообщение в
+очередь; ack/release/retry после этого ловят закрытие канала, открывают новый, и ack
+возвращает False (единицу уже может выполнять другой воркер).
+
+Сбойная единица (ошибка ЕИС) переотправляется в конец очереди со счётчиком попыток;
+после max_attempts — отбрасывается с сообщением в лог.
+"""
+
+import datetime as dt
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+
+DEFAULT_QUEUE_NAME = "eis.harvest.units"
+DEFAULT_VISIBILITY = 30 * 60.0       # секунд: сколько единица может быть «в аренде» (MemoryWorkQueue)
+DEFAULT_MAX_ATTEMPTS = 5
+
+
+@dataclass(frozen=True)
+class HarvestItem:
+    region: int
+    date: str           # YYYY-MM-DD
+    subsystem: str
+    doc_type: str
+    attempts: int = 0
+
+    @property
+    def key(self) -> str:
+        return f"{self.region:02d}/{self.date}/{self.subsystem}/{self.doc_type}"
+
+    def to_bytes(self) -> bytes:
+        return json.dumps(asdict(self), ensure_ascii=False).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, body: bytes) -> "HarvestItem":
+        data = json.loads(body.decode("utf-8"))
+        return cls(int(data["region"]), data["date"], data["subsystem"], data["doc_type"],
+                   int(data.get("attempts", 0)))
+
+
+@dataclass
+class Lease:
+    item: HarvestItem
+    token: object               # идентификатор аренды в конкретной очереди (delivery tag / uuid)
+
+
+def plan_items(date_from: dt.date, date_to: dt.date, regions: list[int],
+               doc_types: dict[str, list[str]]) -> list[HarvestItem]:
+    """Единицы обхода: от новых дат к старым (свежие закупки важнее), внутри даты — регион, тип."""
+    items = []
+    day = date_to
+    while day >= date_from:
+        items += [HarvestItem(r, day.isoformat(), sub, t)
+                  for r in regions for sub, types in doc_types.items() for t in types]
+        day -= dt.timedelta(days=1)
+    return items
+
+
+class MemoryWorkQueue:
+    """Очередь в памяти с арендой и visibility timeout; потокобезопасна."""
+
+    def __init__(self, visibility: float = DEFAULT_VISIBILITY):
+        self.visibility = visibility
+        self._ready: deque[HarvestItem] = deque()
+        self._leased: dict[str, tuple[HarvestItem, float]] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, items: list[HarvestItem]) -> int:
+        with self._lock:
+            self._ready.extend(items)
+        return len(items)
+
+    def _expire(self, now: float) -> None:
+        for token, (item, deadline) in list(self._leased.items()):
+            if deadline <= now:
+                del self._leased[token]
+                self._ready.appendleft(item)
+
+    def lease(self) -> Lease | None:
+        with self._lock:
+            self._expire(time.monotonic())
+            if not self._ready:
+                return None
+            item = self._ready.popleft()
+            token = uuid.uuid4().hex
+            self._leased[token] = (item, time.monotonic() + self.visibility)
+            return Lease(item, token)
+
+    def ack(self, lease: Lease) -> bool:
+        """False — аренда уже истекла и единица отдана другому воркеру."""
+        with self._lock:
+            return self._leased.pop(lease.token, None) is not None
+
+    def release(self, lease: Lease) -> None:
+        """Вернуть единицу в начало очереди без увеличения счётчика попыток."""
+        with self._lock:
+            if self._leased.pop(lease.token, None) is not None:
+                self._ready.appendleft(lease.item)
+
+    def retry(self, lease: Lease) -> None:
+        with self._lock:
+            if self._leased.pop(lease.token, None) is not None:
+                self._ready.append(replace(lease.item, attempts=lease.item.attempts + 1))
+
+    def run(self, fn):
+        return fn()
+
+    def pending(self) -> int:
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._ready) + len(self._leased)
+
+    def close(self) -> None:
+        pass
+
+
+class RabbitWorkQueue:
+    """
+    Очередь на RabbitMQ (pika, BlockingConnection). Соединение не потокобезопасно —
+    один экземпляр на поток воркера. Срок аренды — политика consumer-timeout брокера
+    (см. docstring модуля).
+    """
+
+    def __init__(self, url: str, queue: str = DEFAULT_QUEUE_NAME):
+        import pika
+
+        self._pika = pika
+        self.queue = queue
+        # канал закрыт брокером (истёк consumer timeout) или соединение потеряно:
+        # неподтверждённое сообщение брокер уже вернул в очередь
+        self._lost = (pika.exceptions.AMQPChannelError, pika.exceptions.AMQPConnectionError)
+        self._params = pika.URLParameters(url)
+        self._params.heartbeat = 60
+        self._params.blocked_connection_timeout = 120.0
+        self._connection = pika.BlockingConnection(self._params)
+        self._open_channel()
+        # без arguments: объявление совпадает у всех процессов при любых их настройках
+        self._channel.queue_declare(queue=queue, durable=True)
+
+    def _open_channel(self) -> None:
+        if not self._connection.is_open:
+            self._connection = self._pika.BlockingConnection(self._params)
+        self._channel = self._connection.channel()
+        self._channel.basic_qos(prefetch_count=1)
+
+    def _send(self, item: HarvestItem) -> None:
+        self._channel.basic_publish(
+            exchange="",
+            routing_key=self.queue,
+            body=item.to_bytes(),
+            properties=self._pika.BasicProperties(delivery_mode=2, content_type="application/json"),
+        )
+
+    def publish(self, items: list[HarvestItem]) -> int:
+        for item in items:
+            self._send(item)
+        return len(items)
+
+    def lease(self) -> Lease | None:
+        method, _props, body = self._channel.basic_get(self.queue, auto_ack=False)
+        if method is None:
+            return None
+        try:
+            item = HarvestItem.from_bytes(body)
+        except (ValueError, KeyError, TypeError):
+            print(f"[QUEUE] Некорректное сообщение отброшено: {body[:200]!r}")
+            self._channel.basic_ack(method.delivery_tag)
+            return None
+        return Lease(item, method.delivery_tag)
+
+    def ack(self, lease: Lease) -> bool:
+        """False — аренда истекла: брокер закрыл канал и вернул единицу в очередь."""
+        try:
+            self._channel.basic_ack(lease.token)
+            return True
+        except self._lost as exc:
+            print(f"[QUEUE] Подтверждение {lease.item.key} не принято ({exc!r}), канал переоткрыт")
+            self._open_channel()
+            return False
+
+    def release(self, lease: Lease) -> None:
+        try:
+            self._channel.basic_nack(lease.token, requeue=True)
+        except self._lost:
+            self._open_channel()    # единица уже в очереди
+
+    def retry(self, lease: Lease) -> None:
+        # сначала публикуем копию с увеличенным счётчиком, потом подтверждаем оригинал:
+        # при падении между шагами единица выполнится лишний раз, но не потеряется
+        try:
+            self._send(replace(lease.item, attempts=lease.item.attempts + 1))
+            self._channel.basic_ack(lease.token)
+        except self._lost:
+            # аренда истекла: оригинал вернулся в очередь брокером (счётчик попыток не вырос)
+            self._open_channel()
+
+    def run(self, fn):
+        """
+        Выполняет fn в отдельном потоке, а в текущем обслуживает соединение
+        (heartbeat), чтобы брокер не закрыл его во время долгого запроса к ЕИС.
+        """
+        result: dict = {}
+
+        def target():
+            try:
+                result["value"] = fn()
+            except BaseException as e:  # noqa: BLE001 — пробрасываем в вызывающий поток
+                result["error"] = e
+
+        t = threading.Thread(target=target, daemon=True)
+        t.start()
+        while t.is_alive():
+            self._connection.process_data_events(time_limit=1)
+            t.join(timeout=0)
+        if "error" in result:
+            raise result["error"]
+        return result.get("value")
+
+    def pending(self) -> int:
+        res = self._channel.queue_declare(queue=self.queue, passive=True)
+        return res.method.message_count
+
+    def close(self) -> None:
+        try:
+            if self._connection.is_open:
+                self._connection.close()
+        except Exception:
+            pass
+
+
+def run_worker(harvester, queue, on_item_done=None, idle_exit: bool = True,
+               poll: float = 10.0, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+    """
+    Цикл воркера: аренда -> scan_doc_type -> ack. on_item_done(item, files) вызывается
+    до подтверждения всегда, даже без файлов (flush приёмника, выгрузка на сервер), так что
+    при падении воркера единица будет выполнена повторно, а не потеряна. Если on_item_done
+    бросил исключение (приёмник не принял записи), единица возвращается в очередь
+    неподтверждённой, а воркер останавливается.
+    idle_exit — завершиться, когда очередь пуста; иначе ждать новых единиц.
+    Возвращает число выполненных единиц.
+    """
+    done = 0
+    while True:
+        lease = queue.lease()
+        if lease is None:
+            if idle_exit:
+                break
+            time.sleep(poll)
+            continue
+
+        item = lease.item
+        files: set[Path] = set()
+        res = queue.run(lambda: harvester.scan_doc_type(item.region, item.date, item.subsystem,
+                                                        item.doc_type, files))
+        if res == "stop":
+            print(f"[WORKER] Остановка (токен / лимит), единица {item.key} возвращена в очередь")
+            queue.release(lease)
+            break
+        if res == "error":
+            if item.attempts + 1 >= max_attempts:
+                print(f"[WORKER] {item.key}: {max_attempts} неудачных попыток, единица отброшена")
+                queue.ack(lease)
+            else:
+                queue.retry(lease)
+            continue
+
+        if on_item_done:
+            try:
+                queue.run(lambda: on_item_done(item, files))
+            except Exception as exc:
+                print(f"[WORKER] {item.key}: результат не сохранён ({exc}), единица возвращена в очередь")
+                queue.release(lease)
+                break
+        if not queue.ack(lease):
+            print(f"[WORKER] {item.key}: аренда истекла до подтверждения, единица выполнена повторно")
+        done += 1
+    return done
@@ -9,9 +9,49 @@
 Скрипт:
 - читает строку подключения из appsettings.json (ConnectionStrings.Default),
 - конвертирует её в формат, понятный mssql_python,
-- выбирает записи Notice без эмбеддингов (или с устаревшими),
-- считает эмбеддинги на GPU (если доступно),
-- пишет/обновляет строки в NoticeEmbeddings.
+- выбирает записи Notice, изменённые после сохранённой «отметки» (rowversion),
+- пропускает те, у которых текст для эмбеддинга не изменился (хеш TextHash),
+- считает эмбеддинги на GPU (если доступно), на CPU — в одном процессе или в пуле
+  процессов по ENCODE_PROCESSES (по умолчанию выключен: каждый процесс держит свою
+  копию модели, ~1 ГБ на mpnet; ENCODE_THREADS, encode_pool.py);
+  движок модели (torch / int8 / ONNX Runtime) — EMBEDDING_BACKEND, embedding_backend.py,
+  предел длины текста в токенах — EMBEDDING_MAX_SEQ_LENGTH; одинаковые тексты — один раз,
+  уже встречавшиеся (то же содержимое у другого номера) — из кэша embedding_cache.py
+  (EMBEDDING_CACHE_PATH, ограничен по возрасту и размеру),
+- пишет/обновляет строки в NoticeEmbeddings пачкой (временная таблица + один MERGE,
+  embedding_store.py) и сдвигает отметку в той же транзакции.
+
+Режимы: разовый запуск (python index.py) — один проход и выход; демон
+(python index.py --daemon) — модель и соединения загружаются один раз, проход
+запускается по сигналу из RabbitMQ (INDEX_WAKE_URL/INDEX_WAKE_QUEUE, index_wake.py;
+сигнал шлёт downloader.py --sink db после записи пачки) или, без сигнала, когда
+дешёвая проверка раз в INDEX_POLL_SECONDS находит изменения; пачки — по INDEX_MICRO_BATCH.
+
+Метрики (index_metrics.py): очередь неиндексированных, скорость, время стадий по пачкам,
+p50/p95 задержки от изменения строки (по Notices.RowVer, RowVersionClock) и от публикации
+(PublishDate) до записи эмбеддинга — сводкой после каждого прохода и по HTTP /metrics (--metrics-port / INDEX_METRICS_PORT,
+адрес --metrics-host / INDEX_METRICS_HOST, по умолчанию 127.0.0.1).
+
+Несколько моделей (embedding_models.py): --source выбирает модель из реестра
+EmbeddingModels — у каждой свой Source в NoticeEmbeddings и своя отметка. Новая модель
+(building) строится фоном рядом с активной, не быстрее --rate Notice/с; с --cutover
+поиск переключается на неё, когда у всех Notice есть её эмбеддинги.
+
+Стадии работают конвейером (pipeline.py): отдельный поток читает следующую пачку
+из БД, модель считает текущую, поток записи фиксирует предыдущую; между стадиями —
+очереди на PIPELINE_DEPTH пачек. Отметка сдвигается только записью, по порядку,
+поэтому после сбоя продолжение идёт с последней зафиксированной пачки.
+
+Инкрементальность: каждая пачка — диапазонный запрос по индексу Notices.RowVer
+(rowversion, SQL Server обновляет его сам при любом изменении строки), без сканирования
+NoticeEmbeddings. Отметка хранится в таблице IndexerState, так что повторный запуск
+продолжает с места остановки, а отредактированные закупки переиндексируются.
+Недостающие столбцы/индексы/таблица создаются при первом запуске (ensure_schema).
+
+Приоритет свежести: перед каждой пачкой прохода по RowVer индексируются закупки
+с ещё открытым приёмом заявок (CollectingEnd в будущем) без эмбеддинга — сначала
+самые свежие по PublishDate (PRIORITY_BATCH_SIZE за раз, 0 — выключить). Так только что
+выгруженные закупки попадают в поиск за минуты даже во время большой переиндексации.
 
 Ожидается, что:
   * есть таблица [Notices] с полями (минимум):
@@ -21,24 +61,51 @@
       Okpd2Code,
       Okpd2Name,
       KvrCode,
-      KvrName
+      KvrName,
+      PublishDate,
+      CollectingEnd
   * есть таблица [NoticeEmbeddings] c полями:
       Id           (uniqueidentifier),
       NoticeId     (ссылка на Notices.Id),
-      Vector       (VECTOR(768) или совместимое поле),
+      Vector       (VECTOR(768) — пишется JSON-текстом, или varbinary —
+                    бинарный float32/float16 формата vector_codec.py),
       Source       (nvarchar)
+  * добавляются при первом запуске:
+      Notices.RowVer            (rowversion) + индекс IX_Notices_RowVer,
+      NoticeEmbeddings.TextHash (varbinary(32), sha256 нормализованного текста)
+                                + индекс IX_NoticeEmbeddings_NoticeId_Source,
+      индекс IX_Notices_CollectingEnd_Fresh (для выборки открытых закупок),
+    Индексы EF-миграции IX_NoticeEmbeddings_NoticeId и IX_Notices_CollectingEnd
+    (без INCLUDE) остаются как есть — схемой Notices владеет Zakupki.Fetcher, поэтому
+    индексатор добавляет свои под другими именами, а не пересоздаёт чужие.
+      IndexerState(Name, Watermark binary(8), UpdatedAt),
+      EmbeddingModels(Name, ModelName, Dimensions, State, ...) — реестр моделей
 """
 
+import argparse
+import hashlib
 import json
-import uuid
+import re
 import os
-from typing import Any, List, Dict
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import mssql_python
 import torch
-from sentence_transformers import SentenceTransformer
 import numpy as np
 
+from embedding_backend import encoder_key, load_encoder
+from embedding_cache import DEFAULT_CACHE_PATH, EmbeddingCache, encode_cached
+from embedding_models import (
+    ACTIVE, BUILDING, RETIRED, ModelInfo, coverage, cutover, ensure_model_schema, get_model, list_models,
+)
+from embedding_store import upsert_embeddings_bulk, vector_column_format
+from encode_pool import DEFAULT_THREADS, EncodePool, processes_from_env
+from index_metrics import DEFAULT_METRICS_HOST, IndexMetrics, MetricsServer, RowVersionClock, lag_seconds
+from index_wake import WAKE_QUEUE, WAKE_URL, IndexWaker
+from pipeline import run_pipeline
+from vector_codec import FORMATS, JSON
+
 # ======= НАСТРОЙКИ =======
 
 APPSETTINGS_PATH = os.environ.get("APPSETTINGS_PATH", "appsettings.json")
@@ -46,6 +113,14 @@ MODEL_NAME = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
 VECTOR_DIMENSIONS = 768
 BATCH_SIZE = 64              # размер батча для модели
 DB_BATCH_SIZE = 500          # сколько Notice за раз вытаскиваем из БД
+PRIORITY_BATCH_SIZE = int(os.environ.get("PRIORITY_BATCH_SIZE", "200"))   # открытые закупки вне очереди; 0 — выкл.
+PIPELINE_DEPTH = int(os.environ.get("PIPELINE_DEPTH", "2"))   # пачек в очереди между стадиями
+INDEXER_NAME = os.environ.get("INDEXER_NAME", "python-indexer")   # Source эмбеддингов и имя отметки
+DEFAULT_MODEL = ModelInfo(INDEXER_NAME, MODEL_NAME, VECTOR_DIMENSIONS, ACTIVE)   # первая запись реестра
+ZERO_WATERMARK = b"\x00" * 8
+# формат NoticeEmbeddings.Vector (vector_codec.py): auto — по типу колонки
+# (VECTOR -> json, varbinary -> float32), либо json / float32 / float16 явно
+VECTOR_FORMAT = os.environ.get("VECTOR_FORMAT", "auto")
 
 
 # ======= КОНВЕРТЕР СТРОКИ ПОДКЛЮЧЕНИЯ =======
@@ -151,20 +226,21 @@ def load_connection_string(path: str) -> str:
     return norm_conn
 
 
-def get_db_connection():
+def get_db_connection(conn_str: Optional[str] = None, autocommit: bool = False):
     """
     Открывает соединение через mssql-python.
     """
-    conn_str = load_connection_string(APPSETTINGS_PATH)
+    conn_str = conn_str or load_connection_string(APPSETTINGS_PATH)
     conn = mssql_python.connect(conn_str)
-    conn.autocommit = False
+    conn.autocommit = autocommit
     return conn
 
 
-def build_notice_text(row: Any) -> str:
+def build_notice_text(row: Any, with_number: bool = True) -> str:
     """
     Собираем "паспорт" текста для эмбеддинга.
     Подгоняй по вкусу: какие поля важнее, какие можно выкинуть.
+    with_number=False — без номера закупки (ключ кэша, content_hash).
     """
     parts: List[str] = []
 
@@ -176,7 +252,8 @@ def build_notice_text(row: Any) -> str:
             parts.append(f"{label}: {s}")
 
     # Основные поля
-    add("Название", getattr(row, "PurchaseNumber", None))
+    if with_number:
+        add("Название", getattr(row, "PurchaseNumber", None))
     add("Предмет закупки", getattr(row, "PurchaseObjectInfo", None))
 
     # ОКПД2
@@ -201,19 +278,81 @@ def build_notice_text(row: Any) -> str:
     return "\n".join(parts)
 
 
-def vector_to_sql_vector(vector: np.ndarray) -> str:
-    """
-    Приводит numpy-вектор к строке JSON вида "[0.1, 2.0, ...]".
-    SQL Server 2025 VECTOR(...) умеет неявно конвертировать
-    nvarchar/json-строку в VECTOR.
-    """
-    arr = np.asarray(vector, dtype=np.float32).tolist()
-    return json.dumps(arr, ensure_ascii=False)
+def normalize_text(text: str) -> str:
+    """Схлопываем пробелы: хеш не должен меняться от форматирования."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).digest()
+
+
+def content_hash(row: Any) -> bytes:
+    """Ключ кэша эмбеддингов: у многолотовых копий и повторных публикаций он общий."""
+    return text_hash(build_notice_text(row, with_number=False))
 
 
-def fetch_notices_for_indexing(cursor: Any, limit: int) -> List[Any]:
+def ensure_schema(cursor: Any) -> None:
     """
-    Выбираем Notice, для которых нет эмбеддинга.
+    Создаёт то, что нужно инкрементальной индексации, если этого ещё нет.
+    Идемпотентно; ALTER выполняются только при первом запуске.
+    """
+    cursor.execute("""
+    IF COL_LENGTH('dbo.Notices', 'RowVer') IS NULL
+        ALTER TABLE [Notices] ADD RowVer rowversion;
+    """)
+    cursor.execute("""
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Notices_RowVer'
+                   AND object_id = OBJECT_ID('dbo.Notices'))
+        CREATE INDEX IX_Notices_RowVer ON [Notices] (RowVer);
+    """)
+    cursor.execute("""
+    IF COL_LENGTH('dbo.NoticeEmbeddings', 'TextHash') IS NULL
+        ALTER TABLE [NoticeEmbeddings] ADD TextHash varbinary(32) NULL;
+    """)
+    cursor.execute("""
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_NoticeEmbeddings_NoticeId_Source'
+                   AND object_id = OBJECT_ID('dbo.NoticeEmbeddings'))
+        CREATE INDEX IX_NoticeEmbeddings_NoticeId_Source ON [NoticeEmbeddings] (NoticeId, Source) INCLUDE (TextHash);
+    """)
+    cursor.execute("""
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Notices_CollectingEnd_Fresh'
+                   AND object_id = OBJECT_ID('dbo.Notices'))
+        CREATE INDEX IX_Notices_CollectingEnd_Fresh ON [Notices] (CollectingEnd) INCLUDE (PublishDate, RowVer);
+    """)
+    cursor.execute("""
+    IF OBJECT_ID('dbo.IndexerState') IS NULL
+        CREATE TABLE [IndexerState] (
+            Name nvarchar(100) NOT NULL PRIMARY KEY,
+            Watermark binary(8) NOT NULL,
+            UpdatedAt datetime2 NOT NULL
+        );
+    """)
+
+
+def load_watermark(cursor: Any, name: str = INDEXER_NAME) -> bytes:
+    cursor.execute("SELECT Watermark FROM [IndexerState] WHERE Name = ?", (name,))
+    row = cursor.fetchone()
+    return bytes(row[0]) if row else ZERO_WATERMARK
+
+
+def save_watermark(cursor: Any, watermark: bytes, name: str = INDEXER_NAME) -> None:
+    cursor.execute(
+        """
+        MERGE [IndexerState] AS t
+        USING (SELECT ? AS Name, ? AS Watermark) AS s ON t.Name = s.Name
+        WHEN MATCHED THEN UPDATE SET Watermark = s.Watermark, UpdatedAt = SYSUTCDATETIME()
+        WHEN NOT MATCHED THEN INSERT (Name, Watermark, UpdatedAt) VALUES (s.Name, s.Watermark, SYSUTCDATETIME());
+        """,
+        (name, watermark),
+    )
+
+
+def fetch_changed_notices(cursor: Any, watermark: bytes, limit: int, source: str = INDEXER_NAME) -> List[Any]:
+    """
+    Notice, изменённые после отметки, по возрастанию RowVer, вместе с хешем текста
+    их текущего эмбеддинга (NULL — эмбеддинга нет). Верхняя граница MIN_ACTIVE_ROWVERSION()
+    не даёт «перепрыгнуть» строки незавершённых транзакций с меньшим rowversion.
     """
     sql = f"""
     SELECT TOP ({limit})
@@ -223,119 +362,461 @@ def fetch_notices_for_indexing(cursor: Any, limit: int) -> List[Any]:
         n.Okpd2Code,
         n.Okpd2Name,
         n.KvrCode,
-        n.KvrName
+        n.KvrName,
+        n.RowVer,
+        n.PublishDate,
+        e.NoticeId AS EmbeddedNoticeId,
+        e.TextHash
     FROM [Notices] AS n
-    LEFT JOIN (
-        SELECT DISTINCT NoticeId
-        FROM [NoticeEmbeddings]
-    ) AS e ON e.NoticeId = n.Id
-    WHERE e.NoticeId IS NULL
-    ORDER BY n.Id DESC
+    LEFT JOIN [NoticeEmbeddings] AS e ON e.NoticeId = n.Id AND e.Source = ?
+    WHERE n.RowVer > ? AND n.RowVer < MIN_ACTIVE_ROWVERSION()
+    ORDER BY n.RowVer
     """
-    cursor.execute(sql)
+    cursor.execute(sql, (source, watermark))
     rows = cursor.fetchall()
     return rows
 
 
-def upsert_embeddings(
-    cursor: Any,
-    rows: List[Any],
-    embeddings: np.ndarray,
-    source: str = "python-indexer",
-):
+def fetch_priority_notices(cursor: Any, watermark: bytes, limit: int, source: str = INDEXER_NAME) -> List[Any]:
+    """
+    Ещё не проиндексированные закупки с открытым приёмом заявок (CollectingEnd в будущем),
+    до которых последовательный проход по RowVer ещё не дошёл: сначала самые свежие
+    по PublishDate, при равенстве — те, у которых приём закрывается раньше.
     """
-    Для каждого Notice:
-      - удаляем старую запись по NoticeId,
-      - вставляем новую с вектором.
-    Вектор сохраняем в VECTOR(...) через JSON-строку.
+    sql = f"""
+    SELECT TOP ({limit})
+        n.Id,
+        n.PurchaseNumber,
+        n.PurchaseObjectInfo,
+        n.Okpd2Code,
+        n.Okpd2Name,
+        n.KvrCode,
+        n.KvrName,
+        n.RowVer,
+        n.PublishDate,
+        e.NoticeId AS EmbeddedNoticeId,
+        e.TextHash
+    FROM [Notices] AS n
+    LEFT JOIN [NoticeEmbeddings] AS e ON e.NoticeId = n.Id AND e.Source = ?
+    WHERE n.CollectingEnd >= SYSUTCDATETIME() AND n.RowVer > ? AND e.NoticeId IS NULL
+    ORDER BY n.PublishDate DESC, n.CollectingEnd
     """
-    dims = embeddings.shape[1]
+    cursor.execute(sql, (source, watermark))
+    return cursor.fetchall()
 
-    if dims != VECTOR_DIMENSIONS:
-        raise ValueError(
-            f"Размерность эмбеддинга {dims} не совпадает с ожидаемым значением {VECTOR_DIMENSIONS}"
-        )
 
-    insert_sql = """
-    INSERT INTO [NoticeEmbeddings] (
-        Id,
-        NoticeId,
-        Vector,
-        Source
-    ) VALUES (?, ?, ?, ?)
+def set_text_hashes(cursor: Any, pairs: List[tuple], source: str = INDEXER_NAME) -> None:
+    """Эмбеддинги, посчитанные до появления TextHash: считаем их актуальными и только проставляем хеш."""
+    cursor.executemany(
+        "UPDATE [NoticeEmbeddings] SET TextHash = ? WHERE NoticeId = ? AND Source = ?",
+        [(h, str(notice_id), source) for notice_id, h in pairs],
+    )
+
+
+def count_backlog(cursor: Any, watermark: bytes) -> int:
+    """Сколько Notice изменено после отметки (диапазон по индексу RowVer)."""
+    cursor.execute("SELECT COUNT_BIG(*) FROM [Notices] WHERE RowVer > ?", (watermark,))
+    return int(cursor.fetchone()[0])
+
+
+def iter_changed_batches(
+    cursor: Any, watermark: bytes, limit: int, priority_limit: int = 0, source: str = INDEXER_NAME
+) -> Iterator[Tuple[List[Any], Optional[bytes], float]]:
     """
+    Пачки Notice для индексации: (notices, отметка после пачки или None, секунд на чтение).
 
-    delete_sql = """
-    DELETE FROM [NoticeEmbeddings]
-    WHERE NoticeId = ?
+    Перед каждой пачкой последовательного прохода по RowVer выбираются приоритетные —
+    открытые и ещё без эмбеддинга (fetch_priority_notices), пока они не кончатся.
+    Приоритетная пачка отметку не двигает; когда проход дойдёт до этих строк, хеш текста
+    совпадёт и они пропустятся. Отметка для следующего запроса сдвигается сразу по
+    прочитанной пачке, не дожидаясь, пока предыдущая будет записана и зафиксирована.
     """
+    queued: Dict[Any, bytes] = {}      # приоритетные в работе (ещё не видны как проиндексированные)
+    while True:
+        while priority_limit > 0:
+            started = time.perf_counter()
+            fresh = [r for r in fetch_priority_notices(cursor, watermark, priority_limit + len(queued), source)
+                     if r.Id not in queued][:priority_limit]
+            if not fresh:
+                break
+            queued.update((r.Id, bytes(r.RowVer)) for r in fresh)
+            yield fresh, None, time.perf_counter() - started
 
-    for row, emb in zip(rows, embeddings):
-        notice_id = row.Id
-        vector_for_sql = vector_to_sql_vector(emb)
-        embedding_id = uuid.uuid4()
-
-        cursor.execute(delete_sql, (notice_id,))
-
-        cursor.execute(
-            insert_sql,
-            (
-                str(embedding_id),
-                str(notice_id),
-                vector_for_sql,
-                source,
-            ),
-        )
+        started = time.perf_counter()
+        notices = fetch_changed_notices(cursor, watermark, limit, source)
+        if not notices:
+            return
+        watermark = bytes(notices[-1].RowVer)
+        yield notices, watermark, time.perf_counter() - started
+        # то, что проход уже миновал, отслеживать больше не нужно
+        queued = {k: v for k, v in queued.items() if v > watermark}
+
+
+def throttle(batches: Iterator[Tuple[List[Any], Optional[bytes], float]],
+             rate: float) -> Iterator[Tuple[List[Any], Optional[bytes], float]]:
+    """Не быстрее rate Notice в секунду: пауза в потоке чтения после пачки, обгоняющей график."""
+    started = time.monotonic()
+    count = 0
+    for batch in batches:
+        yield batch
+        count += len(batch[0])
+        wait = count / rate - (time.monotonic() - started)
+        if wait > 0:
+            time.sleep(wait)
+
+
+def select_for_embedding(notices: List[Any]) -> Tuple[List[Tuple[Any, str]], List[bytes], List[tuple]]:
+    """
+    (к индексации [(row, text)], их хеши, legacy [(NoticeId, hash)]).
+    Notice с неизменившимся текстом в результат не попадают.
+    """
+    to_embed, hashes, legacy = [], [], []
+    for row in notices:
+        text = build_notice_text(row)
+        h = text_hash(text)
+        stored = bytes(row.TextHash) if row.TextHash is not None else None
+        if stored == h:
+            continue                       # изменились поля, не входящие в текст
+        if row.EmbeddedNoticeId is not None and stored is None:
+            legacy.append((row.Id, h))     # эмбеддинг старого индексатора, без хеша
+            continue
+        to_embed.append((row, text))
+        hashes.append(h)
+    return to_embed, hashes, legacy
 
 
-# ======= MAIN =======
+def current_dbts(cursor: Any) -> bytes:
+    """Последний выданный базой rowversion."""
+    cursor.execute("SELECT @@DBTS")
+    return bytes(cursor.fetchone()[0])
 
-def main():
-    # Модель эмбеддингов
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Загружаю модель {MODEL_NAME} на устройстве {device}...")
-    model = SentenceTransformer(MODEL_NAME, device=device)
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def has_changes(cursor: Any, watermark: bytes) -> bool:
+    """Дешёвая проверка для опроса: есть ли что-нибудь после отметки (одно чтение индекса RowVer)."""
+    cursor.execute(
+        "SELECT TOP (1) 1 FROM [Notices] WHERE RowVer > ? AND RowVer < MIN_ACTIVE_ROWVERSION()",
+        (watermark,),
+    )
+    return cursor.fetchone() is not None
 
-    total_processed = 0
 
-    try:
-        while True:
-            notices = fetch_notices_for_indexing(cursor, DB_BATCH_SIZE)
-            if not notices:
-                print("Нет записей для индексации. Выход.")
-                break
+# ======= ИНДЕКСАТОР =======
+
+class Indexer:
+    """
+    Модель, кэш и соединения, загруженные один раз; run_pass() — один проход
+    «всё, что изменилось после отметки». Разовый запуск делает один проход,
+    демон (--daemon) — проход на каждый сигнал/опрос, не перезагружая модель.
+
+    source — запись реестра EmbeddingModels (embedding_models.py): модель, размерность,
+    Source эмбеддингов и имя отметки. Пока модель строится (building), проход идёт
+    не быстрее rate Notice/с и без приоритетной очереди; auto_cutover — переключить
+    поиск на неё, как только покрытие станет полным.
+    """
 
-            print(f"Нашёл {len(notices)} записей для индексации, считаю эмбеддинги...")
+    def __init__(self, source: str = INDEXER_NAME, rate: float = 0.0, auto_cutover: bool = False):
+        self.source = source
+        self.rate = rate
+        self.auto_cutover = auto_cutover
+        self.info: Optional[ModelInfo] = None
+        self.keep_sources: List[str] = []
+        self.pool = None
+        self.encode = None
+        self.cache = None
+        self.conn_str = load_connection_string(APPSETTINGS_PATH)
+        self.conn = self.cursor = self.read_conn = self.read_cursor = None
+        self.vector_format = JSON
+        self.totals = {"processed": 0, "skipped": 0, "batches": 0}
+        self.metrics = IndexMetrics(source)
+        self.clock = RowVersionClock()
+
+    def _load_model(self, model_name: str) -> None:
+        # Модель эмбеддингов: на CPU пул процессов только по ENCODE_PROCESSES (encode_pool.py) —
+        # копия модели в каждом процессе, на машине рядом с SQL Server памяти может не хватить
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        processes = processes_from_env("0") if device == "cpu" else 0
+        if processes > 1:
+            self.pool = EncodePool(model_name, processes, DEFAULT_THREADS, BATCH_SIZE)
+            self.encode = self.pool.encode
+        else:
+            print(f"Загружаю модель {model_name} на устройстве {device}...")
+            model = load_encoder(model_name, device=device)
+
+            def encode(texts: List[str]) -> np.ndarray:
+                return model.encode(
+                    texts,
+                    batch_size=BATCH_SIZE,
+                    show_progress_bar=True,
+                    convert_to_numpy=True,
+                    normalize_embeddings=False,
+                )
+
+            self.encode = encode
+
+        # кэш эмбеддингов по хешу текста (EMBEDDING_CACHE_PATH="" — без кэша);
+        # ключ модели включает движок и max_seq_length — их векторы не смешиваются
+        self.cache = EmbeddingCache(DEFAULT_CACHE_PATH, encoder_key(model_name)) if DEFAULT_CACHE_PATH else None
+
+    def connect(self) -> None:
+        # чтение и запись — разные соединения: читатель не держит транзакцию писателя
+        self.conn = get_db_connection(self.conn_str)
+        self.cursor = self.conn.cursor()
+        self.read_conn = get_db_connection(self.conn_str, autocommit=True)
+        self.read_cursor = self.read_conn.cursor()
+
+        ensure_schema(self.cursor)
+        ensure_model_schema(self.cursor, DEFAULT_MODEL)
+        self.conn.commit()
+        self.refresh_model()
+        if self.encode is None:
+            self._load_model(self.info.model)
+        vector_format = vector_column_format(self.cursor) if VECTOR_FORMAT == "auto" else VECTOR_FORMAT
+        if vector_format not in FORMATS:
+            raise ValueError(f"Неизвестный VECTOR_FORMAT={VECTOR_FORMAT!r}, ожидается auto или {', '.join(FORMATS)}")
+        self.vector_format = vector_format
+        print(f"Формат векторов NoticeEmbeddings.Vector: {vector_format}")
+
+    def refresh_model(self) -> ModelInfo:
+        """Состояние своей модели и список моделей, чьи эмбеддинги запись не трогает."""
+        info = get_model(self.read_cursor, self.source)
+        if info is None:
+            raise ValueError(f"Модель {self.source} не зарегистрирована: "
+                             f"python embedding_models.py register --name {self.source} ...")
+        if self.info is not None and info.model != self.info.model:
+            raise ValueError(f"{self.source}: модель сменилась с {self.info.model} на {info.model}, нужен перезапуск")
+        if self.info is None or info.state != self.info.state:
+            print(f"[MODELS] {info.name}: {info.model} ({info.dims}), состояние {info.state}")
+        self.info = info
+        self.keep_sources = [m.name for m in list_models(self.read_cursor)]
+        return info
+
+    def disconnect(self) -> None:
+        for obj in (self.read_cursor, self.read_conn, self.cursor, self.conn):
+            try:
+                if obj is not None:
+                    obj.close()
+            except Exception:
+                pass
+        self.conn = self.cursor = self.read_conn = self.read_cursor = None
+        print("Соединение с БД закрыто.")
 
-            texts = [build_notice_text(row) for row in notices]
+    def close(self) -> None:
+        self.disconnect()
+        if self.cache is not None:
+            self.cache.close()
+        if self.pool is not None:
+            self.pool.close()
+
+    def has_changes(self) -> bool:
+        self._tick()
+        return has_changes(self.read_cursor, load_watermark(self.read_cursor, self.source))
+
+    def _tick(self) -> None:
+        """Замер @@DBTS для времени изменения строк (RowVersionClock, index_metrics.py)."""
+        self.clock.observe(current_dbts(self.read_cursor))
+
+    def _clocked(self, batches: Iterator[Tuple[List[Any], Optional[bytes], float]]
+                 ) -> Iterator[Tuple[List[Any], Optional[bytes], float]]:
+        # замер сразу после чтения: каждая строка пачки изменена не позже него
+        for batch in batches:
+            self._tick()
+            yield batch
+
+    def _encode_stage(self, batch: Tuple[List[Any], Optional[bytes], float]) -> Dict[str, Any]:
+        notices, batch_watermark, read_seconds = batch
+        started = time.perf_counter()
+        to_embed, hashes, legacy = select_for_embedding(notices)
+        skipped = len(notices) - len(to_embed)
+        kind = "Изменённых записей" if batch_watermark is not None else "Открытых без эмбеддинга (вне очереди)"
+        print(f"{kind}: {len(notices)}, к индексации: {len(to_embed)}, "
+              f"текст не изменился: {skipped}")
+        embeddings = None
+        if to_embed:
+            # одинаковые тексты считаем один раз, уже посчитанные берём из кэша
+            embeddings = encode_cached([text for _, text in to_embed],
+                                       [content_hash(row) for row, _ in to_embed], self.encode, self.cache)
+            if self.cache is not None:
+                print(f"Кэш эмбеддингов: из кэша {self.cache.hits}, посчитано моделью {self.cache.misses} (всего)")
+        return {
+            "rows": [row for row, _ in to_embed],
+            "embeddings": embeddings,
+            "hashes": hashes,
+            "legacy": legacy,
+            "skipped": skipped,
+            "watermark": batch_watermark,
+            "notices": len(notices),
+            "stages": {"read": read_seconds, "encode": time.perf_counter() - started},
+        }
+
+    def _write_stage(self, batch: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        if batch["rows"]:
+            upsert_embeddings_bulk(self.cursor, batch["rows"], batch["embeddings"], batch["hashes"],
+                                   self.source, self.info.dims, self.vector_format,
+                                   keep_sources=self.keep_sources)
+        if batch["legacy"]:
+            set_text_hashes(self.cursor, batch["legacy"], self.source)
+        if batch["watermark"] is not None:
+            save_watermark(self.cursor, batch["watermark"], self.source)
+            watermark_text = f"отметка 0x{batch['watermark'].hex()}"
+        else:
+            watermark_text = "вне очереди, отметка не сдвигается"
+        self.conn.commit()
+
+        rows = batch["rows"]
+        self.metrics.record_batch(
+            batch["notices"], len(rows), batch["skipped"],
+            dict(batch["stages"], write=time.perf_counter() - started),
+            self.clock.lags([bytes(r.RowVer) for r in rows]),
+            lag_seconds([getattr(r, "PublishDate", None) for r in rows]),
+        )
 
-            embeddings = model.encode(
-                texts,
-                batch_size=BATCH_SIZE,
-                show_progress_bar=True,
-                convert_to_numpy=True,
-                normalize_embeddings=False,
+        self.totals["processed"] += len(batch["rows"])
+        self.totals["skipped"] += batch["skipped"]
+        self.totals["batches"] += 1
+        print(f"Готово, проиндексировано суммарно: {self.totals['processed']}, "
+              f"пропущено: {self.totals['skipped']}, {watermark_text}")
+
+    def run_pass(self, batch_size: int = DB_BATCH_SIZE) -> int:
+        """Один проход до конца изменений; возвращает число пачек."""
+        info = self.refresh_model()
+        if info.state == RETIRED:
+            print(f"[MODELS] {info.name} выведена из поиска, индексация остановлена")
+            return 0
+        watermark = load_watermark(self.cursor, self.source)
+        print(f"Отметка индексатора {self.source}: 0x{watermark.hex()}")
+        batches_before = self.totals["batches"]
+        self.metrics.begin_pass(count_backlog(self.read_cursor, watermark))
+        building = info.state == BUILDING
+        self._tick()
+        batches = self._clocked(iter_changed_batches(self.read_cursor, watermark, batch_size,
+                                                     0 if building else PRIORITY_BATCH_SIZE, self.source))
+        if building and self.rate > 0:
+            batches = throttle(batches, self.rate)     # фоновая индексация не нагружает БД
+        try:
+            # чтение пачки N+1, модель на пачке N и запись N-1 идут одновременно
+            started = time.perf_counter()
+            busy = run_pipeline(
+                batches,
+                [("encode", self._encode_stage), ("write", self._write_stage)],
+                depth=PIPELINE_DEPTH,
             )
+            elapsed = time.perf_counter() - started
+        except Exception:
+            self.metrics.record_error()
+            self.conn.rollback()
+            raise
+        backlog = count_backlog(self.read_cursor, load_watermark(self.read_cursor, self.source))
+        self.metrics.end_pass(backlog)
+        if building:
+            self._check_coverage(backlog)
+        batches = self.totals["batches"] - batches_before
+        if batches:
+            print(f"[PIPE] {batches} пачек за {elapsed:.1f} с; занятость стадий: "
+                  + ", ".join(f"{name} {sec:.1f} с ({sec / max(elapsed, 1e-9):.0%})" for name, sec in busy.items()))
+            print(self.metrics.summary())
+        return batches
+
+    def _check_coverage(self, backlog: int) -> None:
+        """
+        Прогресс строящейся модели; при полном покрытии и auto_cutover — переключение поиска.
+        coverage() — анти-соединение по всем Notice, поэтому оно запускается только когда
+        отметка догнала изменения (backlog == 0); до того печатается лишь остаток.
+        """
+        if backlog:
+            print(f"[MODELS] {self.source}: изменений после отметки {backlog}")
+            return
+        missing, total = coverage(self.read_cursor, self.source)
+        print(f"[MODELS] {self.source}: покрытие {(total - missing) / max(total, 1):.2%}, "
+              f"без эмбеддинга {missing} из {total}, изменений после отметки {backlog}")
+        if self.auto_cutover and not missing and not backlog:
+            cutover(self.cursor, self.source)
+            self.conn.commit()
+            self.refresh_model()
 
-            print("Записываю эмбеддинги в базу...")
-            upsert_embeddings(cursor, notices, embeddings)
 
-            conn.commit()
+def run_daemon(indexer: Indexer, waker: IndexWaker, poll_seconds: float, batch_size: int) -> None:
+    """
+    Модель загружена один раз. Проход — сразу при старте, затем по сигналу из очереди
+    или (запасной путь) когда дешёвая проверка has_changes() раз в poll_seconds что-то
+    находит. Сбой БД — переподключение с паузой, модель при этом не перезагружается.
+    Когда поиск переключён на другую модель (своя — retired), демон завершается.
+    """
+    backoff = 5.0
+    need_pass = True
+    while True:
+        try:
+            if indexer.conn is None:
+                indexer.connect()
+            if need_pass or indexer.has_changes():
+                indexer.run_pass(batch_size)
+            backoff = 5.0
+            if indexer.info.state == RETIRED:
+                return
+        except Exception as ex:
+            print(f"ОШИБКА прохода индексации: {ex}; переподключение через {backoff:.0f} с")
+            indexer.disconnect()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 300.0)
+            need_pass = True
+            continue
+        need_pass = waker.wait(poll_seconds)
+        if need_pass:
+            print("[WAKE] сигнал о новых закупках")
 
-            total_processed += len(notices)
-            print(f"Готово, обработано суммарно: {total_processed}")
 
-    except Exception as ex:
-        conn.rollback()
-        print("ОШИБКА, транзакция откатена:", ex)
-        raise
+# ======= MAIN =======
+
+def main():
+    ap = argparse.ArgumentParser(description="Индексация Notices в NoticeEmbeddings")
+    ap.add_argument("--daemon", action="store_true",
+                    help="работать постоянно: модель загружена один раз, проходы по сигналу/опросу")
+    ap.add_argument("--poll-seconds", type=float, default=float(os.environ.get("INDEX_POLL_SECONDS", "30")),
+                    help="демон: как часто проверять изменения без сигнала (по умолчанию 30)")
+    ap.add_argument("--micro-batch", type=int, default=int(os.environ.get("INDEX_MICRO_BATCH", "64")),
+                    help="демон: размер пачки из БД (по умолчанию 64 — в поиск быстрее)")
+    ap.add_argument("--wake-url", default=WAKE_URL, help="amqp://... — очередь сигналов (INDEX_WAKE_URL)")
+    ap.add_argument("--wake-queue", default=WAKE_QUEUE, help="имя очереди сигналов (INDEX_WAKE_QUEUE)")
+    ap.add_argument("--source", default=INDEXER_NAME,
+                    help="модель из реестра EmbeddingModels (embedding_models.py), по умолчанию INDEXER_NAME")
+    ap.add_argument("--rate", type=float, default=float(os.environ.get("INDEX_RATE", "0")),
+                    help="пока модель строится (building): не больше Notice в секунду; 0 — без ограничения")
+    ap.add_argument("--cutover", action="store_true",
+                    help="переключить поиск на строящуюся модель, когда у всех Notice будут её эмбеддинги")
+    ap.add_argument("--metrics-port", type=int, default=int(os.environ.get("INDEX_METRICS_PORT", "0")),
+                    help="порт HTTP /metrics (Prometheus) и /metrics.json; 0 — не поднимать")
+    ap.add_argument("--metrics-host", default=os.environ.get("INDEX_METRICS_HOST", DEFAULT_METRICS_HOST),
+                    help="адрес HTTP /metrics (по умолчанию 127.0.0.1; 0.0.0.0 — все интерфейсы)")
+    args = ap.parse_args()
+
+    indexer = Indexer(args.source, args.rate, args.cutover)
+    server = None
+    if args.metrics_port:
+        server = MetricsServer(indexer.metrics, args.metrics_port, args.metrics_host)
+        server.start()
+    try:
+        if args.daemon:
+            waker = IndexWaker(args.wake_url, args.wake_queue)
+            print(f"Демон индексации: сигналы {'из ' + args.wake_queue if args.wake_url else 'выключены'}, "
+                  f"опрос раз в {args.poll_seconds:.0f} с, пачка {args.micro_batch}")
+            try:
+                run_daemon(indexer, waker, args.poll_seconds, args.micro_batch)
+            finally:
+                waker.close()
+        else:
+            indexer.connect()
+            try:
+                if not indexer.run_pass():
+                    print("Нет изменённых записей. Выход.")
+            except Exception as ex:
+                print("ОШИБКА, транзакция откатена:", ex)
+                raise
+    except KeyboardInterrupt:
+        print("Остановлено.")
     finally:
-        cursor.close()
-        conn.close()
-        print("Соединение с БД закрыто.")
+        if server is not None:
+            server.stop()
+        indexer.close()
 
 
 if __name__ == "__main__":
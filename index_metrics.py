@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Метрики свежести поиска для index.py: очередь неиндексированных, скорость,
+время стадий по пачкам и задержка «закупка -> эмбеддинг».
+
+Задержка считается в момент фиксации пачки для каждой записанной закупки двумя способами:
+    change  — от изменения строки (вставка или правка любым писателем — харвестер, C#),
+    publish — от Notices.PublishDate (публикация в ЕИС; включает задержку харвеста).
+p50/p95 — по последним LAG_WINDOW значениям; _sum и _count — накопленные за время работы.
+
+Время изменения берётся из Notices.RowVer: столбца со временем правки в Notices нет,
+а триггер на таблице сломал бы OUTPUT в SaveChanges EF Core. RowVersionClock запоминает
+пары (@@DBTS, время) при каждом опросе и чтении пачки; строка с RowVer = v изменена
+между последним замером с @@DBTS < v и первым с @@DBTS >= v. Задержка считается от
+второго — это нижняя оценка с точностью до интервала замеров (INDEX_POLL_SECONDS или
+время между пачками). Строки, изменённые до первого замера (до запуска индексатора),
+в change не попадают.
+
+    GET http://<INDEX_METRICS_HOST>:<INDEX_METRICS_PORT>/metrics   — формат Prometheus (text 0.0.4)
+    GET .../metrics.json                                             — то же в JSON
+
+Сервер слушает 127.0.0.1 (DEFAULT_METRICS_HOST): без аутентификации наружу его открывают явно —
+INDEX_METRICS_HOST / --metrics-host (например, 0.0.0.0 за файрволом для Prometheus).
+
+По окончании каждого прохода index.py печатает summary().
+Для алертов: index_backlog_notices, index_lag_seconds{source="change",quantile="0.95"},
+index_last_commit_timestamp_seconds (давно не было фиксаций при непустой очереди).
+"""
+
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+LAG_WINDOW = 10000
+CLOCK_SAMPLES = 20000
+STAGES = ("read", "encode", "write")
+LAG_SOURCES = ("change", "publish")
+DEFAULT_METRICS_HOST = "127.0.0.1"
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def lag_seconds(moments: List[Optional[datetime]], now: Optional[datetime] = None) -> List[float]:
+    """Секунды от каждого момента (naive UTC или aware) до now; None пропускаются."""
+    now = now or datetime.now(timezone.utc)
+    out = []
+    for m in moments:
+        if m is None:
+            continue
+        if m.tzinfo is None:
+            m = m.replace(tzinfo=timezone.utc)
+        out.append(max(0.0, (now - m).total_seconds()))
+    return out
+
+
+class RowVersionClock:
+    """Соответствие rowversion -> время по замерам @@DBTS; потокобезопасно."""
+
+    def __init__(self, max_samples: int = CLOCK_SAMPLES):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._versions: List[bytes] = []
+        self._times: List[float] = []
+
+    def observe(self, dbts: bytes, at: Optional[float] = None) -> None:
+        dbts = bytes(dbts)
+        with self._lock:
+            if self._versions and dbts <= self._versions[-1]:
+                return                      # ничего не менялось: раньше увиденное время точнее
+            self._versions.append(dbts)
+            self._times.append(time.time() if at is None else at)
+            if len(self._versions) > self.max_samples:
+                drop = len(self._versions) - self.max_samples // 2
+                del self._versions[:drop], self._times[:drop]
+
+    def changed_at(self, rowver: bytes) -> Optional[float]:
+        """Время первого замера, на котором изменение уже было; None — до первого замера."""
+        with self._lock:
+            idx = bisect.bisect_left(self._versions, bytes(rowver))
+            if idx == 0 or idx == len(self._versions):
+                return None
+            return self._times[idx]
+
+    def lags(self, rowvers: List[bytes], now: Optional[float] = None) -> List[float]:
+        now = time.time() if now is None else now
+        moments = [self.changed_at(v) for v in rowvers if v is not None]
+        return [max(0.0, now - m) for m in moments if m is not None]
+
+
+class IndexMetrics:
+    def __init__(self, indexer: str = ""):
+        self.indexer = indexer
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.notices_total = 0          # прочитано из БД
+        self.embedded_total = 0         # записано эмбеддингов
+        self.skipped_total = 0          # текст не изменился
+        self.batches_total = 0
+        self.errors_total = 0
+        self.backlog: Optional[int] = None
+        self.last_commit: Optional[float] = None
+        self.stage_seconds: Dict[str, float] = {s: 0.0 for s in STAGES}
+        self.last_batch: Dict[str, float] = {}
+        self.lags: Dict[str, deque] = {src: deque(maxlen=LAG_WINDOW) for src in LAG_SOURCES}
+        self.lag_count: Dict[str, int] = {src: 0 for src in LAG_SOURCES}
+        self.lag_sum: Dict[str, float] = {src: 0.0 for src in LAG_SOURCES}
+        self._pass_started: Optional[float] = None
+        self._pass_embedded = 0
+        self.last_pass_rate: Optional[float] = None
+
+    def begin_pass(self, backlog: Optional[int]) -> None:
+        with self._lock:
+            self.backlog = backlog
+            self._pass_started = time.time()
+            self._pass_embedded = 0
+
+    def end_pass(self, backlog: Optional[int]) -> None:
+        with self._lock:
+            self.backlog = backlog
+            if self._pass_started is not None and self._pass_embedded:
+                self.last_pass_rate = self._pass_embedded / max(time.time() - self._pass_started, 1e-9)
+
+    def record_batch(self, notices: int, embedded: int, skipped: int, stages: Dict[str, float],
+                     change_lags: List[float], publish_lags: List[float]) -> None:
+        with self._lock:
+            self.notices_total += notices
+            self.embedded_total += embedded
+            self.skipped_total += skipped
+            self.batches_total += 1
+            self._pass_embedded += embedded
+            self.last_commit = time.time()
+            for name, sec in stages.items():
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + sec
+            self.last_batch = dict(stages, notices=notices, embedded=embedded)
+            for src, values in (("change", change_lags), ("publish", publish_lags)):
+                self.lags[src].extend(values)
+                self.lag_count[src] += len(values)
+                self.lag_sum[src] += sum(values)
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors_total += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lags = {src: list(values) for src, values in self.lags.items()}
+            totals = {src: (self.lag_count[src], self.lag_sum[src]) for src in LAG_SOURCES}
+            snap = {
+                "indexer": self.indexer,
+                "uptime_seconds": time.time() - self.started,
+                "backlog_notices": self.backlog,
+                "notices_total": self.notices_total,
+                "embedded_total": self.embedded_total,
+                "skipped_total": self.skipped_total,
+                "batches_total": self.batches_total,
+                "errors_total": self.errors_total,
+                "last_commit_timestamp_seconds": self.last_commit,
+                "embed_rate_per_second": self.last_pass_rate,
+                "stage_seconds_total": dict(self.stage_seconds),
+                "last_batch": dict(self.last_batch),
+            }
+        snap["lag_seconds"] = {
+            src: {"p50": _percentile(values, 0.5), "p95": _percentile(values, 0.95), "samples": len(values),
+                  "count": totals[src][0], "sum": totals[src][1]}
+            for src, values in lags.items()
+        }
+        return snap
+
+    def render_prometheus(self) -> str:
+        s = self.snapshot()
+        label = f'indexer="{s["indexer"]}"'
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[tuple]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for extra, value in samples:
+                if value is None:
+                    continue
+                labels = ",".join(x for x in (label, extra) if x)
+                lines.append(f"{name}{{{labels}}} {value}")
+
+        metric("index_backlog_notices", "gauge", "Notices changed after the watermark, not yet indexed",
+               [("", s["backlog_notices"])])
+        metric("index_notices_total", "counter", "Notices read by the indexer", [("", s["notices_total"])])
+        metric("index_embedded_total", "counter", "Embeddings written", [("", s["embedded_total"])])
+        metric("index_skipped_total", "counter", "Notices skipped, text unchanged", [("", s["skipped_total"])])
+        metric("index_batches_total", "counter", "Committed batches", [("", s["batches_total"])])
+        metric("index_errors_total", "counter", "Failed passes", [("", s["errors_total"])])
+        metric("index_embed_rate", "gauge", "Embeddings per second over the last pass",
+               [("", s["embed_rate_per_second"])])
+        metric("index_last_commit_timestamp_seconds", "gauge", "Unix time of the last committed batch",
+               [("", s["last_commit_timestamp_seconds"])])
+        metric("index_stage_seconds_total", "counter", "Busy time per pipeline stage",
+               [(f'stage="{k}"', v) for k, v in s["stage_seconds_total"].items()])
+        metric("index_last_batch_stage_seconds", "gauge", "Stage time of the last batch",
+               [(f'stage="{k}"', v) for k, v in s["last_batch"].items() if k in STAGES])
+        metric("index_lag_seconds", "summary",
+               "Notice-to-embedding lag (change: RowVer change time, publish: PublishDate)",
+               [(f'source="{src}",quantile="{q}"', v[key])
+                for src, v in s["lag_seconds"].items() for q, key in (("0.5", "p50"), ("0.95", "p95"))])
+        for src, v in s["lag_seconds"].items():      # накопленные, как требует тип summary
+            lines.append(f'index_lag_seconds_sum{{{label},source="{src}"}} {v["sum"]}')
+            lines.append(f'index_lag_seconds_count{{{label},source="{src}"}} {v["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        s = self.snapshot()
+
+        def fmt(v: Optional[float]) -> str:
+            return "—" if v is None else f"{v:.0f} с"
+
+        change, publish = s["lag_seconds"]["change"], s["lag_seconds"]["publish"]
+        rate = s["embed_rate_per_second"]
+        return (f"[METRICS] очередь {s['backlog_notices'] if s['backlog_notices'] is not None else '—'}, "
+                f"записано {s['embedded_total']}, пропущено {s['skipped_total']}, пачек {s['batches_total']}, "
+                f"скорость {'—' if rate is None else f'{rate:.1f}/с'}; "
+                f"стадии: " + ", ".join(f"{k} {v:.1f} с" for k, v in s["stage_seconds_total"].items()) + "; "
+                f"задержка от изменения p50 {fmt(change['p50'])} / p95 {fmt(change['p95'])}, "
+                f"от публикации p50 {fmt(publish['p50'])} / p95 {fmt(publish['p95'])}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics: IndexMetrics = None
+
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body = json.dumps(self.metrics.snapshot(), ensure_ascii=False).encode("utf-8")
+            ctype = "application/json; charset=utf-8"
+        elif self.path.startswith("/metrics"):
+            body = self.metrics.render_prometheus().encode("utf-8")
+            ctype = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # без строки на каждый опрос
+        pass
+
+
+class MetricsServer:
+    def __init__(self, metrics: IndexMetrics, port: int, host: str = DEFAULT_METRICS_HOST):
+        handler = type("MetricsHandler", (_MetricsHandler,), {"metrics": metrics})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="index-metrics", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        host, port = self._server.server_address[:2]
+        print(f"[METRICS] http://{host}:{port}/metrics")
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Сигнал «в Notices появились новые закупки» для демона индексации (index.py --daemon).
+
+Очередь RabbitMQ INDEX_WAKE_QUEUE (по умолчанию notices.indexer.wake) объявляется
+с x-max-length=1 и drop-head: сообщения — только подсказка «пора проверить», содержимое
+не важно, и сколько бы их ни пришло, пока индексатор занят, в очереди останется одно.
+
+    WakePublisher — сторона загрузки (notice_sinks.NoticesDbSink после записи пачки,
+                    downloader.py --index-wake-url); ошибки публикации не мешают загрузке.
+    IndexWaker    — сторона индексатора: поток-потребитель с переподключением;
+                    wait(timeout) возвращает True, если пришёл сигнал, False — по таймауту
+                    (тогда демон делает дешёвую проверку сам — запасной опрос).
+
+Без INDEX_WAKE_URL (amqp://...) или без пакета pika демон работает только опросом.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+WAKE_URL = os.environ.get("INDEX_WAKE_URL", "")
+WAKE_QUEUE = os.environ.get("INDEX_WAKE_QUEUE", "notices.indexer.wake")
+_QUEUE_ARGS = {"x-max-length": 1, "x-overflow": "drop-head"}
+
+
+def _declare(channel, queue: str) -> None:
+    channel.queue_declare(queue=queue, durable=True, arguments=_QUEUE_ARGS)
+
+
+class WakePublisher:
+    def __init__(self, url: str = WAKE_URL, queue: str = WAKE_QUEUE):
+        self.url = url
+        self.queue = queue
+        self._lock = threading.Lock()
+        self._connection = None
+        self._channel = None
+
+    def notify(self, **info) -> bool:
+        if not self.url:
+            return False
+        body = json.dumps({"at": datetime.now(timezone.utc).isoformat(), **info}).encode("utf-8")
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._channel is None:
+                        import pika
+
+                        self._connection = pika.BlockingConnection(pika.URLParameters(self.url))
+                        self._channel = self._connection.channel()
+                        _declare(self._channel, self.queue)
+                    self._channel.basic_publish(exchange="", routing_key=self.queue, body=body)
+                    return True
+                except Exception as exc:
+                    self._reset()
+                    if attempt:
+                        print(f"[WAKE] не удалось отправить сигнал индексатору: {exc}")
+        return False
+
+    def _reset(self) -> None:
+        try:
+            if self._connection is not None:
+                self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+        self._channel = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._reset()
+
+
+class IndexWaker:
+    def __init__(self, url: str = WAKE_URL, queue: str = WAKE_QUEUE, reconnect_seconds: float = 10.0):
+        self.url = url
+        self.queue = queue
+        self.reconnect_seconds = reconnect_seconds
+        self._event = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if url:
+            self._thread = threading.Thread(target=self._consume, name="index-wake", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: float) -> bool:
+        woken = self._event.wait(timeout)
+        self._event.clear()
+        return woken
+
+    def wake(self) -> None:
+        self._event.set()
+
+    def _consume(self) -> None:
+        try:
+            import pika
+        except ImportError:
+            print("[WAKE] пакет pika не установлен — только опрос")
+            return
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = pika.BlockingConnection(pika.URLParameters(self.url))
+                channel = connection.channel()
+                _declare(channel, self.queue)
+                print(f"[WAKE] жду сигналов в очереди {self.queue}")
+                for method, _props, _body in channel.consume(self.queue, auto_ack=True, inactivity_timeout=1.0):
+                    if self._stop.is_set():
+                        break
+                    if method is not None:
+                        self._event.set()
+                channel.cancel()
+            except Exception as exc:
+                print(f"[WAKE] соединение с RabbitMQ: {exc}; повтор через {self.reconnect_seconds:.0f} с")
+                self._stop.wait(self.reconnect_seconds)
+            finally:
+                try:
+                    if connection is not None and connection.is_open:
+                        connection.close()
+                except Exception:
+                    pass
+
+    def close(self) -> None:
+        self._stop.set()
+        self._event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
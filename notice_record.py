@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Компактная типизированная запись закупки (вместо словаря из 17 строк).
+
+NoticeRecord собирается один раз при извлечении: цена — Decimal, даты — datetime,
+ОКПД2 — кортеж интернированных строк, ссылки — кортеж Link. NamedTuple не держит
+__dict__ на каждый экземпляр, а повторяющиеся строки (docKind, валюта, способ
+определения поставщика, коды ОКПД2) хранятся в одном экземпляре на процесс.
+
+to_details() возвращает прежний словарь строк (camelCase) — для manifest.tsv.
+"""
+
+import datetime as dt
+import sys
+from decimal import Decimal, InvalidOperation
+from typing import NamedTuple
+
+
+class Link(NamedTuple):
+    url: str
+    name: str
+
+
+def parse_price(value: str) -> Decimal | None:
+    if not value:
+        return None
+    try:
+        return Decimal(value.strip().replace(" ", "").replace(",", "."))
+    except InvalidOperation:
+        return None
+
+
+def parse_datetime(value: str) -> dt.datetime | None:
+    if not value:
+        return None
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%d.%m.%Y %H:%M:%S", "%d.%m.%Y"):
+        try:
+            return dt.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _intern(value: str) -> str:
+    return sys.intern(value) if value else ""
+
+
+def _fmt_dt(value: dt.datetime | None) -> str:
+    return value.isoformat() if value is not None else ""
+
+
+class NoticeRecord(NamedTuple):
+    doc_kind: str
+    purchase_number: str
+    ikz: str
+    placing_code: str
+    placing_name: str
+    customer_name: str
+    customer_inn: str
+    customer_kpp: str
+    max_price: Decimal | None
+    currency: str
+    name: str
+    publish_date: dt.datetime | None
+    app_start: dt.datetime | None
+    app_end: dt.datetime | None
+    platform: str
+    okpd2: tuple[str, ...]
+    links: tuple[Link, ...]
+
+    @classmethod
+    def from_details(cls, det: dict) -> "NoticeRecord":
+        okpd2 = det.get("okpd2") or ()
+        if isinstance(okpd2, str):
+            okpd2 = okpd2.split(",")
+        return cls(
+            doc_kind=_intern(det.get("docKind", "")),
+            purchase_number=det.get("purchaseNumber", ""),
+            ikz=det.get("ikz", ""),
+            placing_code=_intern(det.get("placingCode", "")),
+            placing_name=_intern(det.get("placingName", "")),
+            customer_name=det.get("customerName", ""),
+            customer_inn=det.get("customerINN", ""),
+            customer_kpp=det.get("customerKPP", ""),
+            max_price=parse_price(det.get("maxPrice", "")),
+            currency=_intern(det.get("currency", "")),
+            name=det.get("name", ""),
+            publish_date=parse_datetime(det.get("publishDate", "")),
+            app_start=parse_datetime(det.get("appStart", "")),
+            app_end=parse_datetime(det.get("appEnd", "")),
+            platform=_intern(det.get("platform", "")),
+            okpd2=tuple(sorted(_intern(c.strip()) for c in okpd2 if c and c.strip())),
+            links=tuple(Link(l.get("url", ""), l.get("name", "")) for l in det.get("links") or ()),
+        )
+
+    def to_details(self) -> dict:
+        """Прежний словарь строк (ключи как у extract_details_and_links)."""
+        return {
+            "docKind": self.doc_kind,
+            "purchaseNumber": self.purchase_number,
+            "ikz": self.ikz,
+            "placingCode": self.placing_code,
+            "placingName": self.placing_name,
+            "customerName": self.customer_name,
+            "customerINN": self.customer_inn,
+            "customerKPP": self.customer_kpp,
+            "maxPrice": str(self.max_price) if self.max_price is not None else "",
+            "currency": self.currency,
+            "name": self.name,
+            "publishDate": _fmt_dt(self.publish_date),
+            "appStart": _fmt_dt(self.app_start),
+            "appEnd": _fmt_dt(self.app_end),
+            "platform": self.platform,
+            "okpd2": ",".join(self.okpd2),
+            "links": [{"url": l.url, "name": l.name} for l in self.links],
+        }
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сайдкар с уже извлечёнными полями закупки: out/.../<purchaseNumber>/records.jsonl.
+
+Рядом с notice_*.xml / package_*.xml харвестер дописывает по строке JSON на каждый
+сохранённый XML — поля NoticeRecord (см. notice_record.py) в JSON-совместимом виде:
+
+    {"file": "notice_epNotificationEF2020_2025-01-02_a.xml", "source": "notice",
+     "bytes": 18234, "docKind": "epNotificationEF2020", "purchaseNumber": "0175...",
+     "maxPrice": "1250000.00", "publishDate": "2025-01-02T10:00:00+03:00",
+     "okpd2": ["62.01.11.000"], "links": [{"url": "...", "name": "..."}], ...}
+
+"file" — имя файла как он лежит на диске (при --compress-xml — *.xml.zst), "bytes" — его размер.
+Цены — десятичная строка (точно, без float), даты — ISO 8601, ОКПД2 — список.
+read_sidecar() возвращает словари с Decimal / datetime, load_records() — NoticeRecord,
+так что потребителям (загрузка ZIP на бэкенде, переобработка, каталог манифестов)
+полный разбор XML не нужен.
+"""
+
+import datetime as dt
+import json
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterator
+
+from notice_record import NoticeRecord
+from xml_store import read_xml
+
+SIDECAR_NAME = "records.jsonl"
+
+DATE_FIELDS = ("publishDate", "appStart", "appEnd")
+PRICE_FIELDS = ("maxPrice",)
+
+
+def sidecar_record(rec: NoticeRecord, file_name: str, source: str, size: int) -> dict:
+    """
+    NoticeRecord -> строка сайдкара (JSON-совместимые типы).
+    """
+    out = {"file": file_name, "source": source, "bytes": size}
+    out.update(rec.to_details())
+    out["maxPrice"] = str(rec.max_price) if rec.max_price is not None else None
+    for k, v in (("publishDate", rec.publish_date), ("appStart", rec.app_start), ("appEnd", rec.app_end)):
+        out[k] = v.isoformat() if v is not None else None
+    out["okpd2"] = list(rec.okpd2)
+    return out
+
+
+def append_records(folder: Path, records: list[dict]) -> Path:
+    path = folder / SIDECAR_NAME
+    with path.open("a", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+    return path
+
+
+def _typed(rec: dict) -> dict:
+    for k in PRICE_FIELDS:
+        if rec.get(k) is not None:
+            rec[k] = Decimal(rec[k])
+    for k in DATE_FIELDS:
+        if rec.get(k):
+            rec[k] = dt.datetime.fromisoformat(rec[k])
+    return rec
+
+
+def read_sidecar(folder: Path, typed: bool = True) -> list[dict]:
+    """
+    Записи сайдкара папки закупки. Записи, чей XML пропал или изменился в размере,
+    отбрасываются — тогда вызывающему стоит разобрать XML заново.
+    """
+    path = folder / SIDECAR_NAME
+    if not path.exists():
+        return []
+    result = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            xml_path = folder / rec.get("file", "")
+            try:
+                if xml_path.stat().st_size != rec.get("bytes"):
+                    continue
+            except OSError:
+                continue
+            result.append(_typed(rec) if typed else rec)
+    return result
+
+
+def load_records(folder: Path) -> list[tuple[str, str, NoticeRecord]]:
+    """(имя XML, source, NoticeRecord) по сайдкару папки — без разбора XML."""
+    return [(rec["file"], rec.get("source", ""), NoticeRecord.from_details(rec))
+            for rec in read_sidecar(folder, typed=False)]
+
+
+def load_xml(folder: Path, rec: dict) -> bytes:
+    """Исходный XML записи сайдкара (файл может быть сжат: *.xml.zst, см. xml_store.py)."""
+    return read_xml(folder / rec["file"])
+
+
+def iter_sidecars(out_root: Path, typed: bool = True) -> Iterator[tuple[Path, list[dict]]]:
+    """(папка закупки, записи) для всех сайдкаров под out_root."""
+    for path in sorted(Path(out_root).rglob(SIDECAR_NAME)):
+        yield path.parent, read_sidecar(path.parent, typed)
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Куда харвестер (downloader.py --sink ...) отдаёт найденные закупки.
+
+    fs    — прежняя раскладка out/<дата>_<регион>/<номер>/ (XML, manifest.tsv, records.jsonl),
+            дальше — как раньше, ZIP-выгрузка на --upload-url;
+    http  — пачки JSON lines (gzip) с полями NoticeRecord на --sink-url, без XML и ZIP;
+    db    — пакетная вставка/обновление строк таблицы Notices напрямую в БД
+            (sqlite:путь.db для тестов и локальной отладки, mssql:<строка подключения> — рабочая БД).
+
+Несколько приёмников задаются через запятую: --sink fs,db.
+Все приёмники потокобезопасны (backfill и воркеры очереди пишут из нескольких потоков).
+
+http и db копят записи в памяти; flush() либо доставляет всё накопленное, либо
+бросает SinkError (записи остаются в буфере до следующего flush). Кто подтверждает
+работу (очередь, журнал backfill), делает это только после успешного flush().
+"""
+
+import datetime as dt
+import gzip
+import json
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass, field
+from decimal import Decimal
+from pathlib import Path
+
+import requests
+
+from harvest_profiler import profiler
+from index_wake import WakePublisher
+from notice_record import NoticeRecord
+from notice_sidecar import append_records, sidecar_record
+from xml_store import XmlCodec
+
+SINK_KINDS = ("fs", "http", "db")
+
+
+class SinkError(Exception):
+    """Накопленные записи не доставлены; они остались в буфере приёмника."""
+
+
+@dataclass
+class NoticeItem:
+    """Одна найденная закупка со всем, что о ней известно после разбора."""
+    region: int
+    date: str                           # YYYY-MM-DD, день выборки
+    doc_type: str
+    number: str
+    notice_name: str                    # notice_<docType>_<дата>_<имя в архиве>.xml
+    notice_xml: bytes
+    record: NoticeRecord
+    file_rows: list[dict] = field(default_factory=list)                           # строки # files манифеста
+    packages: list[tuple[str, bytes, NoticeRecord]] = field(default_factory=list)  # (имя, XML, запись)
+
+
+# ---------- manifest ----------
+def save_manifest_row(folder: Path, data: dict, file_rows: list[dict]) -> Path:
+    manifest = folder / "manifest.tsv"
+    hdr1 = ["purchaseNumber","docKind","placingCode","placingName","customerName","customerINN","customerKPP",
+            "maxPrice","currency","publishDate","appStart","appEnd","platform","okpd2","name"]
+    hdr2 = ["ordinal","source","url","saved_as","content_type","bytes"]
+    first_write = not manifest.exists()
+    with manifest.open("a", encoding="utf-8") as f:
+        if first_write:
+            f.write("# meta\n")
+            f.write("\t".join(hdr1) + "\n")
+        f.write("\t".join([data.get(k, "") or "" for k in hdr1]) + "\n")
+        if file_rows:
+            if first_write:
+                f.write("# files\n")
+                f.write("\t".join(hdr2) + "\n")
+            for r in file_rows:
+                f.write("\t".join([str(r.get(k, "") or "") for k in hdr2]) + "\n")
+    return manifest
+
+
+class NoticeSink:
+    """write() возвращает локальные файлы, которые стоит выгрузить ZIP-ом (только у fs)."""
+
+    def write(self, item: NoticeItem) -> set[Path]:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Доставить накопленное; SinkError — не удалось, записи остались в буфере."""
+
+    def _flush_full(self) -> None:
+        # буфер заполнился посреди обхода: неудача не прерывает обход, записи
+        # уйдут со следующим flush(), а подтверждение работы дождётся его успеха
+        try:
+            self.flush()
+        except SinkError:
+            pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class FilesystemSink(NoticeSink):
+    """codec — сжатие notice_*/package_* в .xml.zst (см. xml_store.py), None — как раньше."""
+
+    def __init__(self, out_root: Path, codec: XmlCodec | None = None):
+        self.out_root = Path(out_root)
+        self.codec = codec
+
+    def _write_xml(self, path: Path, xb: bytes) -> Path:
+        if self.codec is None:
+            path.write_bytes(xb)
+            return path
+        return self.codec.write(path, xb)
+
+    def write(self, item: NoticeItem) -> set[Path]:
+        folder = self.out_root / f"{item.date}_{item.region:02d}" / item.number
+        (folder / "files").mkdir(parents=True, exist_ok=True)
+        written: set[Path] = set()
+        with profiler.stage("disk"):
+            notice_path = self._write_xml(folder / item.notice_name, item.notice_xml)
+            written.add(notice_path)
+            sidecar = [sidecar_record(item.record, notice_path.name, "notice", notice_path.stat().st_size)]
+            for name, xb, rec in item.packages:
+                pkg_path = self._write_xml(folder / name, xb)
+                written.add(pkg_path)
+                sidecar.append(sidecar_record(rec, pkg_path.name, "package", pkg_path.stat().st_size))
+            written.add(save_manifest_row(folder, item.record.to_details(), item.file_rows))
+            written.add(append_records(folder, sidecar))
+        return written
+
+
+def item_lines(item: NoticeItem) -> list[dict]:
+    """Строки сайдкара закупки (главный XML и XML пакета) с регионом и днём выборки."""
+    extra = {"region": f"{item.region:02d}", "date": item.date, "docType": item.doc_type}
+    lines = [{**sidecar_record(item.record, item.notice_name, "notice", len(item.notice_xml)), **extra}]
+    for name, xb, rec in item.packages:
+        lines.append({**sidecar_record(rec, name, "package", len(xb)), **extra})
+    return lines
+
+
+class HttpJsonlSink(NoticeSink):
+    """
+    POST пачками: тело — JSON lines, сжатое gzip (Content-Encoding: gzip).
+    При ошибке пачка остаётся в буфере и уходит со следующей попыткой.
+    """
+
+    def __init__(self, url: str, batch_size: int = 500, timeout: float = 120.0):
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._buf: list[dict] = []
+        self._lock = threading.Lock()
+        self._sess = requests.Session()
+
+    def write(self, item: NoticeItem) -> set[Path]:
+        with self._lock:
+            self._buf.extend(item_lines(item))
+            full = len(self._buf) >= self.batch_size
+        if full:
+            self._flush_full()
+        return set()
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._buf = self._buf, []
+        if not batch:
+            return
+        body = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in batch)
+        try:
+            with profiler.stage("upload"):
+                resp = self._sess.post(
+                    self.url, data=gzip.compress(body.encode("utf-8")),
+                    headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"},
+                    timeout=self.timeout,
+                )
+            resp.raise_for_status()
+            print(f"[SINK] http: отправлено записей {len(batch)}, HTTP {resp.status_code}")
+        except Exception as exc:
+            print(f"[SINK] http: ошибка отправки {len(batch)} записей ({exc}), повторим позже")
+            with self._lock:
+                self._buf[:0] = batch
+            raise SinkError(f"http: не отправлено записей {len(batch)}: {exc}") from exc
+
+
+# ---------- БД ----------
+# RawJson не пишем: C# читает его как сериализованный EpNotificationEf2020 (NoticeProcessor),
+# у харвестера такого объекта нет — новые строки получают NULL, у существующих он не трогается
+NOTICE_COLUMNS = ["Region", "PurchaseNumber", "PublishDate", "Href", "PlacingWayCode", "EtpName",
+                  "PurchaseObjectInfo", "MaxPrice", "Okpd2Code", "CollectingEnd"]
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Notices (
+    Id TEXT PRIMARY KEY,
+    Region INTEGER NOT NULL,
+    PurchaseNumber TEXT NOT NULL,
+    PublishDate TEXT,
+    Href TEXT,
+    PlacingWayCode TEXT,
+    EtpName TEXT,
+    EtpUrl TEXT,
+    PurchaseObjectInfo TEXT,
+    MaxPrice TEXT,
+    Okpd2Code TEXT,
+    Okpd2Name TEXT,
+    KvrCode TEXT,
+    KvrName TEXT,
+    RawJson TEXT,
+    CollectingEnd TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS UX_Notices_PurchaseNumber ON Notices (PurchaseNumber);
+"""
+
+# SQL Server: пачка -> #NoticeStage, затем один MERGE по PurchaseNumber под HOLDLOCK —
+# диапазон ключа блокируется до конца транзакции, параллельные воркеры не вставят дубль
+_MSSQL_STAGE = """
+IF OBJECT_ID('tempdb..#NoticeStage') IS NULL
+    CREATE TABLE #NoticeStage (
+        Region tinyint NOT NULL,
+        PurchaseNumber nvarchar(64) NOT NULL PRIMARY KEY,
+        PublishDate datetime2 NULL,
+        Href nvarchar(512) NULL,
+        PlacingWayCode nvarchar(32) NULL,
+        EtpName nvarchar(256) NULL,
+        PurchaseObjectInfo nvarchar(max) NULL,
+        MaxPrice decimal(18, 2) NULL,
+        Okpd2Code nvarchar(64) NULL,
+        CollectingEnd datetime2 NULL
+    );
+TRUNCATE TABLE #NoticeStage;
+"""
+
+_UPDATE_COLUMNS = [c for c in NOTICE_COLUMNS if c != "PurchaseNumber"]
+
+_MSSQL_MERGE = f"""
+MERGE [Notices] WITH (HOLDLOCK) AS t
+USING #NoticeStage AS s ON t.PurchaseNumber = s.PurchaseNumber
+WHEN MATCHED THEN
+    UPDATE SET {', '.join(f'{c} = s.{c}' for c in _UPDATE_COLUMNS)}
+WHEN NOT MATCHED BY TARGET THEN
+    INSERT (Id, {', '.join(NOTICE_COLUMNS)})
+    VALUES (NEWID(), {', '.join(f's.{c}' for c in NOTICE_COLUMNS)})
+OUTPUT $action;
+"""
+
+# SQLite (тесты, отладка): уникальный индекс + UPSERT; BEGIN IMMEDIATE сразу берёт
+# блокировку записи, так что подсчёт существующих и вставка не перемежаются с другим процессом
+_SQLITE_UPSERT = f"""
+INSERT INTO Notices (Id, {', '.join(NOTICE_COLUMNS)}) VALUES (?, {', '.join('?' * len(NOTICE_COLUMNS))})
+ON CONFLICT (PurchaseNumber) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in _UPDATE_COLUMNS)}
+"""
+
+
+def _utc_naive(value: dt.datetime | None) -> dt.datetime | None:
+    """Даты ЕИС приходят с +03:00; в БД (datetime2) храним UTC — C# сравнивает с DateTime.UtcNow."""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(dt.timezone.utc)
+    return value.replace(tzinfo=None)
+
+
+def notice_row(item: NoticeItem) -> dict:
+    rec = item.record
+    return {
+        "Region": item.region,
+        "PurchaseNumber": item.number,
+        "PublishDate": _utc_naive(rec.publish_date),
+        "Href": None,
+        "PlacingWayCode": rec.placing_code or None,
+        "EtpName": rec.platform or None,
+        "PurchaseObjectInfo": rec.name or None,
+        "MaxPrice": rec.max_price,
+        "Okpd2Code": rec.okpd2[0] if rec.okpd2 else None,
+        "CollectingEnd": _utc_naive(rec.app_end),
+    }
+
+
+def connect_db(spec: str):
+    """'sqlite:путь.db' или 'mssql:<строка подключения>' -> DB-API соединение (paramstyle qmark)."""
+    kind, sep, target = spec.partition(":")
+    if not sep:
+        raise ValueError("ожидается sqlite:<файл> или mssql:<строка подключения>")
+    if kind == "sqlite":
+        sqlite3.register_adapter(Decimal, str)
+        sqlite3.register_adapter(dt.datetime, lambda v: v.isoformat(sep=" "))
+        conn = sqlite3.connect(target, check_same_thread=False, isolation_level=None)
+        conn.executescript(SQLITE_SCHEMA)
+        return conn
+    if kind == "mssql":
+        import mssql_python
+        return mssql_python.connect(target)
+    raise ValueError(f"неизвестная БД: {kind}")
+
+
+class NoticesDbSink(NoticeSink):
+    """
+    Пакетная запись в Notices, ключ — PurchaseNumber: новые строки вставляются, у существующих
+    обновляются поля из записи харвестера (вектор, KVR, RawJson и анализы не трогаем).
+    SQL Server — временная таблица + MERGE WITH (HOLDLOCK), SQLite — UPSERT.
+    После записи пачки — сигнал демону индексации (wake, index_wake.py), если задан.
+
+    Это быстрый путь «закупка сразу видна в поиске», а не замена C# NoticeProcessor:
+    NoticeVersions, вложения (Attachments), RawJson, Okpd2Name/Kvr*/EtpUrl/Href и
+    уточнение региона (RegionDeterminationService) здесь не заполняются — Region берётся
+    из параметра запроса к ЕИС. Полную карточку по-прежнему даёт импорт XML на сервере
+    (--sink fs,db и выгрузка на --upload-url).
+    """
+
+    def __init__(self, conn, batch_size: int = 500, wake: WakePublisher | None = None,
+                 dialect: str = "mssql"):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.wake = wake
+        self.dialect = dialect
+        self._buf: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.inserted = 0
+        self.updated = 0
+
+    def write(self, item: NoticeItem) -> set[Path]:
+        with self._lock:
+            self._buf[item.number] = notice_row(item)   # повтор номера в пачке — берём последний
+            full = len(self._buf) >= self.batch_size
+        if full:
+            self._flush_full()
+        return set()
+
+    def _upsert_mssql(self, cur, rows: list[dict]) -> tuple[int, int]:
+        cur.execute(_MSSQL_STAGE)
+        cur.executemany(f"INSERT INTO #NoticeStage ({', '.join(NOTICE_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(NOTICE_COLUMNS))})",
+                        [[r[c] for c in NOTICE_COLUMNS] for r in rows])
+        cur.execute(_MSSQL_MERGE)
+        actions = [str(a[0]) for a in cur.fetchall()]
+        new = actions.count("INSERT")
+        return new, len(actions) - new
+
+    def _upsert_sqlite(self, cur, rows: list[dict]) -> tuple[int, int]:
+        cur.execute("BEGIN IMMEDIATE")
+        numbers = [r["PurchaseNumber"] for r in rows]
+        existing = 0
+        for i in range(0, len(numbers), 900):
+            chunk = numbers[i:i + 900]
+            cur.execute(f"SELECT COUNT(*) FROM Notices WHERE PurchaseNumber IN ({','.join('?' * len(chunk))})", chunk)
+            existing += cur.fetchone()[0]
+        cur.executemany(_SQLITE_UPSERT, [[str(uuid.uuid4())] + [r[c] for c in NOTICE_COLUMNS] for r in rows])
+        return len(rows) - existing, existing
+
+    def flush(self) -> None:
+        with self._lock:
+            rows, self._buf = list(self._buf.values()), {}
+        if not rows:
+            return
+        with self._write_lock, profiler.stage("db"):
+            cur = self.conn.cursor()
+            try:
+                upsert = self._upsert_sqlite if self.dialect == "sqlite" else self._upsert_mssql
+                new, old = upsert(cur, rows)
+                self.conn.commit()
+            except Exception as exc:
+                self.conn.rollback()
+                print(f"[SINK] db: ошибка записи пачки из {len(rows)} закупок: {exc}")
+                with self._lock:
+                    for r in rows:
+                        self._buf.setdefault(r["PurchaseNumber"], r)
+                raise SinkError(f"db: не записано закупок {len(rows)}: {exc}") from exc
+            finally:
+                cur.close()
+        self.inserted += new
+        self.updated += old
+        print(f"[SINK] db: новых {new}, обновлено {old}")
+        if self.wake is not None:
+            self.wake.notify(inserted=new, updated=old)
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+            if self.wake is not None:
+                self.wake.close()
+
+
+class MultiSink(NoticeSink):
+    def __init__(self, sinks: list[NoticeSink]):
+        self.sinks = sinks
+
+    def write(self, item: NoticeItem) -> set[Path]:
+        written: set[Path] = set()
+        for sink in self.sinks:
+            written |= sink.write(item)
+        return written
+
+    def flush(self) -> None:
+        # каждый приёмник пробует доставить своё, даже если предыдущий не смог
+        errors = []
+        for sink in self.sinks:
+            try:
+                sink.flush()
+            except SinkError as exc:
+                errors.append(exc)
+        if errors:
+            raise SinkError("; ".join(str(e) for e in errors))
+
+    def close(self) -> None:
+        errors = []
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except SinkError as exc:
+                errors.append(exc)
+        if errors:
+            raise SinkError("; ".join(str(e) for e in errors))
+
+
+def make_sink(kinds: str, out_root: Path, sink_url: str | None = None, db: str | None = None,
+              batch_size: int = 500, codec: XmlCodec | None = None,
+              wake_url: str | None = None) -> NoticeSink:
+    """--sink fs,http,db -> приёмник (MultiSink, если их несколько)."""
+    sinks: list[NoticeSink] = []
+    for kind in (k.strip() for k in kinds.split(",") if k.strip()):
+        if kind == "fs":
+            sinks.append(FilesystemSink(out_root, codec))
+        elif kind == "http":
+            if not sink_url:
+                raise ValueError("--sink http требует --sink-url")
+            sinks.append(HttpJsonlSink(sink_url, batch_size))
+        elif kind == "db":
+            if not db:
+                raise ValueError("--sink db требует --sink-db")
+            sinks.append(NoticesDbSink(connect_db(db), batch_size, WakePublisher(wake_url) if wake_url else None,
+                                       dialect=db.partition(":")[0]))
+        else:
+            raise ValueError(f"неизвестный приёмник {kind!r} (допустимо: {', '.join(SINK_KINDS)})")
+    if not sinks:
+        raise ValueError("не задан ни один приёмник")
+    return sinks[0] if len(sinks) == 1 else MultiSink(sinks)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальный кэш пакетов getDocsByReestrNumber (общий для downloader.py и single.py).
+
+Ключ — (reestrNumber, subsystemType). Для каждого ключа храним отпечаток ZIP
+(sha256) и уже распакованные XML, чтобы повторные запросы того же номера
+в течение TTL вообще не ходили в ЕИС.
+
+Структура на диске:
+<root>/<subsystem>/<reestrNumber>/
+    meta.json           # {"fetchedAt", "sha256", "files": [...]} — пишется атомарно
+    <sha256[:16]>/      # распакованные XML этой версии пакета
+        001_<name>.xml
+        ...
+
+Обновление «условное»: после истечения TTL пакет перекачивается, но если
+отпечаток не изменился, XML не переписываются — только продлевается fetchedAt.
+Если обновить не удалось, вызывающая сторона может взять устаревшую запись (get_stale).
+
+Кэш общий для нескольких процессов, поэтому put() старые версии не удаляет — их может
+читать другой процесс, успевший прочитать прежний meta.json. Версия отмечается в
+meta["superseded"], а prune() удаляет её, когда она вытеснена дольше TTL. prune() же
+удаляет записи, не обновлявшиеся дольше EIS_PACKAGE_CACHE_MAX_AGE_DAYS, и затем самые
+давние, пока кэш больше EIS_PACKAGE_CACHE_MAX_MB (по умолчанию 30 дней и 4 ГБ);
+вызывается при открытии кэша и после каждых PRUNE_EVERY записей. Чтение удалённой
+записи — просто промах (_load -> None).
+"""
+
+import datetime as dt
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+import zipfile
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = os.environ.get("EIS_PACKAGE_CACHE", "package_cache")
+DEFAULT_TTL_HOURS = 6.0
+MAX_BYTES = int(float(os.environ.get("EIS_PACKAGE_CACHE_MAX_MB", "4096")) * 2**20)
+MAX_AGE_DAYS = float(os.environ.get("EIS_PACKAGE_CACHE_MAX_AGE_DAYS", "30"))
+PRUNE_EVERY = 500
+
+
+def read_xml_entries(zbytes: bytes) -> list[tuple[str, bytes]]:
+    """
+    XML-файлы из ZIP пакета в исходном порядке: [(имя в архиве, содержимое)].
+    """
+    entries = []
+    with zipfile.ZipFile(io.BytesIO(zbytes)) as zf:
+        for name in zf.namelist():
+            if not name.lower().endswith(".xml"):
+                continue
+            entries.append((name, zf.read(name)))
+    return entries
+
+
+def _safe(name: str) -> str:
+    name = re.sub(r'[/\\?%*:|"<>\r\n\t]', "_", name).strip()
+    return name[:150] or "doc.xml"
+
+
+def _parse_time(value) -> dt.datetime | None:
+    try:
+        return dt.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _mtime(path: Path) -> dt.datetime:
+    try:
+        return dt.datetime.fromtimestamp(path.stat().st_mtime)
+    except OSError:
+        return dt.datetime.now()
+
+
+def _tree_size(path: Path) -> int:
+    size = 0
+    for f in path.rglob("*"):
+        try:
+            if f.is_file():
+                size += f.stat().st_size
+        except OSError:
+            pass
+    return size
+
+
+def _remove_entry(entry: Path) -> None:
+    # сначала meta.json: читатели сразу видят промах, а не полуудалённую версию
+    try:
+        (entry / "meta.json").unlink()
+    except OSError:
+        pass
+    shutil.rmtree(entry, ignore_errors=True)
+
+
+class PackageCache:
+    def __init__(self, root: Path | str = DEFAULT_CACHE_DIR, ttl_hours: float = DEFAULT_TTL_HOURS,
+                 max_bytes: int = MAX_BYTES, max_age_days: float = MAX_AGE_DAYS):
+        self.root = Path(root)
+        self.ttl = dt.timedelta(hours=ttl_hours)
+        self.max_bytes = max_bytes
+        self.max_age = dt.timedelta(days=max_age_days)
+        self._lock = threading.Lock()
+        self._since_prune = 0
+        self.prune()
+
+    def _entry_dir(self, reestr: str, subsystem: str) -> Path:
+        return self.root / _safe(subsystem.upper()) / _safe(reestr)
+
+    def _read_meta(self, reestr: str, subsystem: str) -> dict | None:
+        return self._read_entry_meta(self._entry_dir(reestr, subsystem))
+
+    @staticmethod
+    def _read_entry_meta(entry: Path) -> dict | None:
+        meta_path = entry / "meta.json"
+        try:
+            return json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, entry: Path, meta: dict) -> None:
+        tmp = entry / f".meta.{uuid.uuid4().hex}.tmp"
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, entry / "meta.json")
+
+    def _load(self, reestr: str, subsystem: str, meta: dict) -> list[tuple[str, bytes]] | None:
+        version_dir = self._entry_dir(reestr, subsystem) / meta["sha256"][:16]
+        entries = []
+        try:
+            for item in meta["files"]:
+                entries.append((item["name"], (version_dir / item["stored"]).read_bytes()))
+        except (OSError, KeyError):
+            # запись повреждена / почищена параллельным процессом — считаем промахом
+            return None
+        return entries
+
+    def is_fresh(self, meta: dict) -> bool:
+        try:
+            fetched = dt.datetime.fromisoformat(meta["fetchedAt"])
+        except (KeyError, ValueError):
+            return False
+        return dt.datetime.now() - fetched < self.ttl
+
+    def get(self, reestr: str, subsystem: str) -> list[tuple[str, bytes]] | None:
+        """
+        XML пакета, если запись есть и не старше TTL; иначе None.
+        """
+        meta = self._read_meta(reestr, subsystem)
+        if not meta or not self.is_fresh(meta):
+            return None
+        return self._load(reestr, subsystem, meta)
+
+    def get_stale(self, reestr: str, subsystem: str) -> list[tuple[str, bytes]] | None:
+        """
+        XML пакета без учёта TTL (фолбэк, когда ЕИС недоступен).
+        """
+        meta = self._read_meta(reestr, subsystem)
+        if not meta:
+            return None
+        return self._load(reestr, subsystem, meta)
+
+    def put(self, reestr: str, subsystem: str, zbytes: bytes) -> tuple[list[tuple[str, bytes]], bool]:
+        """
+        Сохраняет свежескачанный ZIP. Возвращает (XML пакета, changed):
+        changed=False — отпечаток совпал с закэшированным, XML не переписывались.
+        """
+        sha = hashlib.sha256(zbytes).hexdigest()
+        entry = self._entry_dir(reestr, subsystem)
+        entry.mkdir(parents=True, exist_ok=True)
+        now = dt.datetime.now().isoformat(timespec="seconds")
+
+        meta = self._read_meta(reestr, subsystem)
+        if meta and meta.get("sha256") == sha:
+            cached = self._load(reestr, subsystem, meta)
+            if cached is not None:
+                meta["fetchedAt"] = now
+                self._write_meta(entry, meta)
+                return cached, False
+
+        entries = read_xml_entries(zbytes)
+        version_dir = entry / sha[:16]
+        version_dir.mkdir(exist_ok=True)
+        files = []
+        for i, (name, xb) in enumerate(entries, start=1):
+            stored = f"{i:03d}_{_safe(os.path.basename(name))}"
+            (version_dir / stored).write_bytes(xb)
+            files.append({"name": name, "stored": stored})
+
+        # прежняя версия остаётся на диске до prune(): её может читать другой процесс
+        superseded = {name: at for name, at in ((meta or {}).get("superseded") or {}).items()
+                      if name != version_dir.name and (entry / name).is_dir()}
+        if meta and meta.get("sha256") and meta["sha256"][:16] != version_dir.name:
+            superseded[meta["sha256"][:16]] = now
+
+        self._write_meta(entry, {
+            "reestrNumber": reestr,
+            "subsystem": subsystem.upper(),
+            "fetchedAt": now,
+            "sha256": sha,
+            "bytes": len(zbytes),
+            "files": files,
+            "superseded": superseded,
+        })
+
+        with self._lock:
+            self._since_prune += 1
+            due = self._since_prune >= PRUNE_EVERY
+        if due:
+            self.prune()
+        return entries, True
+
+    def prune(self) -> int:
+        """
+        Удаляет версии, вытесненные дольше TTL, записи старше max_age и самые давние
+        сверх max_bytes. Возвращает число удалённых каталогов (версий и записей).
+        """
+        with self._lock:
+            self._since_prune = 0
+        now = dt.datetime.now()
+        removed = 0
+        kept: list[tuple[dt.datetime, int, Path]] = []   # (fetchedAt, размер, каталог записи)
+        for entry in self.root.glob("*/*"):
+            if not entry.is_dir():
+                continue
+            meta = self._read_entry_meta(entry)
+            # без meta.json — недописанная (или оборванная) запись: не трогаем, пока свежая
+            fetched = _parse_time(meta.get("fetchedAt")) if meta else None
+            if now - (fetched or _mtime(entry)) > (self.max_age if meta else self.ttl):
+                _remove_entry(entry)
+                removed += 1
+                continue
+            if not meta:
+                continue
+
+            current = str(meta.get("sha256", ""))[:16]
+            superseded = meta.get("superseded") or {}
+            for version in entry.iterdir():
+                if not version.is_dir() or version.name == current:
+                    continue
+                since = _parse_time(superseded.get(version.name)) or _mtime(version)
+                if now - since > self.ttl:
+                    shutil.rmtree(version, ignore_errors=True)
+                    removed += 1
+            kept.append((fetched or _mtime(entry), _tree_size(entry), entry))
+
+        total = sum(size for _, size, _ in kept)
+        for _, size, entry in sorted(kept, key=lambda k: k[0]):
+            if total <= self.max_bytes:
+                break
+            _remove_entry(entry)
+            total -= size
+            removed += 1
+
+        if removed:
+            print(f"[CACHE] Очистка кэша пакетов {self.root}: удалено {removed}, осталось ~{total // 2**20} МБ")
+        return removed
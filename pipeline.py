@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Конвейер из потоков с ограниченными очередями (index.py: чтение БД -> модель -> запись).
+
+    stats = run_pipeline(source, [("encode", encode_fn), ("write", write_fn)], depth=2)
+
+source — итератор (читается в своём потоке), каждая стадия — функция item -> результат
+в своём потоке; результат None дальше не передаётся. Между стадиями очереди на depth
+элементов: пока модель считает пачку N, читатель уже достаёт N+1, а писатель
+фиксирует N-1, и ни одна стадия не убегает вперёд больше чем на depth пачек.
+
+Первая ошибка в любой стадии останавливает остальные и пробрасывается из run_pipeline().
+Возвращается время работы каждой стадии (без ожидания очередей) — видно, какая стадия
+ограничивает скорость.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+_DONE = object()
+
+
+class _Stop(Exception):
+    pass
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: List[Tuple[str, Callable]],
+    depth: int = 2,
+    source_name: str = "read",
+) -> Dict[str, float]:
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    busy: Dict[str, float] = {source_name: 0.0, **{name: 0.0 for name, _ in stages}}
+    queues = [queue.Queue(maxsize=max(1, depth)) for _ in stages]
+
+    def put(q: queue.Queue, item) -> None:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+        raise _Stop()
+
+    def get(q: queue.Queue):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+        raise _Stop()
+
+    def fail(exc: BaseException) -> None:
+        if not isinstance(exc, _Stop):
+            errors.append(exc)
+        stop.set()
+
+    def read() -> None:
+        try:
+            it = iter(source)
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    break
+                finally:
+                    busy[source_name] += time.perf_counter() - started
+                put(queues[0], item)
+            put(queues[0], _DONE)
+        except BaseException as exc:
+            fail(exc)
+
+    def work(index: int, name: str, fn: Callable) -> None:
+        out: Optional[queue.Queue] = queues[index + 1] if index + 1 < len(queues) else None
+        try:
+            while True:
+                item = get(queues[index])
+                if item is _DONE:
+                    if out is not None:
+                        put(out, _DONE)
+                    return
+                started = time.perf_counter()
+                result = fn(item)
+                busy[name] += time.perf_counter() - started
+                if out is not None and result is not None:
+                    put(out, result)
+        except BaseException as exc:
+            fail(exc)
+
+    threads = [threading.Thread(target=read, name=f"pipeline-{source_name}", daemon=True)]
+    threads += [threading.Thread(target=work, args=(i, name, fn), name=f"pipeline-{name}", daemon=True)
+                for i, (name, fn) in enumerate(stages)]
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            while t.is_alive():
+                t.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        raise
+    if errors:
+        raise errors[0]
+    return busy
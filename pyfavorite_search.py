@@ -22,9 +22,15 @@ import numpy as np
 import pika
 import pyodbc
 import torch
-from sentence_transformers import SentenceTransformer
+
+from embedding_backend import load_encoder
+from embedding_models import ACTIVE, DEFAULT_SOURCE, ModelInfo, active_model
+from encode_pool import EncodePool, processes_from_env
+from vector_codec import FLOAT32, decode_vector, encode_vector
 
 MODEL_NAME = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+# used until the EmbeddingModels registry exists (embedding_models.py)
+DEFAULT_MODEL = ModelInfo(DEFAULT_SOURCE, MODEL_NAME, 768, ACTIVE)
 DEFAULT_CONFIG_PATH = os.environ.get(
     "APPSETTINGS_PATH", "src/Zakupki.Fetcher/appsettings.json"
 )
@@ -249,15 +255,20 @@ class BatchVectorRequest:
 class FavoriteSearchEngine:
     def __init__(self, connection_string: str):
         self._connection_string = connection_string
-        self._model: Optional[SentenceTransformer] = None
+        self._model: Optional[Any] = None
+        self._active = DEFAULT_MODEL
         self._device = "cuda" if torch.cuda.is_available() else "cpu"
+        self._pool: Optional[EncodePool] = None
+        self._pool_lock = threading.Lock()
+        # ENCODE_PROCESSES > 1 on a GPU-less host: batches go to a process pool
+        self._processes = processes_from_env("0") if self._device == "cpu" else 0
 
     @property
     def model(self):
         if self._model is None:
-            print(f"Loading model {MODEL_NAME} on {self._device}...")
+            print(f"Loading model {self._active.model} on {self._device}...")
             sys.stdout.flush()
-            self._model = SentenceTransformer(MODEL_NAME, device=self._device)
+            self._model = load_encoder(self._active.model, device=self._device)
         return self._model
 
     def _connect(self):
@@ -266,42 +277,54 @@ class FavoriteSearchEngine:
         return conn
 
     def _serialize_vector(self, vector: np.ndarray) -> bytes:
-        return np.asarray(vector, dtype=np.float64).tobytes()
-
+        return encode_vector(vector, FLOAT32)
 
     def _to_numpy_vector(self, value: Any) -> np.ndarray:
         """Converts various DB-returned vector formats to a numpy array.
 
-        SQL Server may return VECTOR columns either as raw bytes/memoryview or
-        as a JSON string representation. Handle both cases and fall back to
-        list/tuple.
+        Binary float32/float16 (vector_codec), legacy raw float64 bytes and the
+        JSON text SQL Server returns for VECTOR columns are all handled by
+        vector_codec.decode_vector.
         """
-
-        if isinstance(value, (bytes, bytearray, memoryview)):
-            buffer = memoryview(value)
-            return np.frombuffer(buffer, dtype=np.float64)
-
-        if isinstance(value, str):
-            try:
-                parsed = json.loads(value)
-            except json.JSONDecodeError as exc:
-                raise ValueError(f"Не удалось распарсить вектор из строки: {exc}") from exc
-            return np.asarray(parsed, dtype=np.float64)
-
-        if isinstance(value, (list, tuple)):
-            return np.asarray(value, dtype=np.float64)
-
-        try:
-            return np.frombuffer(bytes(value), dtype=np.float64)
-        except Exception as exc:  # pragma: no cover - safety net for unexpected types
-            raise TypeError(f"Неизвестный тип вектора: {type(value)!r}") from exc
+        return decode_vector(value)
 
     def encode_text(self, text: str) -> List[float]:
         vector = self.model.encode([text], convert_to_numpy=True)[0]
         return np.asarray(vector, dtype=np.float32).tolist()
 
+    @property
+    def pool(self) -> Optional[EncodePool]:
+        if self._processes <= 1:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = EncodePool(self._active.model, self._processes)
+            return self._pool
+
+    def _sync_active_model(self, cursor: pyodbc.Cursor) -> None:
+        """Follows cutovers (embedding_models.py): reloads the model when the active one changes."""
+        active = active_model(cursor, DEFAULT_MODEL)
+        if active.model != self._active.model:
+            print(f"Active embedding model: {self._active.name} -> {active.name} ({active.model})")
+            sys.stdout.flush()
+            self._model = None
+            with self._pool_lock:
+                if self._pool is not None:
+                    self._pool.close()
+                    self._pool = None
+        self._active = active
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
     def encode_batch(self, texts: List[str]) -> List[List[float]]:
-        vectors = self.model.encode(texts, convert_to_numpy=True)
+        pool = self.pool
+        if pool is not None:
+            vectors = pool.encode(texts)
+        else:
+            vectors = self.model.encode(texts, convert_to_numpy=True)
         vectors = np.asarray(vectors, dtype=np.float32)
         return [v.tolist() for v in vectors]
 
@@ -318,8 +341,8 @@ class FavoriteSearchEngine:
         Забираем из БД все (отфильтрованные) вектора и считаем COSINE similarity в Python.
         Это аналогично тому, как делалось в CLI-скрипте, только оформлено под worker.
         """
-        filters = ["e.Model = ?"]
-        params: List[Any] = [MODEL_NAME]
+        filters = ["e.Source = ?"]
+        params: List[Any] = [self._active.name]
 
         if collecting_end_limit:
             if expired_only:
@@ -392,11 +415,11 @@ class FavoriteSearchEngine:
         print(f"expiredOnly={cmd.expired_only}")
         sys.stdout.flush()
 
-        query_vec = self.model.encode([cmd.query], convert_to_numpy=True)[0]
-
         try:
             with self._connect() as conn:
                 cursor = conn.cursor()
+                self._sync_active_model(cursor)
+                query_vec = self.model.encode([cmd.query], convert_to_numpy=True)[0]
 
                 rows = self._fetch_top_similar_notices(
                     cursor,
@@ -805,7 +828,10 @@ def main():
         print(f"[WARN] Failed to start HTTP vector server on {http_port}: {exc}")
         sys.stdout.flush()
 
-    worker.run()
+    try:
+        worker.run()
+    finally:
+        worker.engine.close()
 
 
 if __name__ == "__main__":
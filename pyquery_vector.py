@@ -14,7 +14,8 @@ from typing import Any, Dict, Optional
 
 import numpy as np
 import pika
-from sentence_transformers import SentenceTransformer
+
+from embedding_backend import load_encoder
 
 MODEL_NAME = "ai-forever/ru-en-RoSBERTa"
 DEFAULT_CONFIG_PATH = os.environ.get(
@@ -90,7 +91,7 @@ class QueryVectorWorker:
             blocked_connection_timeout=120.0,
         )
 
-        self._model = SentenceTransformer(MODEL_NAME)
+        self._model = load_encoder(MODEL_NAME)
         self._logger = logging.getLogger("query_vector_worker")
         self._channel: Optional[pika.adapters.blocking_connection.BlockingChannel] = None
 
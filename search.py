@@ -15,18 +15,23 @@
 import argparse
 import json
 import sys
-from typing import List, Tuple
+from typing import Any, List, Tuple
 
 import pyodbc
 import numpy as np
 import torch
-from sentence_transformers import SentenceTransformer
+
+from embedding_backend import BACKENDS, DEFAULT_BACKEND, load_encoder
+from embedding_models import ACTIVE, DEFAULT_SOURCE, ModelInfo, active_model
+from vector_codec import decode_matrix
 
 # === НАСТРОЙКИ ===
 
 APPSETTINGS_PATH = "appsettings.json"  # если файл называется иначе — поправь
 ODBC_DRIVER = "{ODBC Driver 17 for SQL Server}"
 MODEL_NAME = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+# без реестра EmbeddingModels (embedding_models.py) — эмбеддинги индексатора по умолчанию
+DEFAULT_MODEL = ModelInfo(DEFAULT_SOURCE, MODEL_NAME, 768, ACTIVE)
 
 
 # === УТИЛИТЫ ПОДКЛЮЧЕНИЯ К БАЗЕ ===
@@ -91,28 +96,18 @@ def get_db_connection() -> pyodbc.Connection:
     return conn
 
 
-def _ensure_bytes(value) -> bytes:
-    if isinstance(value, bytes):
-        return value
-    if isinstance(value, memoryview):
-        return value.tobytes()
-    if isinstance(value, bytearray):
-        return bytes(value)
-    return bytes(value)
-
-
 # === РАБОТА С ЭМБЕДДИНГАМИ ===
 
 def fetch_notice_embeddings(
     cursor: pyodbc.Cursor,
-    model_name: str,
+    model: ModelInfo,
     limit: int
-) -> List[Tuple[str, str, str, str, int, bytes]]:
+) -> List[Tuple[str, str, str, str, int, Any]]:
     """
-    Забираем из базы эмбеддинги и данные по закупке.
+    Забираем из базы эмбеддинги модели model (строки с её Source) и данные по закупке.
 
     Возвращаем список кортежей:
-        (notice_id, purchase_number, entry_name, purchase_object_info, dims, vector_bytes)
+        (notice_id, purchase_number, entry_name, purchase_object_info, dims, vector)
 
     Если limit > 0 — добавляем TOP (limit),
     если limit == 0 — забираем все.
@@ -125,48 +120,40 @@ def fetch_notice_embeddings(
         n.PurchaseNumber,
         n.EntryName,
         n.PurchaseObjectInfo,
-        e.Dimensions,
         e.Vector
     FROM [NoticeEmbeddings] AS e
     INNER JOIN [Notices] AS n ON n.Id = e.NoticeId
-    WHERE e.Model = ?
+    WHERE e.Source = ?
     ORDER BY n.UpdatedAt DESC
     """
 
-    cursor.execute(sql, model_name)
+    cursor.execute(sql, model.name)
     rows = cursor.fetchall()
 
-    result: List[Tuple[str, str, str, str, int, bytes]] = []
+    result: List[Tuple[str, str, str, str, int, Any]] = []
     for row in rows:
         result.append((
             str(row.Id),
             row.PurchaseNumber,
             row.EntryName,
             row.PurchaseObjectInfo,
-            int(row.Dimensions),
-            _ensure_bytes(row.Vector)
+            model.dims,
+            row.Vector  # bytes / memoryview / JSON — разбирает vector_codec
         ))
     return result
 
 
-def parse_vectors(rows: List[Tuple[str, str, str, str, int, bytes]]) -> np.ndarray:
+def parse_vectors(rows: List[Tuple[str, str, str, str, int, Any]]) -> np.ndarray:
     """
-    Преобразуем бинарные SQL VECTOR в numpy-массив размера (N, D).
+    Преобразуем значения NoticeEmbeddings.Vector в numpy-массив размера (N, D).
+    Форматы (float32/float16 с заголовком, старый float64, JSON) — vector_codec.decode_matrix.
 
-    rows: (notice_id, purchase_number, entry_name, purchase_object_info, dims, vector_bytes)
+    rows: (notice_id, purchase_number, entry_name, purchase_object_info, dims, vector)
     """
-    vectors = []
-    for _, _, _, _, dims, vector_bytes in rows:
-        buffer = memoryview(vector_bytes)
-        expected_length = dims * 8
-        if buffer.nbytes != expected_length:
-            raise ValueError(
-                f"Некорректный размер вектора: ожидалось {expected_length} байт, получено {buffer.nbytes}"
-            )
-        vec = np.frombuffer(buffer, dtype=np.float64, count=dims).astype(np.float32)
-        vectors.append(vec)
-
-    return np.array(vectors, dtype=np.float32)
+    if not rows:
+        return np.zeros((0, 0), dtype=np.float32)
+    dims = rows[0][4]
+    return decode_matrix((vector for *_, vector in rows), dims)
 
 
 def cosine_similarity_matrix(query_vec: np.ndarray, matrix: np.ndarray) -> np.ndarray:
@@ -208,6 +195,13 @@ def main():
         help="Проверить наличие и позицию конкретного PurchaseNumber (например 0133300012625000105)"
     )
 
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=DEFAULT_BACKEND,
+        help="Движок модели (EMBEDDING_BACKEND): torch, torch-opt, int8, onnx, onnx-int8"
+    )
+
     args = parser.parse_args()
     query_text = " ".join(args.query).strip()
 
@@ -217,22 +211,24 @@ def main():
 
     print(f"Запрос: {query_text}")
 
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Загружаю модель {MODEL_NAME} на устройстве {device}...")
-    model = SentenceTransformer(MODEL_NAME, device=device)
-
-    # Эмбеддинг запроса
-    query_vec = model.encode(
-        [query_text],
-        convert_to_numpy=True,
-        normalize_embeddings=False
-    )[0]
-
     conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
-        rows = fetch_notice_embeddings(cursor, MODEL_NAME, args.limit)
+        # модель, по которой сейчас ищут (переключается embedding_models.py cutover)
+        active = active_model(cursor, DEFAULT_MODEL)
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        print(f"Загружаю модель {active.model} ({active.name}) на устройстве {device}...")
+        model = load_encoder(active.model, args.backend, device=device)
+
+        # Эмбеддинг запроса
+        query_vec = model.encode(
+            [query_text],
+            convert_to_numpy=True,
+            normalize_embeddings=False
+        )[0]
+
+        rows = fetch_notice_embeddings(cursor, active, args.limit)
         if not rows:
             print("В базе нет эмбеддингов для указанной модели. Сначала запусти индексатор.")
             return
@@ -253,7 +249,7 @@ def main():
             if target_index is None:
                 print()
                 print(f"⚠ Для PurchaseNumber={args.check_pn} НЕТ строки в NoticeEmbeddings "
-                      f"для модели {MODEL_NAME}. Индексатор, скорее всего, не создал эмбеддинг.")
+                      f"для модели {active.model}. Индексатор, скорее всего, не создал эмбеддинг.")
             else:
                 target_score = sims[target_index]
                 # ранг = сколько имеют score строго больше
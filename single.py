@@ -7,26 +7,51 @@ g.py — ЕИС (getDocsIP): пакет по номеру (getDocsByReestrNumber
 - out/<purchaseNumber>/notice_<docKind>_<date>_<orig>.xml — один главный XML
 - out/<purchaseNumber>/files/                           — каталог для будущих вложений
 - out/<purchaseNumber>/manifest.tsv                    — в старом формате (# meta / # files)
+- out/<purchaseNumber>/records.jsonl                   — извлечённые поля главного XML (notice_sidecar.py)
 
 Примеры:
     python g.py --token "ВАШ_ТОКЕН" --number 0175200001525000044 --subsystem PRIZ
     python g.py --token "ВАШ_ТОКЕН" --number 2910201216025000045  # PRIZ -> RGK подхватится автоматически
+
+Пакетный режим (номера из файла или stdin, параллельно, одна XSD-проверка и тёплые сессии):
+    python g.py --token "ВАШ_ТОКЕН" --numbers-file numbers.txt --workers 16
+    cat numbers.txt | python g.py --token "ВАШ_ТОКЕН" --numbers-file -
+
+HTTP-режим (долгоживущий процесс для веб-приложения):
+    python g.py --token "ВАШ_ТОКЕН" --serve 8010
+    curl "http://localhost:8010/package?number=0175200001525000044"
+
+Сервер слушает 127.0.0.1 (другой адрес — --host, только за обратным прокси с авторизацией:
+каждый запрос тратит токен ЕИС). number — только цифры, subsystem — из HTTP_SUBSYSTEMS;
+в ответе нет локальных путей, только имена файлов внутри папки закупки.
+
+Какая подсистема (PRIZ/RGK) ответила для префикса номера, запоминается в --hints-file,
+и в следующий раз она запрашивается первой.
 """
 
 import argparse
+import concurrent.futures
 import datetime as dt
-import io
+import json
 import os
 import re
 import sys
+import threading
 import uuid
-import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from urllib.parse import urlparse, unquote, parse_qs
+from xml.sax.saxutils import escape
 
 import requests
+import requests.adapters
 from lxml import etree
 
+from harvest_profiler import profiler
+from notice_record import NoticeRecord
+from notice_sidecar import append_records, sidecar_record
+from package_cache import DEFAULT_CACHE_DIR, DEFAULT_TTL_HOURS, PackageCache, read_xml_entries
+
 
 URL = "https://int44.zakupki.gov.ru/eis-integration/services/getDocsIP"
 NS_SOAP = "http://schemas.xmlsoap.org/soap/envelope/"
@@ -104,7 +129,7 @@ def build_getDocsByReestrNumber(token: str, reestr: str, subsystem: str = "PRIZ"
     return f"""<?xml version="1.0" encoding="UTF-8"?>
 <soapenv:Envelope xmlns:soapenv="{NS_SOAP}" xmlns:ws="{NS_WS}">
   <soapenv:Header>
-    <individualPerson_token>{token}</individualPerson_token>
+    <individualPerson_token>{escape(token)}</individualPerson_token>
   </soapenv:Header>
   <soapenv:Body>
     <ws:getDocsByReestrNumberRequest>
@@ -114,8 +139,8 @@ def build_getDocsByReestrNumber(token: str, reestr: str, subsystem: str = "PRIZ"
         <mode>PROD</mode>
       </index>
       <selectionParams>
-        <subsystemType>{subsystem}</subsystemType>
-        <reestrNumber>{reestr}</reestrNumber>
+        <subsystemType>{escape(subsystem)}</subsystemType>
+        <reestrNumber>{escape(reestr)}</reestrNumber>
       </selectionParams>
     </ws:getDocsByReestrNumberRequest>
   </soapenv:Body>
@@ -341,108 +366,127 @@ def is_no_data(resp_bytes: bytes) -> bool:
     return "<noData>true</noData>" in txt
 
 
-# ---------- main ----------
-
-def main():
-    ap = argparse.ArgumentParser(
-        description="ЕИС: пакет по номеру (getDocsByReestrNumber) без скачивания вложений."
-    )
-    ap.add_argument("--token", required=True,
-                    help="individualPerson_token из PMD (физлицо)")
-    ap.add_argument("--number", required=True,
-                    help="reestrNumber (номер закупки / контракта в ЕИС)")
-    ap.add_argument("--subsystem", default="PRIZ",
-                    help="subsystemType (по умолчанию PRIZ; для контрактов — RGK)")
-    ap.add_argument("--out-dir", default="out",
-                    help="корневая папка для выгрузки (по умолчанию out)")
-    args = ap.parse_args()
+class FetchError(RuntimeError):
+    """
+    Ошибка получения пакета по номеру. responses — сырые SOAP-ответы
+    (для отладочного вывода в режиме одного номера).
+    """
 
-    token = args.token
-    reestr = args.number
-    subsystem = args.subsystem
+    def __init__(self, message: str, responses: list[tuple[str, bytes]] | None = None,
+                 transient: bool = False):
+        super().__init__(message)
+        self.responses = responses or []
+        # transient=True — сетевой сбой (можно отдать устаревший пакет из кэша)
+        self.transient = transient
 
-    sess = requests.Session()
-    sess.trust_env = False
 
-    # sanity check XSD — как в eis_fetch_all.py
-    try:
-        rx = sess.get(URL + "?xsd=getDocsIP-ws-api.xsd", timeout=20)
-        print(f"[XSD] HTTP {rx.status_code}")
-        rx.raise_for_status()
-    except Exception as e:
-        print(f"[WARN] Не удалось проверить XSD: {e}")
+def number_prefix(reestr: str) -> str:
+    """
+    Префикс номера, по которому запоминаем «отвечающую» подсистему:
+    первые 3 символа (тип реестра + начало кода заказчика/региона).
+    """
+    return (reestr or "").strip()[:3]
 
-    print(f"[REQ] getDocsByReestrNumber reestrNumber={reestr} subsystem={subsystem}")
-    xml_req = build_getDocsByReestrNumber(token, reestr, subsystem)
 
-    try:
-        resp = soap_post(sess, xml_req)
-    except Exception as e:
-        print(f"[ERR] SOAP/HTTP: {e}")
-        sys.exit(1)
+class SubsystemHints:
+    """
+    Статистика «какая подсистема ответила» по префиксу номера.
+    Потокобезопасна, опционально сохраняется в JSON между запусками.
+    """
 
-    # авто-фолбэк: если по PRIZ noData=true, пробуем RGK
-    if is_no_data(resp):
-        print(f"[INFO] noData=true для subsystem={subsystem}")
-        if subsystem.upper() == "PRIZ":
-            print("[INFO] Пытаемся тот же номер как RGK (реестр контрактов)...")
-            subsystem2 = "RGK"
-            xml_req2 = build_getDocsByReestrNumber(token, reestr, subsystem2)
+    def __init__(self, path: Path | None = None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._hits: dict[str, dict[str, int]] = {}
+        if path and path.exists():
             try:
-                resp2 = soap_post(sess, xml_req2)
+                data = json.loads(path.read_text(encoding="utf-8"))
+                if isinstance(data, dict):
+                    self._hits = {
+                        str(k): {str(s): int(n) for s, n in v.items()}
+                        for k, v in data.items() if isinstance(v, dict)
+                    }
             except Exception as e:
-                print(f"[ERR] SOAP/HTTP (RGK): {e}")
-                sys.exit(1)
-
-            if is_no_data(resp2):
-                print("[ERR] noData=true и для PRIZ, и для RGK — документов нет в getDocsIP.")
-                try:
-                    print("----- SOAP RESPONSE (PRIZ) -----")
-                    print(resp.decode("utf-8", "ignore"))
-                    print("----- SOAP RESPONSE (RGK) ------")
-                    print(resp2.decode("utf-8", "ignore"))
-                    print("----------- END ---------------")
-                except Exception:
-                    pass
-                sys.exit(1)
-
-            subsystem = subsystem2
-            resp = resp2
-            print("[INFO] Найдены данные в подсистеме RGK.")
-        else:
-            print(f"[ERR] noData=true для subsystem={subsystem}, другие подсистемы автоматически не пробуем.")
-            try:
-                print("----- SOAP RESPONSE START -----")
-                print(resp.decode("utf-8", "ignore"))
-                print("----- SOAP RESPONSE END -------")
-            except Exception:
-                pass
-            sys.exit(1)
+                print(f"[WARN] Не удалось прочитать {path}: {e}")
 
-    ok, arch_url, err = parse_archive_url(resp)
-    if not ok and err:
-        print(f"[ERR] SOAP Fault: {err}")
-        sys.exit(1)
-    if not arch_url:
-        print("[ERR] archiveUrl не вернулся в ответе (пустой пакет?). Полный ответ ниже.")
-        try:
-            print("----- SOAP RESPONSE START -----")
-            print(resp.decode("utf-8", "ignore"))
-            print("----- SOAP RESPONSE END -------")
-        except Exception:
-            pass
-        sys.exit(1)
+    def order(self, reestr: str, candidates: list[str]) -> list[str]:
+        """
+        Сортирует подсистемы-кандидаты: чаще отвечавшая для префикса — первой.
+        При равенстве сохраняется исходный порядок.
+        """
+        with self._lock:
+            hits = dict(self._hits.get(number_prefix(reestr), {}))
+        return sorted(candidates, key=lambda s: -hits.get(s, 0))
 
-    print(f"[ARCH] archiveUrl: {arch_url}")
+    def record(self, reestr: str, subsystem: str) -> None:
+        with self._lock:
+            bucket = self._hits.setdefault(number_prefix(reestr), {})
+            bucket[subsystem] = bucket.get(subsystem, 0) + 1
 
-    # качаем ZIP с XML с фолбэком
-    zbytes = download_archive(sess, arch_url, token)
-    if not zbytes:
-        print("[ERR] Не удалось загрузить ZIP с XML (даже после фолбэка).")
-        return
+    def save(self) -> None:
+        if not self._path:
+            return
+        with self._lock:
+            payload = json.dumps(self._hits, ensure_ascii=False, indent=2)
+        self._path.write_text(payload, encoding="utf-8")
 
+
+# подсистемы, которые HTTP-режим принимает в ?subsystem=
+HTTP_SUBSYSTEMS = ("PRIZ", "RGK")
+# reestrNumber в ЕИС — 19 цифр (извещения, контракты); с запасом на другие реестры
+REESTR_NUMBER_RE = re.compile(r"\d{1,30}")
+
+
+def candidate_subsystems(subsystem: str) -> list[str]:
+    """
+    PRIZ -> [PRIZ, RGK] (авто-фолбэк на реестр контрактов), иначе — только указанная.
+    """
+    subsystem = subsystem.upper()
+    if subsystem == "PRIZ":
+        return ["PRIZ", "RGK"]
+    return [subsystem]
+
+
+def request_package(sess: requests.Session, token: str, reestr: str,
+                    subsystems: list[str]) -> tuple[str, str]:
+    """
+    Перебирает подсистемы по порядку до первого ответа без noData.
+    Возвращает (subsystem, archiveUrl).
+    """
+    responses: list[tuple[str, bytes]] = []
+    for subsystem in subsystems:
+        print(f"[REQ] getDocsByReestrNumber reestrNumber={reestr} subsystem={subsystem}")
+        xml_req = build_getDocsByReestrNumber(token, reestr, subsystem)
+        try:
+            with profiler.stage("soap"):
+                resp = soap_post(sess, xml_req)
+        except Exception as e:
+            raise FetchError(f"SOAP/HTTP ({subsystem}): {e}", responses, transient=True)
+
+        if is_no_data(resp):
+            print(f"[INFO] {reestr}: noData=true для subsystem={subsystem}")
+            responses.append((subsystem, resp))
+            continue
+
+        ok, arch_url, err = parse_archive_url(resp)
+        if not ok and err:
+            raise FetchError(f"SOAP Fault: {err}")
+        if not arch_url:
+            raise FetchError("archiveUrl не вернулся в ответе (пустой пакет?).",
+                             [(subsystem, resp)])
+        return subsystem, arch_url
+
+    tried = ", ".join(subsystems)
+    raise FetchError(f"noData=true для всех подсистем ({tried}) — документов нет в getDocsIP.",
+                     responses)
+
+
+def save_package(entries: list[tuple[str, bytes]], reestr: str, subsystem: str, out_root: Path) -> dict:
+    """
+    Разбирает XML пакета [(имя в архиве, содержимое)], сохраняет главный XML и manifest.tsv.
+    Возвращает краткую сводку (для пакетного режима / HTTP).
+    """
     date_str = fmt_date(dt.datetime.now())
-    out_root = Path(args.out_dir)
     out_root.mkdir(exist_ok=True)
 
     # распарсим все XML, соберем документы, ссылки и мету
@@ -451,51 +495,44 @@ def main():
     meta: dict = {}
     purchase_number_for_dir = reestr
 
-    with zipfile.ZipFile(io.BytesIO(zbytes)) as zf:
-        xml_index = 0
-        for name in zf.namelist():
-            if not name.lower().endswith(".xml"):
-                continue
-            xml_index += 1
-            xb = zf.read(name)
+    for xml_index, (name, xb) in enumerate(entries, start=1):
+        with profiler.stage("parse"):
             det = extract_details_and_links(xb)
 
-            pn = (det.get("purchaseNumber") or "").strip()
-            if pn:
-                purchase_number_for_dir = pn
+        pn = (det.get("purchaseNumber") or "").strip()
+        if pn:
+            purchase_number_for_dir = pn
 
-            if not meta and det:
-                meta = det
+        if not meta and det:
+            meta = det
 
-            print(f"[XML {xml_index}] {name} docKind={det.get('docKind')} purchaseNumber={det.get('purchaseNumber')}")
+        print(f"[XML {xml_index}] {name} docKind={det.get('docKind')} purchaseNumber={det.get('purchaseNumber')}")
 
-            docs.append({"name": name, "xb": xb, "det": det})
+        docs.append({"name": name, "xb": xb, "det": det})
 
-            # ссылки из этого документа
-            for j, lnk in enumerate(det.get("links", []) or [], start=1):
-                url_j = (lnk.get("url") or "").strip()
-                if not url_j:
-                    continue
-                base_name = lnk.get("name") or guess_filename_from_url(url_j)
-                # ordinal формируем как pXXX_YYY, где XXX — номер XML в пакете, YYY — номер ссылки в нем
-                ordinal = f"p{xml_index:03d}_{j:03d}"
-                all_links.append({
-                    "ordinal": ordinal,
-                    "source": "package",
-                    "url": url_j,
-                    "base_name": base_name,
-                })
+        # ссылки из этого документа
+        for j, lnk in enumerate(det.get("links", []) or [], start=1):
+            url_j = (lnk.get("url") or "").strip()
+            if not url_j:
+                continue
+            base_name = lnk.get("name") or guess_filename_from_url(url_j)
+            # ordinal формируем как pXXX_YYY, где XXX — номер XML в пакете, YYY — номер ссылки в нем
+            ordinal = f"p{xml_index:03d}_{j:03d}"
+            all_links.append({
+                "ordinal": ordinal,
+                "source": "package",
+                "url": url_j,
+                "base_name": base_name,
+            })
 
     # если вообще ничего нет
     if not docs:
-        print("[ERR] В ZIP нет XML-документов.")
-        return
+        raise FetchError("В ZIP нет XML-документов.")
 
     # выбираем главный документ (уведомление / первый)
     main_doc = choose_main_doc(docs, subsystem)
     if not main_doc:
-        print("[ERR] Не удалось выбрать главный документ из пакета.")
-        return
+        raise FetchError("Не удалось выбрать главный документ из пакета.")
 
     folder = out_root / purchase_number_for_dir
     folder.mkdir(exist_ok=True)
@@ -505,8 +542,12 @@ def main():
     doc_kind = (main_doc["det"].get("docKind") or "document").strip()
     orig_name = os.path.basename(main_doc["name"]) or "doc.xml"
     notice_name = f"notice_{doc_kind}_{date_str}_{sanitize_name(orig_name)}"
-    (folder / notice_name).write_bytes(main_doc["xb"])
+    with profiler.stage("disk"):
+        (folder / notice_name).write_bytes(main_doc["xb"])
     print(f"[NOTICE] сохранён главный XML: {notice_name}")
+    main_rec = NoticeRecord.from_details(main_doc["det"])
+    with profiler.stage("disk"):
+        append_records(folder, [sidecar_record(main_rec, notice_name, "package", len(main_doc["xb"]))])
 
     # готовим строки файлов для manifest.tsv (только плановые имена, без скачивания)
     file_rows = []
@@ -541,11 +582,324 @@ def main():
             "name": "",
         }
 
-    save_manifest_row(folder, meta, file_rows)
+    with profiler.stage("disk"):
+        save_manifest_row(folder, meta, file_rows)
+
+    return {
+        "number": reestr,
+        "subsystem": subsystem,
+        "folder": str(folder),
+        "notice": str(folder / notice_name),
+        "manifest": str(folder / "manifest.tsv"),
+        "links": len(file_rows),
+    }
+
+
+def fetch_one(sess: requests.Session, token: str, reestr: str, subsystem: str,
+              out_root: Path, hints: SubsystemHints | None = None,
+              cache: PackageCache | None = None) -> dict:
+    """
+    Полный цикл для одного номера: кэш -> SOAP (с авто-фолбэком) -> ZIP -> разбор -> диск.
+    """
+    subsystems = candidate_subsystems(subsystem)
+    if hints is not None:
+        subsystems = hints.order(reestr, subsystems)
+
+    if cache is not None:
+        for sub in subsystems:
+            entries = cache.get(reestr, sub)
+            if entries is not None:
+                print(f"[CACHE] {reestr}: пакет {sub} из локального кэша")
+                return save_package(entries, reestr, sub, out_root)
+
+    try:
+        answered, arch_url = request_package(sess, token, reestr, subsystems)
+        print(f"[ARCH] archiveUrl: {arch_url}")
+
+        # качаем ZIP с XML с фолбэком
+        with profiler.stage("download"):
+            zbytes = download_archive(sess, arch_url, token)
+        if not zbytes:
+            raise FetchError("Не удалось загрузить ZIP с XML (даже после фолбэка).", transient=True)
+    except FetchError as e:
+        if not e.transient or cache is None:
+            raise
+        for sub in subsystems:
+            entries = cache.get_stale(reestr, sub)
+            if entries is not None:
+                print(f"[CACHE] {reestr}: ЕИС недоступен ({e}), берём устаревший пакет {sub} из кэша")
+                return save_package(entries, reestr, sub, out_root)
+        raise
+
+    if hints is not None:
+        hints.record(reestr, answered)
+    if answered != subsystem.upper():
+        print(f"[INFO] {reestr}: найдены данные в подсистеме {answered}.")
+
+    with profiler.stage("unzip"):
+        if cache is not None:
+            entries, changed = cache.put(reestr, answered, zbytes)
+            if not changed:
+                print(f"[CACHE] {reestr}: пакет не изменился с прошлой загрузки")
+        else:
+            entries = read_xml_entries(zbytes)
+
+    return save_package(entries, reestr, answered, out_root)
+
+
+# ---------- сессии / пакетный режим ----------
+
+_thread_local = threading.local()
+
+
+def make_session(pool_size: int = 10) -> requests.Session:
+    sess = requests.Session()
+    sess.trust_env = False
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    sess.mount("https://", adapter)
+    sess.mount("http://", adapter)
+    return sess
+
+
+def thread_session() -> requests.Session:
+    """
+    requests.Session не потокобезопасна — держим по одной «тёплой» сессии на поток.
+    """
+    sess = getattr(_thread_local, "sess", None)
+    if sess is None:
+        sess = make_session()
+        _thread_local.sess = sess
+    return sess
+
+
+def check_xsd(sess: requests.Session) -> None:
+    # sanity check XSD — как в eis_fetch_all.py
+    try:
+        rx = sess.get(URL + "?xsd=getDocsIP-ws-api.xsd", timeout=20)
+        print(f"[XSD] HTTP {rx.status_code}")
+        rx.raise_for_status()
+    except Exception as e:
+        print(f"[WARN] Не удалось проверить XSD: {e}")
+
+
+def iter_numbers(source: str):
+    """
+    Номера из файла (или stdin при source == "-"): по одному в строке,
+    пустые строки и комментарии (#) пропускаются. Читаем потоково.
+    """
+    f = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        for line in f:
+            num = line.split("#", 1)[0].strip()
+            if num:
+                yield num
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def run_batch(numbers, token: str, subsystem: str, out_root: Path,
+              workers: int, hints: SubsystemHints,
+              cache: PackageCache | None = None) -> tuple[int, int]:
+    """
+    Конкурентная выгрузка потока номеров. В полёте держим не больше 2*workers задач,
+    чтобы не вычитывать весь stdin/файл в память. Возвращает (ok, failed).
+    """
+    ok = failed = 0
+
+    def job(num: str) -> dict:
+        return fetch_one(thread_session(), token, num, subsystem, out_root, hints, cache)
+
+    def collect(done):
+        nonlocal ok, failed
+        for fut in done:
+            num = in_flight.pop(fut)
+            try:
+                fut.result()
+                ok += 1
+            except Exception as e:
+                failed += 1
+                print(f"[ERR] {num}: {e}")
+
+    in_flight: dict[concurrent.futures.Future, str] = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        for num in numbers:
+            if len(in_flight) >= workers * 2:
+                done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                collect(done)
+            in_flight[pool.submit(job, num)] = num
+        done, _ = concurrent.futures.wait(in_flight)
+        collect(done)
+
+    return ok, failed
+
+
+# ---------- HTTP-режим ----------
+
+class _PackageRequestHandler(BaseHTTPRequestHandler):
+    token: str
+    subsystem: str
+    out_root: Path
+    hints: SubsystemHints
+    cache: PackageCache | None
+
+    def _send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path != "/package":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        qs = parse_qs(parsed.query)
+        number = (qs.get("number") or [""])[0].strip()
+        subsystem = ((qs.get("subsystem") or [self.subsystem])[0].strip() or self.subsystem).upper()
+        if not number:
+            self._send_json(400, {"error": "number is required"})
+            return
+        if not REESTR_NUMBER_RE.fullmatch(number):
+            self._send_json(400, {"error": "number must contain digits only"})
+            return
+        if subsystem not in HTTP_SUBSYSTEMS:
+            self._send_json(400, {"error": f"subsystem must be one of {', '.join(HTTP_SUBSYSTEMS)}"})
+            return
+
+        try:
+            result = fetch_one(thread_session(), self.token, number, subsystem,
+                               self.out_root, self.hints, self.cache)
+        except FetchError as e:
+            self._send_json(404, {"number": number, "error": str(e)})
+            return
+        except Exception as e:
+            print(f"[HTTP] {number}: {e}")
+            self._send_json(502, {"number": number, "error": "upstream error"})
+            return
+
+        # локальные пути сервера наружу не отдаём — только имена внутри папки закупки
+        self._send_json(200, {
+            "number": result["number"],
+            "subsystem": result["subsystem"],
+            "notice": Path(result["notice"]).name,
+            "manifest": Path(result["manifest"]).name,
+            "links": result["links"],
+        })
+
+
+def serve(port: int, token: str, subsystem: str, out_root: Path, hints: SubsystemHints,
+          cache: PackageCache | None = None, host: str = "127.0.0.1") -> None:
+    handler = _PackageRequestHandler
+    handler.token = token
+    handler.subsystem = subsystem
+    handler.out_root = out_root
+    handler.hints = hints
+    handler.cache = cache
+    httpd = ThreadingHTTPServer((host, port), handler)
+    print(f"[HTTP] Сервер пакетов запущен на {host}:{port}: GET /package?number=...&subsystem=...")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("[HTTP] STOP")
+    finally:
+        httpd.server_close()
+
+
+# ---------- main ----------
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="ЕИС: пакет по номеру (getDocsByReestrNumber) без скачивания вложений."
+    )
+    ap.add_argument("--token", required=True,
+                    help="individualPerson_token из PMD (физлицо)")
+    mode = ap.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--number",
+                      help="reestrNumber (номер закупки / контракта в ЕИС)")
+    mode.add_argument("--numbers-file",
+                      help="файл с номерами (по одному в строке) или - для stdin — пакетный режим")
+    mode.add_argument("--serve", type=int, metavar="PORT",
+                      help="HTTP-режим: держать сессию тёплой и отдавать GET /package?number=...")
+    ap.add_argument("--host", default="127.0.0.1",
+                    help="адрес для --serve (по умолчанию 127.0.0.1; наружу — только за прокси с авторизацией)")
+    ap.add_argument("--subsystem", default="PRIZ",
+                    help="subsystemType (по умолчанию PRIZ; для контрактов — RGK)")
+    ap.add_argument("--out-dir", default="out",
+                    help="корневая папка для выгрузки (по умолчанию out)")
+    ap.add_argument("--workers", type=int, default=8,
+                    help="число параллельных запросов в пакетном режиме (по умолчанию 8)")
+    ap.add_argument("--hints-file", default=".subsystem_hints.json",
+                    help="где хранить статистику «префикс номера -> подсистема» (пусто = не хранить)")
+    ap.add_argument("--skip-xsd", action="store_true",
+                    help="не делать проверочный GET XSD при старте")
+    ap.add_argument("--package-cache", default=DEFAULT_CACHE_DIR,
+                    help=f"каталог локального кэша пакетов (по умолчанию {DEFAULT_CACHE_DIR}; пусто = без кэша)")
+    ap.add_argument("--package-cache-ttl", type=float, default=DEFAULT_TTL_HOURS,
+                    help=f"сколько часов пакет из кэша считается свежим (по умолчанию {DEFAULT_TTL_HOURS:g})")
+    ap.add_argument("--profile", metavar="DIR",
+                    help="профилировать прогон: cProfile, tracemalloc и время этапов в отчёт в DIR")
+    args = ap.parse_args()
+
+    if args.profile:
+        profiler.start(args.profile, "single")
+    try:
+        mode_label = "batch" if args.numbers_file else "serve" if args.serve else args.number
+        with profiler.region(mode_label):
+            run(args)
+    finally:
+        profiler.stop()
+
+
+def run(args: argparse.Namespace):
+    token = args.token
+    subsystem = args.subsystem
+    out_root = Path(args.out_dir)
+    hints = SubsystemHints(Path(args.hints_file) if args.hints_file else None)
+    cache = PackageCache(args.package_cache, args.package_cache_ttl) if args.package_cache else None
+
+    sess = thread_session()
+    if not args.skip_xsd:
+        check_xsd(sess)
+
+    if args.numbers_file:
+        ok, failed = run_batch(iter_numbers(args.numbers_file), token, subsystem,
+                               out_root, max(1, args.workers), hints, cache)
+        hints.save()
+        print(f"\n[OK] Пакетный режим: успешно {ok}, с ошибками {failed}")
+        sys.exit(1 if failed and not ok else 0)
+
+    if args.serve:
+        try:
+            serve(args.serve, token, subsystem, out_root, hints, cache, args.host)
+        finally:
+            hints.save()
+        return
+
+    try:
+        result = fetch_one(sess, token, args.number, subsystem, out_root, hints, cache)
+    except FetchError as e:
+        print(f"[ERR] {e}")
+        for sub, resp in e.responses:
+            try:
+                print(f"----- SOAP RESPONSE ({sub}) -----")
+                print(resp.decode("utf-8", "ignore"))
+            except Exception:
+                pass
+        if e.responses:
+            print("----------- END ---------------")
+        sys.exit(1)
+    except Exception as e:
+        print(f"[ERR] SOAP/HTTP: {e}")
+        sys.exit(1)
+    hints.save()
 
-    print(f"\n[OK] Готово. Главный XML: {(folder / notice_name).resolve()}")
-    print(f"[OK] manifest.tsv: {(folder / 'manifest.tsv').resolve()}")
-    print(f"[INFO] ссылок на вложения (без скачивания): {len(file_rows)}")
+    print(f"\n[OK] Готово. Главный XML: {Path(result['notice']).resolve()}")
+    print(f"[OK] manifest.tsv: {Path(result['manifest']).resolve()}")
+    print(f"[INFO] ссылок на вложения (без скачивания): {result['links']}")
 
 
 if __name__ == "__main__":
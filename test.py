@@ -3,24 +3,32 @@
 Вспомогательный скрипт для ручной отправки выгруженных закупок.
 Он архивирует каталог `out/<YYYY-MM-DD>` (по умолчанию текущая дата)
 и POST-отправляет архив на заданный URL, печатая ход выполнения.
+
+Архив собирается потоково (см. zip_stream.py): файлы сжимаются в несколько потоков,
+ZIP уходит в HTTP-тело по мере готовности, так что память не растёт с размером дня.
+С --chunk-url отправка идёт докачиваемыми кусками: после обрыва повторный запуск
+отправит только недостающие куски.
 """
 
 import argparse
 import datetime as dt
-import io
+import itertools
 import sys
 from pathlib import Path
-import zipfile
 
-import requests
 import urllib3
 
+from upload_ledger import DEFAULT_LEDGER, DELTA_NAME, UploadLedger
+from zip_stream import (DEFAULT_CHUNK_SIZE, bytes_member, iter_members, upload_id_for, upload_multipart,
+                        upload_resumable, zip_stream)
+
 
 def build_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Zip & upload daily exports")
     parser.add_argument(
         "upload_url",
-        help="Адрес для POST-отправки архива",
+        nargs="?",
+        help="Адрес для POST-отправки архива (не нужен при --chunk-url)",
     )
     parser.add_argument(
         "--out-dir",
@@ -43,45 +51,92 @@ def build_args() -> argparse.Namespace:
         action="store_true",
         help="Проверять TLS-сертификат (по умолчанию отключено)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Потоков сжатия (по умолчанию 4)",
+    )
+    parser.add_argument(
+        "--level",
+        type=int,
+        default=6,
+        help="Уровень DEFLATE 1..9 (по умолчанию 6)",
+    )
+    parser.add_argument(
+        "--chunk-url",
+        help="Базовый URL докачиваемой отправки кусками (вместо одного POST на upload_url)",
+    )
+    parser.add_argument(
+        "--chunk-size-mb",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE // 2**20,
+        help="Размер куска для --chunk-url, МиБ",
+    )
+    parser.add_argument(
+        "--ledger",
+        help=f"Журнал отправленных файлов (по умолчанию <out-dir>/{DEFAULT_LEDGER}); "
+             "отправляются только новые/изменённые файлы и манифест удалений",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Отправить каталог целиком, не глядя в журнал",
+    )
     return parser.parse_args()
 
 
-def zip_folder(src: Path) -> tuple[str, bytes]:
+def collect_files(src: Path) -> list[tuple[Path, str]]:
     print(f"[ZIP] Сбор файлов из {src}")
-    files = [p for p in src.rglob("*") if p.is_file()]
+    files = sorted(p for p in src.rglob("*") if p.is_file())
     if not files:
         raise FileNotFoundError(f"В каталоге {src} нет файлов для архивации")
-
-    buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zip_out:
-        for f in files:
-            rel = f.relative_to(src)
-            zip_out.write(f, rel.as_posix())
-            print(f"[ZIP] Добавлен {rel}")
-    buffer.seek(0)
-    fname = f"notices_{src.name}.zip"
-    print(f"[ZIP] Готово: {len(files)} файл(ов), размер {buffer.getbuffer().nbytes} байт")
-    return fname, buffer.getvalue()
+    members = [(f, f.relative_to(src).as_posix()) for f in files]
+    total = sum(f.stat().st_size for f, _ in members)
+    print(f"[ZIP] {len(members)} файл(ов), исходный размер {total} байт")
+    return members
 
 
-def upload_zip(url: str, filename: str, payload: bytes, timeout: int, verify: bool) -> None:
-    print(f"[HTTP] Отправка {filename} на {url}")
-    if not verify:
+def upload_folder(args: argparse.Namespace, src: Path) -> None:
+    files = collect_files(src)
+    fname = f"notices_{src.name}.zip"
+    if not args.verify:
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-    resp = requests.post(
-        url,
-        files={"file": (filename, payload, "application/zip")},
-        timeout=timeout,
-        verify=verify,
-    )
+    ledger = None
+    extra = []
+    if not args.full:
+        ledger = UploadLedger(args.ledger or src.parent / DEFAULT_LEDGER)
+        delta = ledger.plan(f"{args.chunk_url or args.upload_url}#{src.name}", files, complete=True)
+        print(f"[DELTA] {delta.summary()}")
+        if delta.empty:
+            print("[DELTA] Сервер уже получил все файлы — отправлять нечего")
+            return
+        files = delta.send
+        extra.append(bytes_member(DELTA_NAME, delta.manifest(), level=args.level))
+
+    members = iter_members(files, workers=args.workers, level=args.level)
+    stream = zip_stream(itertools.chain(members, extra))
+    if args.chunk_url:
+        upload_id = upload_id_for(files, fname, level=args.level, extra=extra)
+        print(f"[HTTP] Отправка {fname} кусками на {args.chunk_url} (upload_id={upload_id})")
+        resp = upload_resumable(args.chunk_url, upload_id, fname, stream,
+                                chunk_size=args.chunk_size_mb * 2**20,
+                                timeout=args.timeout, verify=args.verify)
+    else:
+        print(f"[HTTP] Отправка {fname} на {args.upload_url}")
+        resp = upload_multipart(args.upload_url, fname, stream, timeout=args.timeout, verify=args.verify)
     print(f"[HTTP] Статус: {resp.status_code}")
-    resp.raise_for_status()
     print("[HTTP] Отправлено успешно")
+    if ledger is not None:
+        ledger.commit(delta)
 
 
 def main() -> int:
     args = build_args()
+    if not args.upload_url and not args.chunk_url:
+        print("[ERROR] Нужен upload_url или --chunk-url")
+        return 2
 
     base_dir = Path(args.out_dir).expanduser().resolve()
     day_dir = base_dir / args.date
@@ -93,8 +148,7 @@ def main() -> int:
         return 1
 
     try:
-        fname, payload = zip_folder(day_dir)
-        upload_zip(args.upload_url, fname, payload, args.timeout, args.verify)
+        upload_folder(args, day_dir)
     except Exception as exc:  # noqa: BLE001
         print(f"[ERROR] {exc}")
         return 1
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import datetime as dt
+
+from backfill import BackfillState, WorkUnit, plan_units, run_backfill
+
+JAN = (dt.date(2025, 1, 1), dt.date(2025, 1, 3))
+
+
+class FakeHarvester:
+    def __init__(self, fail_days=()):
+        self.fail_days = set(fail_days)
+        self.calls = []
+
+    def scan_doc_type(self, region, day, subsystem, doc_type, files, counts=None):
+        self.calls.append(day)
+        if day in self.fail_days:
+            return "error"
+        counts["notices"] += 2
+        files.add(f"{day}/notice.xml")
+        return "ok"
+
+
+def test_state_survives_restart(tmp_path):
+    path = tmp_path / "state.jsonl"
+    unit = WorkUnit(77, "2025-01", "PRIZ", "epNotificationEF2020")
+    state = BackfillState(path)
+    state.mark_day(unit, "2025-01-01", 5)
+    with path.open("a", encoding="utf-8") as f:
+        f.write('{"unit": "77/2025-01')            # недописанная строка после аварии
+    restored = BackfillState(path)
+    assert restored.done_days(unit) == {"2025-01-01"}
+    assert not restored.is_done(unit)
+
+
+def test_plan_units_splits_by_month():
+    units = plan_units(dt.date(2025, 1, 30), dt.date(2025, 2, 2), [77], {"PRIZ": ["ep"]})
+    assert [u.month for u in units] == ["2025-01", "2025-02"]
+    assert units[0].days(dt.date(2025, 1, 30), dt.date(2025, 2, 2)) == ["2025-01-30", "2025-01-31"]
+    assert units[1].days(dt.date(2025, 1, 30), dt.date(2025, 2, 2)) == ["2025-02-01", "2025-02-02"]
+
+
+def test_resume_skips_done_days(tmp_path, monkeypatch):
+    monkeypatch.setattr("backfill.time.sleep", lambda s: None)
+    path = tmp_path / "state.jsonl"
+    unit = WorkUnit(77, "2025-01", "PRIZ", "ep")
+    run_backfill(FakeHarvester({"2025-01-02"}), [unit], BackfillState(path), *JAN, workers=1, retries=1)
+    state = BackfillState(path)
+    assert state.done_days(unit) == {"2025-01-01", "2025-01-03"} and not state.is_done(unit)
+
+    harvester = FakeHarvester()
+    run_backfill(harvester, [unit], BackfillState(path), *JAN, workers=1)
+    assert harvester.calls == ["2025-01-02"]
+    assert BackfillState(path).is_done(unit)
+
+
+def test_days_marked_only_after_flush(tmp_path):
+    state = BackfillState(tmp_path / "state.jsonl")
+    unit = WorkUnit(77, "2025-01", "PRIZ", "ep")
+    flushed = []
+
+    def flush():
+        flushed.append(len(state.done_days(unit)))
+
+    progress = run_backfill(FakeHarvester(), [unit], state, *JAN, workers=1, flush=flush)
+    assert flushed == [0, 1, 2]                    # flush идёт до отметки дня
+    assert state.is_done(unit) and progress.rows == 6
+
+
+def test_failed_flush_leaves_day_open(tmp_path):
+    state = BackfillState(tmp_path / "state.jsonl")
+    unit = WorkUnit(77, "2025-01", "PRIZ", "ep")
+
+    def flush():
+        raise RuntimeError("db down")
+
+    run_backfill(FakeHarvester(), [unit], state, *JAN, workers=1, flush=flush)
+    restored = BackfillState(tmp_path / "state.jsonl")
+    assert restored.done_days(unit) == set() and not restored.is_done(unit)
+
+
+def test_each_day_uploaded_before_it_is_marked(tmp_path, monkeypatch):
+    monkeypatch.setattr("backfill.time.sleep", lambda s: None)
+    path = tmp_path / "state.jsonl"
+    unit = WorkUnit(77, "2025-01", "PRIZ", "ep")
+    uploads = []
+
+    def on_day_done(unit, day, files):
+        assert day not in BackfillState(path).done_days(unit)
+        uploads.append((day, sorted(files)))
+
+    run_backfill(FakeHarvester({"2025-01-02"}), [unit], BackfillState(path), *JAN,
+                 workers=1, retries=0, on_day_done=on_day_done)
+    assert uploads == [("2025-01-01", ["2025-01-01/notice.xml"]), ("2025-01-03", ["2025-01-03/notice.xml"])]
+
+    uploads.clear()                                # продолжение: только недостающий день
+    run_backfill(FakeHarvester(), [unit], BackfillState(path), *JAN, workers=1, on_day_done=on_day_done)
+    assert uploads == [("2025-01-02", ["2025-01-02/notice.xml"])]
+
+
+def test_failed_upload_leaves_day_open(tmp_path):
+    path = tmp_path / "state.jsonl"
+    unit = WorkUnit(77, "2025-01", "PRIZ", "ep")
+
+    def on_day_done(unit, day, files):
+        raise RuntimeError("upload failed")
+
+    run_backfill(FakeHarvester(), [unit], BackfillState(path), *JAN, workers=1, on_day_done=on_day_done)
+    assert BackfillState(path).done_days(unit) == set()
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+from embedding_backend import encoder_key
+
+
+def test_encoder_key_separates_backends():
+    keys = {encoder_key("mpnet", "torch", 0), encoder_key("mpnet", "int8", 0),
+            encoder_key("mpnet", "torch", 256), encoder_key("mpnet", "onnx-int8", 0)}
+    assert len(keys) == 4
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import time
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache, encode_cached
+
+
+def sha(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.seen = []
+
+    def __call__(self, texts):
+        self.seen.append(list(texts))
+        return np.array([[len(t), ord(t[0])] for t in texts], dtype=np.float32)
+
+
+def test_duplicates_encoded_once_without_cache():
+    encode = CountingEncoder()
+    texts = ["бумага", "картон", "бумага"]
+    out = encode_cached(texts, [sha(t) for t in texts], encode)
+    assert encode.seen == [["бумага", "картон"]]
+    np.testing.assert_array_equal(out[0], out[2])
+
+
+def test_cache_hits_across_batches(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), "model|torch|default")
+    encode = CountingEncoder()
+    first = encode_cached(["бумага"], [sha("бумага")], encode, cache)
+    second = encode_cached(["бумага", "картон"], [sha("бумага"), sha("картон")], encode, cache)
+    assert encode.seen == [["бумага"], ["картон"]]
+    np.testing.assert_array_equal(first[0], second[0])
+    assert (cache.hits, cache.misses) == (1, 2)
+    cache.close()
+
+
+def test_cache_is_keyed_by_model(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    torch_cache = EmbeddingCache(path, "model|torch|default")
+    torch_cache.put_many([(sha("бумага"), np.ones(2, dtype=np.float32))])
+    int8_cache = EmbeddingCache(path, "model|int8|default")
+    assert int8_cache.get_many([sha("бумага")]) == {}
+    assert list(torch_cache.get_many([sha("бумага")])) == [sha("бумага")]
+    torch_cache.close()
+    int8_cache.close()
+
+
+
+def test_prune_drops_stale_and_oldest(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), "m", max_rows=2, max_age_days=1)
+    vec = np.ones(2, dtype=np.float32)
+    cache.put_many([(sha("старый"), vec)])
+    cache._conn.execute("UPDATE vectors SET used_at = ?", (int(time.time()) - 3 * 86400,))
+    cache.put_many([(sha("a"), vec), (sha("b"), vec), (sha("c"), vec)])
+    cache._conn.execute("UPDATE vectors SET used_at = used_at - 10 WHERE content_hash = ?", (sha("a"),))
+    assert cache.prune() == 2
+    assert set(cache.get_many([sha(t) for t in ("старый", "a", "b", "c")])) == {sha("b"), sha("c")}
+    cache.close()
+
+
+def test_hit_refreshes_used_at(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), "m", max_age_days=1)
+    cache.put_many([(sha("a"), np.ones(2, dtype=np.float32))])
+    cache._conn.execute("UPDATE vectors SET used_at = ?", (int(time.time()) - 2 * 86400,))
+    assert cache.get_many([sha("a")])
+    assert cache.prune() == 0
+    cache.close()
+
+
+def test_copies_share_content_hash():
+    index = pytest.importorskip("index")       # нужны mssql_python и torch
+    Row = namedtuple("Row", "PurchaseNumber PurchaseObjectInfo Okpd2Code Okpd2Name KvrCode KvrName")
+    lot1 = Row("0173100000125000001", "Поставка бумаги", "17.12.14", "Бумага", None, None)
+    lot2 = lot1._replace(PurchaseNumber="0173100000125000002")
+    assert index.content_hash(lot1) == index.content_hash(lot2)
+    assert index.text_hash(index.build_notice_text(lot1)) != index.text_hash(index.build_notice_text(lot2))
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+from harvest_queue import HarvestItem, MemoryWorkQueue, run_worker
+
+
+def make_item(region: int = 77, doc_type: str = "epNotificationEF2020") -> HarvestItem:
+    return HarvestItem(region, "2025-01-15", "PRIZ", doc_type)
+
+
+class FakeHarvester:
+    def __init__(self, results=None):
+        self.results = results or {}
+        self.scanned = []
+
+    def scan_doc_type(self, region, date_str, subsystem, doc_type, files, counts=None):
+        self.scanned.append((region, doc_type))
+        return self.results.get(doc_type, "ok")
+
+
+def test_item_roundtrip():
+    item = HarvestItem(5, "2025-01-15", "PRIZ", "epNotificationEF2020", attempts=2)
+    assert HarvestItem.from_bytes(item.to_bytes()) == item
+    assert item.key == "05/2025-01-15/PRIZ/epNotificationEF2020"
+
+
+def test_expired_lease_is_redelivered():
+    queue = MemoryWorkQueue(visibility=0.0)
+    queue.publish([make_item()])
+    first = queue.lease()
+    second = queue.lease()                 # аренда первого истекла сразу
+    assert second is not None and second.item == first.item
+    assert queue.ack(first) is False       # опоздавший воркер не подтверждает чужую аренду
+    assert queue.ack(second) is True
+    assert queue.lease() is None
+    assert queue.pending() == 0
+
+
+def test_active_lease_is_not_redelivered():
+    queue = MemoryWorkQueue(visibility=60.0)
+    queue.publish([make_item()])
+    lease = queue.lease()
+    assert queue.lease() is None
+    assert queue.pending() == 1
+    queue.release(lease)
+    again = queue.lease()
+    assert again.item == lease.item and again.item.attempts == 0
+
+
+def test_retry_requeues_with_attempt_count():
+    queue = MemoryWorkQueue()
+    queue.publish([make_item(1), make_item(2)])
+    lease = queue.lease()
+    queue.retry(lease)
+    assert queue.lease().item.region == 2
+    retried = queue.lease()
+    assert retried.item.region == 1 and retried.item.attempts == 1
+
+
+def test_worker_acks_after_item_done():
+    queue = MemoryWorkQueue()
+    queue.publish([make_item(1), make_item(2)])
+    done = []
+
+    def on_item_done(item, files):
+        assert queue.pending() == 2 - len(done)     # ещё не подтверждена
+        done.append((item.region, files))
+
+    assert run_worker(FakeHarvester(), queue, on_item_done) == 2
+    assert done == [(1, set()), (2, set())]         # вызывается и без файлов
+    assert queue.pending() == 0
+
+
+def test_worker_releases_item_when_flush_fails():
+    queue = MemoryWorkQueue()
+    queue.publish([make_item(1), make_item(2)])
+
+    def on_item_done(item, files):
+        raise RuntimeError("db down")
+
+    assert run_worker(FakeHarvester(), queue, on_item_done) == 0
+    assert queue.pending() == 2
+    assert queue.lease().item.region == 1           # вернулась в начало, без попытки
+
+
+def test_worker_drops_item_after_max_attempts():
+    queue = MemoryWorkQueue()
+    queue.publish([make_item(doc_type="broken"), make_item(doc_type="fine")])
+    harvester = FakeHarvester({"broken": "error"})
+    assert run_worker(harvester, queue, max_attempts=3) == 1
+    assert [d for _, d in harvester.scanned].count("broken") == 3
+    assert queue.pending() == 0
+
+
+def test_worker_stop_returns_item():
+    queue = MemoryWorkQueue()
+    queue.publish([make_item(doc_type="limit"), make_item()])
+    assert run_worker(FakeHarvester({"limit": "stop"}), queue) == 0
+    assert queue.pending() == 2
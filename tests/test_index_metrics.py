@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import urllib.request
+
+import index_metrics
+from index_metrics import IndexMetrics, MetricsServer, RowVersionClock
+
+
+def rv(n: int) -> bytes:
+    return n.to_bytes(8, "big")
+
+
+def test_clock_maps_rowversion_to_first_sample_after_change():
+    clock = RowVersionClock()
+    clock.observe(rv(100), at=1000.0)
+    clock.observe(rv(100), at=1010.0)       # без изменений — замер не добавляется
+    clock.observe(rv(150), at=1030.0)
+    clock.observe(rv(200), at=1060.0)
+    assert clock.changed_at(rv(90)) is None      # изменена до первого замера
+    assert clock.changed_at(rv(120)) == 1030.0
+    assert clock.changed_at(rv(150)) == 1030.0
+    assert clock.changed_at(rv(201)) is None     # ещё не замерена
+    assert clock.lags([rv(120), rv(180), rv(50)], now=1100.0) == [70.0, 40.0]
+
+
+def test_clock_keeps_bounded_history():
+    clock = RowVersionClock(max_samples=10)
+    for i in range(1, 26):
+        clock.observe(rv(i * 10), at=float(i))
+    assert len(clock._versions) <= 10
+    assert clock.changed_at(rv(245)) == 25.0
+
+
+def test_summary_count_and_sum_are_cumulative(monkeypatch):
+    monkeypatch.setattr(index_metrics, "LAG_WINDOW", 2)
+    metrics = IndexMetrics("test")
+    metrics.record_batch(3, 3, 0, {"read": 0.1}, [1.0, 2.0, 3.0], [10.0])
+    metrics.record_batch(1, 1, 0, {"read": 0.1}, [4.0], [])
+    text = metrics.render_prometheus()
+    assert 'index_lag_seconds_count{indexer="test",source="change"} 4' in text
+    assert 'index_lag_seconds_sum{indexer="test",source="change"} 10.0' in text
+    assert 'index_lag_seconds_count{indexer="test",source="publish"} 1' in text
+    assert 'index_lag_seconds{indexer="test",source="change",quantile="0.95"} 4.0' in text
+    assert "# TYPE index_lag_seconds summary" in text
+
+
+def test_metrics_server_listens_on_loopback_by_default():
+    server = MetricsServer(IndexMetrics("mpnet"), 0)
+    try:
+        server.start()
+        host, port = server._server.server_address[:2]
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as resp:
+            assert b"index_backlog_notices" in resp.read()
+    finally:
+        server.stop()
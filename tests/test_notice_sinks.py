@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import datetime as dt
+from decimal import Decimal
+
+import pytest
+
+from notice_record import NoticeRecord
+from notice_sinks import HttpJsonlSink, MultiSink, NoticeItem, NoticeSink, NoticesDbSink, SinkError, connect_db
+
+MSK = dt.timezone(dt.timedelta(hours=3))
+
+
+def make_item(number: str, name: str = "Поставка бумаги") -> NoticeItem:
+    record = NoticeRecord(
+        doc_kind="epNotificationEF2020", purchase_number=number, ikz="", placing_code="EA20",
+        placing_name="", customer_name="", customer_inn="", customer_kpp="",
+        max_price=Decimal("1000.50"), currency="RUB", name=name,
+        publish_date=dt.datetime(2025, 1, 15, 12, 0, tzinfo=MSK), app_start=None,
+        app_end=dt.datetime(2025, 1, 25, 9, 0, tzinfo=MSK), platform="ЭТП", okpd2=("17.12.14",), links=(),
+    )
+    return NoticeItem(77, "2025-01-15", "epNotificationEF2020", number,
+                      f"notice_{number}.xml", b"<xml/>", record)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return f"sqlite:{tmp_path / 'notices.db'}"
+
+
+def test_db_sink_inserts_then_updates(db_path):
+    sink = NoticesDbSink(connect_db(db_path), batch_size=100, dialect="sqlite")
+    sink.write(make_item("0001"))
+    sink.write(make_item("0002"))
+    sink.flush()
+    sink.write(make_item("0001", name="Поставка картона"))
+    sink.flush()
+    assert (sink.inserted, sink.updated) == (2, 1)
+    rows = sink.conn.execute("SELECT PurchaseNumber, PurchaseObjectInfo, PublishDate, CollectingEnd, RawJson "
+                             "FROM Notices ORDER BY PurchaseNumber").fetchall()
+    sink.close()
+    assert rows == [
+        ("0001", "Поставка картона", "2025-01-15 09:00:00", "2025-01-25 06:00:00", None),  # UTC
+        ("0002", "Поставка бумаги", "2025-01-15 09:00:00", "2025-01-25 06:00:00", None),
+    ]
+
+
+def test_db_sink_keeps_rows_until_written(db_path):
+    sink = NoticesDbSink(connect_db(db_path), batch_size=100, dialect="sqlite")
+    sink.write(make_item("0001"))
+    sink.conn.execute("DROP TABLE Notices")
+    with pytest.raises(SinkError):
+        sink.flush()
+    sink.conn.close()
+    sink.conn = connect_db(db_path)         # схема создаётся заново
+    sink.flush()
+    assert sink.inserted == 1
+    assert sink.conn.execute("SELECT PurchaseNumber FROM Notices").fetchall() == [("0001",)]
+    sink.close()
+
+
+def test_db_sink_full_buffer_does_not_raise(db_path):
+    sink = NoticesDbSink(connect_db(db_path), batch_size=1, dialect="sqlite")
+    sink.conn.execute("DROP TABLE Notices")
+    sink.write(make_item("0001"))           # flush при заполнении буфера молча откладывается
+    assert list(sink._buf) == ["0001"]
+    sink.conn.close()
+
+
+class _Response:
+    def __init__(self, status: int):
+        self.status_code = status
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class _Session:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.bodies = []
+
+    def post(self, url, data, headers, timeout):
+        self.bodies.append(data)
+        return _Response(self.statuses.pop(0))
+
+
+def test_http_sink_rebuffers_failed_batch():
+    sink = HttpJsonlSink("http://sink.invalid/notices", batch_size=100)
+    sink._sess = _Session([503, 200])
+    sink.write(make_item("0001"))
+    with pytest.raises(SinkError):
+        sink.flush()
+    assert len(sink._buf) == 1
+    sink.flush()
+    assert sink._buf == [] and len(sink._sess.bodies) == 2
+
+
+class _FailingSink(NoticeSink):
+    def __init__(self):
+        self.flushed = 0
+
+    def write(self, item):
+        return set()
+
+    def flush(self):
+        self.flushed += 1
+        raise SinkError("down")
+
+
+class _CountingSink(_FailingSink):
+    def flush(self):
+        self.flushed += 1
+
+
+def test_multi_sink_flushes_every_sink_before_raising():
+    failing, counting = _FailingSink(), _CountingSink()
+    with pytest.raises(SinkError):
+        MultiSink([failing, counting]).flush()
+    assert (failing.flushed, counting.flushed) == (1, 1)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import datetime as dt
+import io
+import json
+import os
+import zipfile
+
+from package_cache import PackageCache
+
+
+def make_zip(*docs: tuple[str, bytes]) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in docs:
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def versions(cache: PackageCache, reestr: str) -> list[str]:
+    entry = cache._entry_dir(reestr, "PRIZ")
+    return sorted(p.name for p in entry.iterdir() if p.is_dir())
+
+
+def age_meta(cache: PackageCache, reestr: str, **fields) -> None:
+    path = cache._entry_dir(reestr, "PRIZ") / "meta.json"
+    meta = json.loads(path.read_text(encoding="utf-8"))
+    meta.update(fields)
+    path.write_text(json.dumps(meta), encoding="utf-8")
+
+
+def ago(**delta) -> str:
+    return (dt.datetime.now() - dt.timedelta(**delta)).isoformat(timespec="seconds")
+
+
+def test_put_keeps_superseded_version_until_ttl_sweep(tmp_path):
+    cache = PackageCache(tmp_path, ttl_hours=6)
+    cache.put("0123", "priz", make_zip(("a.xml", b"<v1/>")))
+    entries, changed = cache.put("0123", "priz", make_zip(("a.xml", b"<v2/>")))
+    assert changed and entries == [("a.xml", b"<v2/>")]
+    assert len(versions(cache, "0123")) == 2       # старую версию может читать другой процесс
+
+    assert cache.prune() == 0
+    assert len(versions(cache, "0123")) == 2
+
+    meta = cache._read_meta("0123", "priz")
+    (old,) = meta["superseded"]
+    age_meta(cache, "0123", superseded={old: ago(hours=7)})
+    assert cache.prune() == 1
+    assert versions(cache, "0123") == [meta["sha256"][:16]]
+    assert cache.get("0123", "priz") == [("a.xml", b"<v2/>")]
+
+
+def test_prune_drops_old_entries_and_enforces_size(tmp_path):
+    cache = PackageCache(tmp_path, max_age_days=30)
+    for reestr in ("0001", "0002", "0003"):
+        cache.put(reestr, "priz", make_zip(("a.xml", b"x" * 4000)))
+    age_meta(cache, "0001", fetchedAt=ago(days=31))
+    age_meta(cache, "0002", fetchedAt=ago(days=2))
+
+    assert cache.prune() == 1
+    assert cache.get_stale("0001", "priz") is None
+    assert cache.get_stale("0002", "priz") is not None
+
+    cache.max_bytes = 6000                            # помещается одна запись
+    assert cache.prune() == 1
+    assert cache.get_stale("0002", "priz") is None    # самая давняя
+    assert cache.get("0003", "priz") == [("a.xml", b"x" * 4000)]
+
+
+def test_prune_leaves_fresh_entry_without_meta(tmp_path):
+    # put() другого процесса ещё пишет XML, meta.json нет
+    entry = tmp_path / "PRIZ" / "0123"
+    (entry / "abcdef").mkdir(parents=True)
+    cache = PackageCache(tmp_path, ttl_hours=6)
+    assert entry.is_dir()
+
+    old = (dt.datetime.now() - dt.timedelta(hours=7)).timestamp()
+    os.utime(entry, (old, old))
+    assert cache.prune() == 1
+    assert not entry.exists()
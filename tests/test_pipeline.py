@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from pipeline import run_pipeline
+
+
+def test_items_pass_all_stages_in_order():
+    written = []
+    busy = run_pipeline(range(20), [("double", lambda x: x * 2), ("write", written.append)], depth=2)
+    assert written == [x * 2 for x in range(20)]
+    assert set(busy) == {"read", "double", "write"}
+
+
+def test_none_result_is_dropped():
+    written = []
+    run_pipeline(range(6), [("odd", lambda x: x if x % 2 else None), ("write", written.append)])
+    assert written == [1, 3, 5]
+
+
+def test_stage_error_stops_pipeline():
+    def boom(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    written = []
+    with pytest.raises(ValueError, match="bad item"):
+        run_pipeline(range(1000), [("check", boom), ("write", written.append)], depth=1)
+    assert written == [0, 1, 2]
+
+
+def test_source_error_is_raised():
+    def source():
+        yield 1
+        raise RuntimeError("db gone")
+
+    with pytest.raises(RuntimeError, match="db gone"):
+        run_pipeline(source(), [("write", lambda x: None)])
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+from upload_ledger import UploadLedger
+
+
+def write(folder, name, data):
+    path = folder / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path, name
+
+
+def test_unchanged_files_are_not_resent(tmp_path):
+    day = tmp_path / "out"
+    files = [write(day, "a.xml", b"<a/>"), write(day, "b.xml", b"<b/>")]
+    ledger = UploadLedger(tmp_path / "ledger.json")
+    first = ledger.plan("2025-01-15", files)
+    assert [a for _, a in first.send] == ["a.xml", "b.xml"]
+    ledger.commit(first)
+
+    again = UploadLedger(tmp_path / "ledger.json").plan("2025-01-15", files)
+    assert again.empty and again.unchanged == 2
+
+
+def test_touched_file_with_same_content_is_skipped(tmp_path):
+    day = tmp_path / "out"
+    files = [write(day, "a.xml", b"<a/>")]
+    ledger = UploadLedger(tmp_path / "ledger.json")
+    ledger.commit(ledger.plan("d", files))
+    st = files[0][0].stat()
+    os.utime(files[0][0], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    delta = ledger.plan("d", files)
+    assert delta.send == [] and delta.unchanged == 1
+
+
+def test_changed_file_is_resent(tmp_path):
+    day = tmp_path / "out"
+    files = [write(day, "a.xml", b"<a/>")]
+    ledger = UploadLedger(tmp_path / "ledger.json")
+    ledger.commit(ledger.plan("d", files))
+    files = [write(day, "a.xml", b"<a changed='1'/>")]
+    assert [a for _, a in ledger.plan("d", files).send] == ["a.xml"]
+
+
+def test_deleted_and_renamed_in_manifest(tmp_path):
+    day = tmp_path / "out"
+    ledger = UploadLedger(tmp_path / "ledger.json")
+    ledger.commit(ledger.plan("d", [write(day, "a.xml", b"<a/>"), write(day, "b.xml", b"<b/>")], complete=True))
+    (day / "a.xml").unlink()
+    (day / "b.xml").rename(day / "c.xml")
+    delta = ledger.plan("d", [(day / "c.xml", "c.xml")], complete=True)
+    assert delta.deleted == ["a.xml"]
+    assert delta.renamed == [("b.xml", "c.xml")]
+    assert [a for _, a in delta.send] == ["c.xml"]      # сервер манифест пока не применяет
+    manifest = json.loads(delta.manifest())
+    assert manifest["renamed"] == [{"from": "b.xml", "to": "c.xml"}] and manifest["deleted"] == ["a.xml"]
+
+    ledger.commit(delta)
+    assert ledger.plan("d", [(day / "c.xml", "c.xml")], complete=True).empty
+
+
+def test_nothing_recorded_without_commit(tmp_path):
+    day = tmp_path / "out"
+    files = [write(day, "a.xml", b"<a/>")]
+    ledger = UploadLedger(tmp_path / "ledger.json")
+    ledger.plan("d", files)                          # отправка не удалась — commit не было
+    assert len(UploadLedger(tmp_path / "ledger.json").plan("d", files).send) == 1
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from vector_codec import FLOAT16, FLOAT32, HEADER, JSON, decode_matrix, decode_vector, encode_matrix, encode_vector
+
+
+@pytest.fixture
+def matrix():
+    return np.random.default_rng(0).standard_normal((3, 16)).astype(np.float32)
+
+
+def test_float32_roundtrip(matrix):
+    value = encode_vector(matrix[0], FLOAT32)
+    assert len(value) == HEADER.size + 16 * 4
+    decoded = decode_vector(value, dims=16)
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, matrix[0])
+
+
+def test_float16_roundtrip(matrix):
+    decoded = decode_vector(encode_vector(matrix[0], FLOAT16))
+    assert decoded.dtype == np.float16
+    np.testing.assert_allclose(decoded, matrix[0], rtol=1e-3, atol=1e-3)
+
+
+def test_json_roundtrip(matrix):
+    value = encode_vector(matrix[0], JSON)
+    assert isinstance(value, str) and value.startswith("[")
+    np.testing.assert_allclose(decode_vector(value), matrix[0], rtol=1e-6)
+
+
+@pytest.mark.parametrize("fmt", [FLOAT32, FLOAT16, JSON])
+def test_matrix_roundtrip(matrix, fmt):
+    decoded = decode_matrix(encode_matrix(matrix, fmt), dims=16)
+    assert decoded.shape == (3, 16) and decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, matrix, rtol=1e-3, atol=1e-3)
+
+
+def test_legacy_float64_bytes(matrix):
+    legacy = matrix[0].astype(np.float64).tobytes()
+    np.testing.assert_allclose(decode_vector(legacy), matrix[0])
+    np.testing.assert_allclose(decode_vector(legacy, dims=16), matrix[0])
+
+
+def test_headerless_float32_with_dims(matrix):
+    np.testing.assert_array_equal(decode_vector(matrix[0].tobytes(), dims=16), matrix[0])
+
+
+def test_dimension_mismatch(matrix):
+    with pytest.raises(ValueError):
+        decode_vector(encode_vector(matrix[0]), dims=8)
+    with pytest.raises(ValueError):
+        decode_vector(b"\x00" * 7)
+
+
+def test_empty_matrix():
+    assert decode_matrix([], dims=16).shape == (0, 16)
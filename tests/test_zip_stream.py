@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from zip_stream import bytes_member, upload_id_for
+
+
+def test_upload_id_follows_level_and_manifest(tmp_path):
+    path = tmp_path / "a.xml"
+    path.write_bytes(b"<a/>")
+    files = [(path, "a.xml")]
+    base = upload_id_for(files, "notices.zip")
+
+    assert upload_id_for(files, "notices.zip") == base
+    assert upload_id_for(files, "notices.zip", level=9) != base
+
+    manifest = [bytes_member("_delta.json", b'{"deleted": []}')]
+    other = [bytes_member("_delta.json", b'{"deleted": ["b.xml"]}')]
+    with_manifest = upload_id_for(files, "notices.zip", extra=manifest)
+    assert with_manifest != base
+    assert upload_id_for(files, "notices.zip", extra=other) != with_manifest
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Журнал выгрузок: что уже принято сервером (test.py, downloader.py --upload-url).
+
+Для каждого отправленного файла хранится sha256, размер и mtime (JSON, атомарная
+перезапись). Перед очередной выгрузкой plan() сравнивает файлы с журналом и оставляет
+только новые и изменённые; хеш пересчитывается лишь для файлов с другим размером/mtime.
+Повторная выгрузка того же дня сводится к реальной разнице.
+
+Если передан полный список файлов области (complete=True — весь каталог дня в test.py),
+дополнительно вычисляются удалённые и переименованные файлы (тот же хеш под другим
+именем). Они описываются в архиве компактным манифестом:
+
+    _delta.json = {"version": 1, "base": "<область>", "files": 12,
+                   "deleted": ["77/.../notice_old.xml"],
+                   "renamed": [{"from": "...", "to": "..."}]}
+
+Сервер _delta.json пока не читает, поэтому переименованный файл всё равно отправляется
+целиком под новым именем (иначе он не дойдёт до сервера); манифест — задел на будущее,
+когда сервер научится применять переименования и удаления сам.
+
+Журнал обновляется только после успешной отправки (commit()).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+DELTA_NAME = "_delta.json"
+DEFAULT_LEDGER = "upload_ledger.json"
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+@dataclass
+class Delta:
+    scope: str
+    send: list[tuple[Path, str]] = field(default_factory=list)    # (путь, имя в архиве)
+    unchanged: int = 0
+    deleted: list[str] = field(default_factory=list)
+    renamed: list[tuple[str, str]] = field(default_factory=list)
+    _entries: dict[str, dict] = field(default_factory=dict, repr=False)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.send or self.deleted or self.renamed)
+
+    def manifest(self) -> bytes:
+        return json.dumps({
+            "version": 1,
+            "base": self.scope,
+            "files": len(self.send),
+            "deleted": self.deleted,
+            "renamed": [{"from": a, "to": b} for a, b in self.renamed],
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def summary(self) -> str:
+        return (f"новых/изменённых {len(self.send)}, без изменений {self.unchanged}, "
+                f"удалено {len(self.deleted)}, переименовано {len(self.renamed)}")
+
+
+class UploadLedger:
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data: dict[str, dict[str, dict]] = {}
+        try:
+            self._data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            pass
+
+    def plan(self, scope: str, files: list[tuple[Path, str]], complete: bool = False) -> Delta:
+        """Что отправлять в область scope. complete=True — files это все файлы области."""
+        with self._lock:
+            known = dict(self._data.get(scope, {}))
+        delta = Delta(scope)
+        by_hash_new: dict[str, str] = {}
+        for path, arcname in files:
+            st = path.stat()
+            prev = known.get(arcname)
+            if prev and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+                delta.unchanged += 1
+                continue
+            sha = file_sha256(path)
+            entry = {"sha256": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            delta._entries[arcname] = entry
+            if prev and prev.get("sha256") == sha:
+                delta.unchanged += 1        # тронули mtime, содержимое то же
+                continue
+            if not prev:
+                by_hash_new[sha] = arcname
+            delta.send.append((path, arcname))
+
+        if complete:
+            present = {arcname for _, arcname in files}
+            for arcname, entry in known.items():
+                if arcname in present:
+                    continue
+                new_name = by_hash_new.pop(entry.get("sha256"), None)
+                if new_name:
+                    # содержимое шлём заново: сервер не применяет манифест
+                    delta.renamed.append((arcname, new_name))
+                else:
+                    delta.deleted.append(arcname)
+        return delta
+
+    def commit(self, delta: Delta) -> None:
+        now = int(time.time())
+        with self._lock:
+            area = self._data.setdefault(delta.scope, {})
+            for arcname, entry in delta._entries.items():
+                area[arcname] = {**entry, "at": now}
+            for arcname in delta.deleted:
+                area.pop(arcname, None)
+            for old, _new in delta.renamed:
+                area.pop(old, None)
+            self._save()
+
+    def prune(self, max_age_days: float = 30.0) -> int:
+        """Удаляет записи старше max_age_days (долго работающий харвестер не копит журнал бесконечно)."""
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        with self._lock:
+            for scope in list(self._data):
+                area = self._data[scope]
+                for arcname in [a for a, e in area.items() if e.get("at", 0) < cutoff]:
+                    del area[arcname]
+                    removed += 1
+                if not area:
+                    del self._data[scope]
+            if removed:
+                self._save()
+        return removed
+
+    def _save(self) -> None:
+        tmp = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}.tmp")
+        tmp.write_text(json.dumps(self._data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.path)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Общий формат векторов эмбеддингов для индексатора (index.py, embedding_store.py),
+CLI (search.py) и воркеров (pyfavorite_search.py).
+
+Бинарный вид — 8-байтный заголовок в раскладке двоичного формата SQL Server VECTOR
+и значения little-endian:
+
+    0xA9 | версия 0x01 | dims uint16 | тип элемента (0 — float32, 1 — float16) | 3 байта резерва
+
+768 × float32 = 3 КБ (float16 — 1,5 КБ) против 6–10 КБ JSON-текста; чтение —
+np.frombuffer без копирования и без разбора текста.
+
+decode_vector() понимает и всё, что встречалось в базе раньше: JSON-строку "[...]"
+(VECTOR, отданный драйвером как текст), «голые» float64-байты (старые записи
+pyfavorite_search/search.py) и float32/float16 без заголовка при известной размерности.
+
+Для колонки типа VECTOR(...) сервер принимает на вход только JSON-текст — такой формат
+называется "json" (to_json); в varbinary-колонку пишется бинарный "float32"/"float16".
+"""
+
+import json
+import struct
+from typing import Any, Iterable, List, Optional
+
+import numpy as np
+
+MAGIC = 0xA9
+VERSION = 0x01
+HEADER = struct.Struct("<BBHB3x")
+
+FLOAT32 = "float32"
+FLOAT16 = "float16"
+JSON = "json"
+FORMATS = (FLOAT32, FLOAT16, JSON)
+
+_ELEMENT_TYPES = {FLOAT32: 0, FLOAT16: 1}
+_DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2")}
+
+
+def encode_vector(vector: Any, fmt: str = FLOAT32) -> Any:
+    """bytes (float32/float16 с заголовком) или str (json)."""
+    if fmt == JSON:
+        return to_json(vector)
+    element = _ELEMENT_TYPES[fmt]
+    arr = np.ascontiguousarray(vector, dtype=_DTYPES[element]).reshape(-1)
+    return HEADER.pack(MAGIC, VERSION, arr.shape[0], element) + arr.tobytes()
+
+
+def encode_matrix(matrix: np.ndarray, fmt: str = FLOAT32) -> List[Any]:
+    """Пачка (N, D) -> N значений; приведение типа — один раз на всю матрицу."""
+    if fmt == JSON:
+        return [to_json(v) for v in matrix]
+    element = _ELEMENT_TYPES[fmt]
+    arr = np.ascontiguousarray(matrix, dtype=_DTYPES[element])
+    header = HEADER.pack(MAGIC, VERSION, arr.shape[1], element)
+    return [header + row.tobytes() for row in arr]
+
+
+def to_json(vector: Any) -> str:
+    """
+    Строка JSON вида "[0.1, 2.0, ...]" — SQL Server 2025 неявно конвертирует
+    nvarchar/json-строку в VECTOR.
+    """
+    return json.dumps(np.asarray(vector, dtype=np.float32).tolist(), ensure_ascii=False)
+
+
+def decode_vector(value: Any, dims: Optional[int] = None) -> np.ndarray:
+    """
+    Значение из базы -> одномерный np.ndarray. Бинарный float32 возвращается
+    представлением над буфером (без копирования, только для чтения).
+    """
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Не удалось распарсить вектор из строки: {exc}") from exc
+        return np.asarray(parsed, dtype=np.float32)
+
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return np.asarray(value, dtype=np.float32)
+
+    try:
+        buffer = memoryview(value).cast("B")
+    except TypeError as exc:
+        raise TypeError(f"Неизвестный тип вектора: {type(value)!r}") from exc
+
+    if buffer.nbytes >= HEADER.size and buffer[0] == MAGIC and buffer[1] == VERSION:
+        _, _, count, element = HEADER.unpack_from(buffer)
+        dtype = _DTYPES.get(element)
+        if dtype is not None and buffer.nbytes == HEADER.size + count * dtype.itemsize:
+            if dims is not None and count != dims:
+                raise ValueError(f"Размерность вектора {count}, ожидалась {dims}")
+            return np.frombuffer(buffer, dtype=dtype, count=count, offset=HEADER.size)
+
+    # без заголовка: по длине при известной размерности, иначе — старый float64
+    if dims:
+        for dtype in (np.dtype("<f8"), np.dtype("<f4"), np.dtype("<f2")):
+            if buffer.nbytes == dims * dtype.itemsize:
+                return np.frombuffer(buffer, dtype=dtype, count=dims)
+        raise ValueError(f"Некорректный размер вектора: {buffer.nbytes} байт при размерности {dims}")
+    if buffer.nbytes % 8:
+        raise ValueError(f"Некорректный размер вектора: {buffer.nbytes} байт")
+    return np.frombuffer(buffer, dtype="<f8")
+
+
+def decode_matrix(values: Iterable[Any], dims: Optional[int] = None) -> np.ndarray:
+    """Значения из базы -> матрица (N, D) float32."""
+    vectors = [decode_vector(v, dims) for v in values]
+    if not vectors:
+        return np.zeros((0, dims or 0), dtype=np.float32)
+    out = np.empty((len(vectors), vectors[0].shape[0]), dtype=np.float32)
+    for i, v in enumerate(vectors):
+        if v.shape[0] != out.shape[1]:
+            raise ValueError(f"Векторы разной размерности: {v.shape[0]} и {out.shape[1]}")
+        out[i] = v
+    return out
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сжатое хранение XML закупок: notice_*.xml / package_*.xml -> *.xml.zst (zstd со словарём).
+
+XML уведомлений ЕИС почти целиком состоит из одних и тех же тегов и пространств имён,
+поэтому словарь, обученный на уже выгруженных файлах, сжимает одиночный документ
+в разы лучше, чем zstd/DEFLATE без словаря. В каждом кадре zstd записан ID словаря;
+словари лежат в каталоге DEFAULT_DICT_DIR под именами <id>.dict, и read_xml()
+сам находит нужный.
+
+    python xml_store.py train out/                 # обучить словарь на out/**/*.xml -> zstd_dicts/<id>.dict
+    python xml_store.py cat out/.../notice_x.xml.zst   # распаковать в stdout
+
+Запись: downloader.py --compress-xml (словарь — --zstd-dict или самый свежий в zstd_dicts/).
+Чтение: read_xml(path) — одинаково для сжатых и обычных файлов.
+
+Сжатие — только для локального хранения. Сервер (/api/xml-import) импортирует лишь *.xml,
+поэтому при сборке ZIP для выгрузки .xml.zst распаковываются обратно в .xml
+(zip_write, upload_arcname; zip_stream.compress_member).
+
+Нужен пакет zstandard (pip install zstandard); без него сжатые файлы не читаются
+и --compress-xml недоступен, обычные XML работают как раньше.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import zipfile
+from pathlib import Path
+
+try:
+    import zstandard as zstd
+except ImportError:  # необязательная зависимость
+    zstd = None
+
+ZSTD_SUFFIX = ".zst"
+DEFAULT_DICT_DIR = Path(os.environ.get("EIS_ZSTD_DICTS", "zstd_dicts"))
+DEFAULT_LEVEL = 9
+DICT_SIZE = 112 * 1024
+
+_dicts: dict[tuple[str, int], "zstd.ZstdCompressionDict"] = {}
+_dicts_lock = threading.Lock()
+
+
+def _require_zstd() -> None:
+    if zstd is None:
+        raise RuntimeError("для сжатого хранения XML нужен пакет zstandard (pip install zstandard)")
+
+
+def is_compressed(path: Path) -> bool:
+    return path.name.endswith(ZSTD_SUFFIX)
+
+
+def stored_name(name: str, compressed: bool) -> str:
+    return name + ZSTD_SUFFIX if compressed else name
+
+
+def load_dictionary(dict_id: int, dict_dir: Path = DEFAULT_DICT_DIR):
+    key = (str(dict_dir), dict_id)
+    with _dicts_lock:
+        d = _dicts.get(key)
+        if d is None:
+            path = Path(dict_dir) / f"{dict_id}.dict"
+            if not path.exists():
+                raise FileNotFoundError(f"словарь zstd {dict_id} не найден в {dict_dir}")
+            d = zstd.ZstdCompressionDict(path.read_bytes())
+            _dicts[key] = d
+        return d
+
+
+def latest_dictionary(dict_dir: Path = DEFAULT_DICT_DIR) -> Path | None:
+    paths = sorted(Path(dict_dir).glob("*.dict"), key=lambda p: p.stat().st_mtime)
+    return paths[-1] if paths else None
+
+
+class XmlCodec:
+    """
+    Сжатие XML при записи. zstd-компрессор не потокобезопасен — у каждого потока свой.
+    """
+
+    def __init__(self, dict_path: Path | None = None, level: int = DEFAULT_LEVEL):
+        _require_zstd()
+        self.level = level
+        self.dict_path = Path(dict_path) if dict_path else None
+        self.dictionary = zstd.ZstdCompressionDict(self.dict_path.read_bytes()) if self.dict_path else None
+        self._local = threading.local()
+
+    @property
+    def dict_id(self) -> int:
+        return self.dictionary.dict_id() if self.dictionary is not None else 0
+
+    def compress(self, xb: bytes) -> bytes:
+        cctx = getattr(self._local, "cctx", None)
+        if cctx is None:
+            cctx = zstd.ZstdCompressor(level=self.level, dict_data=self.dictionary, write_content_size=True)
+            self._local.cctx = cctx
+        return cctx.compress(xb)
+
+    def write(self, path: Path, xb: bytes) -> Path:
+        """Пишет path + .zst; возвращает фактический путь."""
+        target = path.with_name(stored_name(path.name, True))
+        target.write_bytes(self.compress(xb))
+        return target
+
+
+def decompress(data: bytes, dict_dir: Path = DEFAULT_DICT_DIR) -> bytes:
+    _require_zstd()
+    dict_id = zstd.get_frame_parameters(data).dict_id
+    dictionary = load_dictionary(dict_id, dict_dir) if dict_id else None
+    return zstd.ZstdDecompressor(dict_data=dictionary).decompress(data)
+
+
+def read_xml(path: Path | str, dict_dir: Path = DEFAULT_DICT_DIR) -> bytes:
+    """Содержимое XML — из обычного или сжатого (.xml.zst) файла."""
+    path = Path(path)
+    data = path.read_bytes()
+    return decompress(data, dict_dir) if is_compressed(path) else data
+
+
+def upload_arcname(arcname: str) -> str:
+    """Имя в ZIP для выгрузки: сервер получает обычный .xml, без суффикса .zst."""
+    return arcname[:-len(ZSTD_SUFFIX)] if arcname.endswith(ZSTD_SUFFIX) else arcname
+
+
+def zip_write(zip_out: zipfile.ZipFile, path: Path, arcname: str) -> None:
+    """Файл в ZIP для выгрузки (DEFLATE); .xml.zst распаковывается и кладётся как .xml."""
+    if is_compressed(path):
+        zip_out.writestr(upload_arcname(arcname), read_xml(path), compress_type=zipfile.ZIP_DEFLATED)
+    else:
+        zip_out.write(path, arcname, compress_type=zipfile.ZIP_DEFLATED)
+
+
+def train_dictionary(src: Path, dict_dir: Path = DEFAULT_DICT_DIR, size: int = DICT_SIZE,
+                     max_samples: int = 20000) -> Path:
+    """Обучает словарь на notice_*.xml / package_*.xml под src и сохраняет как <id>.dict."""
+    _require_zstd()
+    samples = []
+    for path in Path(src).rglob("*.xml"):
+        if path.name.startswith(("notice_", "package_")):
+            samples.append(path.read_bytes())
+            if len(samples) >= max_samples:
+                break
+    if len(samples) < 10:
+        raise ValueError(f"в {src} слишком мало XML для обучения словаря ({len(samples)})")
+    d = zstd.train_dictionary(size, samples)
+    Path(dict_dir).mkdir(parents=True, exist_ok=True)
+    out = Path(dict_dir) / f"{d.dict_id()}.dict"
+    out.write_bytes(d.as_bytes())
+
+    raw = sum(len(s) for s in samples)
+    plain = zstd.ZstdCompressor(level=DEFAULT_LEVEL)
+    with_dict = zstd.ZstdCompressor(level=DEFAULT_LEVEL, dict_data=d)
+    probe = samples[:500]
+    plain_size = sum(len(plain.compress(s)) for s in probe)
+    dict_size = sum(len(with_dict.compress(s)) for s in probe)
+    probe_raw = sum(len(s) for s in probe)
+    print(f"[ZSTD] словарь {out} по {len(samples)} файлам ({raw / 2**20:.1f} MiB); "
+          f"сжатие без словаря x{probe_raw / plain_size:.1f}, со словарём x{probe_raw / dict_size:.1f}")
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Сжатое хранение XML закупок (zstd со словарём)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    tr = sub.add_parser("train", help="обучить словарь на выгруженных XML")
+    tr.add_argument("src", help="каталог выгрузки (например out)")
+    tr.add_argument("--dict-dir", default=str(DEFAULT_DICT_DIR), help="куда сохранить словарь")
+    tr.add_argument("--size", type=int, default=DICT_SIZE, help="размер словаря, байт")
+    cat = sub.add_parser("cat", help="вывести XML (в т.ч. из .xml.zst) в stdout")
+    cat.add_argument("path")
+    cat.add_argument("--dict-dir", default=str(DEFAULT_DICT_DIR))
+    args = ap.parse_args()
+
+    if args.cmd == "train":
+        train_dictionary(Path(args.src), Path(args.dict_dir), args.size)
+    else:
+        sys.stdout.buffer.write(read_xml(args.path, Path(args.dict_dir)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
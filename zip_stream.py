@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Потоковая ZIP-выгрузка больших каталогов (test.py, при желании — downloader.py).
+
+Архив не собирается в памяти: файлы сжимаются параллельно в пуле потоков (raw DEFLATE
+через zlib; .xml.zst распаковываются и идут как .xml — сервер импортирует только *.xml),
+а ZIP-поток (локальные заголовки,
+данные, центральный каталог, при необходимости ZIP64) отдаётся кусками генератором
+и сразу уходит в HTTP-тело. В памяти одновременно — не больше window сжатых файлов.
+
+Отправка:
+    upload_multipart()  — один POST multipart/form-data (поле "file") с
+                          Transfer-Encoding: chunked; совместим с /api/xml-import.
+    upload_resumable()  — протокол докачки кусками фиксированного размера:
+
+        GET  {base}/{upload_id}                 -> {"received": [0, 1, 5, ...]}  (404 = новая загрузка)
+        PUT  {base}/{upload_id}/{index}         тело — кусок; заголовки X-Chunk-Sha256,
+                                                Content-Range: bytes <start>-<end>/*
+        POST {base}/{upload_id}/complete        {"fileName", "chunks", "size", "sha256"}
+
+    upload_id — хеш списка файлов (путь, размер, mtime), а ZIP-поток детерминирован
+    (тот же набор файлов -> те же байты), поэтому повторный запуск после обрыва
+    пересобирает поток, но отправляет только куски, которых нет на сервере.
+"""
+
+import concurrent.futures
+import hashlib
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import requests
+
+from xml_store import is_compressed, read_xml, upload_arcname
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_FILECOUNT_LIMIT = 0xFFFF
+FLAG_UTF8 = 0x0800
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+DEFAULT_CHUNK_SIZE = 16 * 2**20
+
+
+@dataclass
+class Member:
+    arcname: str
+    method: int
+    crc: int
+    size: int              # исходный размер
+    data: bytes            # сжатые данные
+    mtime: float
+    mode: int
+
+
+def _dos_datetime(ts: float) -> tuple[int, int]:
+    t = time.localtime(ts)
+    year = max(t.tm_year, 1980)
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+def compress_member(path: Path, arcname: str, level: int = 6) -> Member:
+    st = path.stat()
+    if is_compressed(path):
+        raw = read_xml(path)
+        arcname = upload_arcname(arcname)
+    else:
+        raw = path.read_bytes()
+    crc = zlib.crc32(raw)
+    co = zlib.compressobj(level, zlib.DEFLATED, -15)
+    data = co.compress(raw) + co.flush()
+    return Member(arcname, METHOD_DEFLATED, crc, len(raw), data, st.st_mtime, st.st_mode)
+
+
+def bytes_member(arcname: str, data: bytes, level: int = 6, mtime: float = 315532800.0) -> Member:
+    """
+    Член архива из байтов в памяти (например, служебный манифест). Время по умолчанию
+    фиксированное, чтобы поток оставался детерминированным для докачки.
+    """
+    co = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return Member(arcname, METHOD_DEFLATED, zlib.crc32(data), len(data), co.compress(data) + co.flush(),
+                  mtime, 0o100644)
+
+
+def iter_members(files: Iterable[tuple[Path, str]], workers: int = 4, level: int = 6,
+                 window: int | None = None) -> Iterator[Member]:
+    """Сжимает файлы в пуле потоков, отдаёт в исходном порядке; в работе не больше window файлов."""
+    window = window or workers * 4
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending: deque[concurrent.futures.Future] = deque()
+        for path, arcname in files:
+            pending.append(pool.submit(compress_member, path, arcname, level))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def zip_stream(members: Iterable[Member]) -> Iterator[bytes]:
+    """Байты ZIP-архива кусками (ZIP64 — только если размеры/смещения/число файлов того требуют)."""
+    offset = 0
+    central: list[bytes] = []
+
+    for m in members:
+        name = m.arcname.encode("utf-8")
+        dostime, dosdate = _dos_datetime(m.mtime)
+        big = m.size >= ZIP64_LIMIT or len(m.data) >= ZIP64_LIMIT
+        extra = struct.pack("<HHQQ", 0x0001, 16, m.size, len(m.data)) if big else b""
+        version = 45 if big else 20
+        local = struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, version, FLAG_UTF8, m.method, dostime, dosdate, m.crc,
+            ZIP64_LIMIT if big else len(m.data), ZIP64_LIMIT if big else m.size, len(name), len(extra),
+        ) + name + extra
+        yield local
+        yield m.data
+
+        cd_extra_fields = []
+        if big:
+            cd_extra_fields += [m.size, len(m.data)]
+        if offset >= ZIP64_LIMIT:
+            cd_extra_fields.append(offset)
+        cd_extra = (struct.pack("<HH", 0x0001, 8 * len(cd_extra_fields))
+                    + struct.pack(f"<{len(cd_extra_fields)}Q", *cd_extra_fields)) if cd_extra_fields else b""
+        cd_version = 45 if cd_extra_fields else 20
+        central.append(struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | cd_version, cd_version, FLAG_UTF8, m.method,
+            dostime, dosdate, m.crc,
+            ZIP64_LIMIT if big else len(m.data), ZIP64_LIMIT if big else m.size,
+            len(name), len(cd_extra), 0, 0, 0, (m.mode & 0xFFFF) << 16,
+            min(offset, ZIP64_LIMIT),
+        ) + name + cd_extra)
+        offset += len(local) + len(m.data)
+
+    cd_offset = offset
+    cd = b"".join(central)
+    yield cd
+    count = len(central)
+    if count >= ZIP_FILECOUNT_LIMIT or len(cd) >= ZIP64_LIMIT or cd_offset >= ZIP64_LIMIT:
+        zip64_eocd_offset = cd_offset + len(cd)
+        yield struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, len(cd), cd_offset)
+        yield struct.pack("<IIQI", 0x07064B50, 0, zip64_eocd_offset, 1)
+        yield struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, 0xFFFF, 0xFFFF, ZIP64_LIMIT, ZIP64_LIMIT, 0)
+    else:
+        yield struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, len(cd), cd_offset, 0)
+
+
+class Progress:
+    def __init__(self, label: str, every: float = 5.0):
+        self.label = label
+        self.every = every
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._last = self.started
+
+    def add(self, n: int, force: bool = False) -> None:
+        self.bytes += n
+        now = time.monotonic()
+        if force or now - self._last >= self.every:
+            self._last = now
+            speed = self.bytes / max(now - self.started, 1e-6)
+            print(f"[{self.label}] {self.bytes / 2**20:.1f} MiB, {speed / 2**20:.1f} MiB/s")
+
+
+def rechunk(stream: Iterable[bytes], size: int) -> Iterator[bytes]:
+    """Поток кусков произвольной длины -> куски ровно по size (последний — остаток)."""
+    buf = bytearray()
+    for piece in stream:
+        buf += piece
+        while len(buf) >= size:
+            yield bytes(buf[:size])
+            del buf[:size]
+    if buf:
+        yield bytes(buf)
+
+
+def upload_id_for(files: list[tuple[Path, str]], filename: str, level: int = 6,
+                  extra: Iterable[Member] = ()) -> str:
+    """
+    Идентификатор докачки. Меняется вместе с байтами потока: файлы (размер, mtime),
+    уровень сжатия и служебные члены в конце архива (extra, например _delta.json) —
+    иначе сервер склеил бы куски двух разных архивов.
+    """
+    h = hashlib.sha256(f"{filename}\0{level}\n".encode("utf-8"))
+    for path, arcname in files:
+        st = path.stat()
+        h.update(f"{arcname}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    for m in extra:
+        h.update(f"{m.arcname}\0{m.size}\0{m.crc}\n".encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+def upload_multipart(url: str, filename: str, stream: Iterable[bytes], timeout: int = 600,
+                     verify: bool = True, sess: requests.Session | None = None) -> requests.Response:
+    """Один POST multipart/form-data с телом-генератором (chunked), поле "file"."""
+    boundary = f"----eis{os.urandom(12).hex()}"
+    progress = Progress("HTTP")
+
+    def body() -> Iterator[bytes]:
+        yield (f"--{boundary}\r\n"
+               f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+               f"Content-Type: application/zip\r\n\r\n").encode("utf-8")
+        for piece in rechunk(stream, 1 * 2**20):
+            progress.add(len(piece))
+            yield piece
+        yield f"\r\n--{boundary}--\r\n".encode("utf-8")
+        progress.add(0, force=True)
+
+    sess = sess or requests.Session()
+    resp = sess.post(url, data=body(), timeout=timeout, verify=verify,
+                     headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    resp.raise_for_status()
+    return resp
+
+
+def upload_resumable(base_url: str, upload_id: str, filename: str, stream: Iterable[bytes],
+                     chunk_size: int = DEFAULT_CHUNK_SIZE, timeout: int = 600, verify: bool = True,
+                     retries: int = 5, sess: requests.Session | None = None) -> requests.Response:
+    """Докачиваемая отправка кусками (протокол — в docstring модуля)."""
+    sess = sess or requests.Session()
+    base = base_url.rstrip("/")
+    received: set[int] = set()
+    r = sess.get(f"{base}/{upload_id}", timeout=timeout, verify=verify)
+    if r.status_code != 404:
+        r.raise_for_status()
+        received = {int(i) for i in (r.json() or {}).get("received", [])}
+    if received:
+        print(f"[HTTP] Докачка {upload_id}: на сервере уже {len(received)} кусков")
+
+    progress = Progress("HTTP")
+    total = hashlib.sha256()
+    size = 0
+    count = 0
+    for index, chunk in enumerate(rechunk(stream, chunk_size)):
+        total.update(chunk)
+        start, size, count = size, size + len(chunk), index + 1
+        if index in received:
+            continue
+        digest = hashlib.sha256(chunk).hexdigest()
+        for attempt in range(retries + 1):
+            try:
+                resp = sess.put(f"{base}/{upload_id}/{index}", data=chunk, timeout=timeout, verify=verify,
+                                headers={"Content-Type": "application/octet-stream",
+                                         "Content-Range": f"bytes {start}-{size - 1}/*",
+                                         "X-Chunk-Sha256": digest})
+                resp.raise_for_status()
+                break
+            except requests.RequestException as exc:
+                if attempt == retries:
+                    raise
+                wait = min(60.0, 2.0 ** attempt)
+                print(f"[HTTP] кусок {index}: {exc}; повтор через {wait:.0f} с")
+                time.sleep(wait)
+        progress.add(len(chunk))
+
+    progress.add(0, force=True)
+    resp = sess.post(f"{base}/{upload_id}/complete", timeout=timeout, verify=verify,
+                     json={"fileName": filename, "chunks": count, "size": size, "sha256": total.hexdigest()})
+    resp.raise_for_status()
+    return resp